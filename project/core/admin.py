@@ -30,6 +30,8 @@ class HealthRecordAdmin(admin.ModelAdmin):
 class MedicineAdmin(admin.ModelAdmin):
     list_display = ('name', 'manufacturer', 'is_available', 'price', 'stock')
     list_filter = ('is_available', 'manufacturer')
+    # Maintained from pharmacy stock by core.inventory.
+    readonly_fields = ('is_available', 'stock')
     search_fields = ('name', 'manufacturer')
 
 class PharmacyAdmin(admin.ModelAdmin):
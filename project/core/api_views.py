@@ -2,28 +2,54 @@ from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
-from .models import HealthRecord, Appointment, Doctor, Patient, Medicine, Pharmacy, PharmacyMedicine
+from .models import HealthRecord, HealthRecordUpload, Appointment, Doctor, Patient, Medicine, Pharmacy, PharmacyMedicine
+from .pagination import (
+    APPOINTMENT_ORDERING, DOCTOR_DIRECTORY_ORDERING, HEALTH_RECORD_ORDERING, PATIENT_ORDERING, STOCK_CHANGE_ORDERING,
+    WORK_QUEUE_ORDERING, KeysetPagination, paginate
+)
+from .availability import get_availability_cache
+from .files import (
+    PartialUpload, UploadError, append_chunk, discard_partial, max_upload_size,
+    partial_digest, partial_path, ranged_file_response
+)
+from .db_routing import replica_reads
+from .directory import load_doctors, search_doctors, specialization_facets
+from .geo import by_distance, cells_within, parse_location
+from .realtime import publish_appointment
+from .scheduling import MAX_RANGE_DAYS
+from .search import find_medicines
 from .serializers import (
-    HealthRecordSerializer, AppointmentSerializer, DoctorSerializer,
+    HealthRecordSerializer, AppointmentSerializer, DoctorSerializer, DoctorDirectorySerializer,
     PatientSerializer, MedicineSerializer, PharmacySerializer
 )
-from django.db.models import Q
+from .stock_import import guess_format, import_stock, text_stream
+from .stock_sync import SyncError, push_changes, settled_stock_changes, settled_stock_deletions, stock_change
+from .symptoms import get_analyzer
+from .triage import triage_notes, work_queue
+from .versions import APPOINTMENTS, HEALTH_RECORDS, PATIENTS, SCHEDULE, versioned
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q, Prefetch
+from django.utils.dateparse import parse_date
 from datetime import datetime, timedelta
+from io import BytesIO
 
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
+@versioned(HEALTH_RECORDS)
 def health_records_list(request):
     if not hasattr(request.user, 'patient'):
         return Response({'error': 'User is not a patient'}, status=status.HTTP_403_FORBIDDEN)
     
     records = HealthRecord.objects.filter(patient=request.user.patient)
-    serializer = HealthRecordSerializer(records, many=True)
-    return Response(serializer.data)
+    return Response(paginate(request, records, HealthRecordSerializer, HEALTH_RECORD_ORDERING))
 
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
 def update_appointment_status(request, appointment_id):
-    appointment = get_object_or_404(Appointment, id=appointment_id)
+    appointment = get_object_or_404(
+        AppointmentSerializer.setup_eager_loading(Appointment.objects.all()), id=appointment_id
+    )
     
     # Check if user has permission to update this appointment
     if not request.user.is_doctor or request.user.doctor != appointment.doctor:
@@ -35,81 +61,174 @@ def update_appointment_status(request, appointment_id):
     
     appointment.status = new_status
     appointment.save()
-    return Response({'success': True, 'status': new_status})
+    publish_appointment(appointment)
+    return Response({
+        'success': True,
+        'status': new_status,
+        'appointment': AppointmentSerializer(appointment).data
+    })
 
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
 def analyze_symptoms(request):
     symptoms = request.data.get('symptoms', '')
-    if not symptoms:
+    if not symptoms or not isinstance(symptoms, str):
         return Response({'error': 'No symptoms provided'}, status=status.HTTP_400_BAD_REQUEST)
     
-    # Simple symptom analysis (in a real system, this would use a more sophisticated AI model)
-    common_conditions = {
-        'fever': ['Common cold', 'Flu', 'COVID-19'],
-        'headache': ['Migraine', 'Tension headache', 'Sinus infection'],
-        'cough': ['Common cold', 'Bronchitis', 'Asthma'],
-        'fatigue': ['Anemia', 'Depression', 'Sleep disorder'],
-        'nausea': ['Food poisoning', 'Migraine', 'Stomach virus']
+    # Rule-based analysis from the symptom knowledge base (in a real system, this would use a more sophisticated AI model)
+    return Response(get_analyzer().analyze(symptoms))
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def triage_symptoms(request):
+    """Analyze a batch of symptom notes; ``results`` holds one analysis per note, in order."""
+    notes = request.data.get('notes')
+    max_notes = getattr(settings, 'SYMPTOM_TRIAGE_MAX_NOTES', 200)
+    if not isinstance(notes, list) or not notes:
+        return Response({'error': 'notes must be a non-empty list of symptom notes'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(notes) > max_notes:
+        return Response({'error': f'At most {max_notes} notes per request'}, status=status.HTTP_400_BAD_REQUEST)
+    invalid = [index for index, note in enumerate(notes) if not note or not isinstance(note, str)]
+    if invalid:
+        return Response(
+            {'error': 'Every note must be non-empty text', 'invalid': invalid}, status=status.HTTP_400_BAD_REQUEST
+        )
+    return Response({'results': triage_notes(notes)})
+
+def medicines_with_stock(location=None):
+    in_stock = PharmacyMedicine.objects.filter(stock__gt=0).select_related('pharmacy')
+    if location:
+        # Only pharmacies in grid cells near the location; the exact radius is applied per result.
+        in_stock = in_stock.filter(cells_within(location, 'pharmacy__geo_cell'))
+    return Medicine.objects.select_related('availability').prefetch_related(
+        Prefetch('pharmacymedicine_set', queryset=in_stock, to_attr='in_stock')
+    )
+
+def pharmacy_stock(medicine, pm, distance=None):
+    entry = {
+        'pharmacy_name': pm.pharmacy.name,
+        'pharmacy_address': pm.pharmacy.address,
+        'stock': pm.stock,
+        'price': float(medicine.price)
     }
-    
-    found_conditions = set()
-    severity = 'low'
-    
-    for keyword, conditions in common_conditions.items():
-        if keyword.lower() in symptoms.lower():
-            found_conditions.update(conditions)
-            
-    if len(found_conditions) > 2:
-        severity = 'moderate'
-    if 'severe' in symptoms.lower() or 'intense' in symptoms.lower():
-        severity = 'high'
-        
-    response = {
-        'possible_conditions': list(found_conditions),
-        'severity': severity,
-        'recommendation': 'Please consult with a doctor for accurate diagnosis.' if severity != 'low' 
-                         else 'Monitor your symptoms and rest. Consult a doctor if symptoms worsen.'
+    if distance is not None:
+        entry['distance_km'] = round(distance, 2)
+    return entry
+
+def medicine_search_result(medicine, location=None):
+    # Medicines bulk-created outside the importer may not have an aggregate yet.
+    availability = getattr(medicine, 'availability', None)
+    min_price = availability and availability.min_price
+    result = {
+        'id': medicine.id,
+        'name': medicine.name,
+        'manufacturer': medicine.manufacturer,
+        'description': medicine.description,
+        'total_stock': availability.total_stock if availability else 0,
+        'pharmacy_count': availability.pharmacy_count if availability else 0,
+        'min_price': float(min_price) if min_price is not None else None,
     }
-    
-    return Response(response)
+    if location is None:
+        result['available_at'] = [pharmacy_stock(medicine, pm) for pm in medicine.in_stock]
+    else:
+        nearest = by_distance(location, medicine.in_stock, lambda pm: (pm.pharmacy.latitude, pm.pharmacy.longitude))
+        limit = getattr(settings, 'PHARMACY_SEARCH_LIMIT', 20)
+        result['available_at'] = [pharmacy_stock(medicine, pm, distance) for distance, pm in nearest[:limit]]
+    return result
 
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
+@replica_reads
 def search_medicines(request):
     query = request.GET.get('query', '')
     if not query:
         return Response({'error': 'No search query provided'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        location = parse_location(request.GET)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
     
-    medicines = Medicine.objects.filter(
-        Q(name__icontains=query) | Q(manufacturer__icontains=query)
-    ).select_related()
-    
-    results = []
-    for medicine in medicines:
-        pharmacy_stocks = PharmacyMedicine.objects.filter(medicine=medicine, stock__gt=0)
-        available_at = [
-            {
-                'pharmacy_name': pm.pharmacy.name,
-                'pharmacy_address': pm.pharmacy.address,
-                'stock': pm.stock,
-                'price': float(medicine.price)
-            }
-            for pm in pharmacy_stocks
-        ]
-        
-        results.append({
-            'id': medicine.id,
-            'name': medicine.name,
-            'manufacturer': medicine.manufacturer,
-            'description': medicine.description,
-            'available_at': available_at
-        })
+    medicines = find_medicines(medicines_with_stock(location), query)
+    return Response([medicine_search_result(medicine, location) for medicine in medicines])
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAdminUser])
+def import_pharmacy_stock(request):
+    upload = request.FILES.get('file')
+    if not upload:
+        return Response({'error': 'No file provided'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    pharmacy_id = request.data.get('pharmacy_id')
+    if pharmacy_id:
+        try:
+            pharmacy_id = get_object_or_404(Pharmacy, id=int(pharmacy_id)).id
+        except ValueError:
+            return Response({'error': 'Invalid pharmacy_id'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        # The upload handler spools files to disk, so the import streams it from there.
+        report = import_stock(
+            text_stream(upload.file),
+            format=request.data.get('format') or guess_format(upload.name),
+            pharmacy_id=pharmacy_id or None
+        )
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
     
-    return Response(results)
+    return Response(report.as_dict(), status=status.HTTP_400_BAD_REQUEST if report.error else status.HTTP_200_OK)
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAdminUser])
+def push_stock_changes(request):
+    try:
+        pharmacy = get_object_or_404(Pharmacy, id=int(request.data.get('pharmacy_id')))
+    except (TypeError, ValueError):
+        return Response({'error': 'Invalid pharmacy_id'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        result, replayed = push_changes(pharmacy, request.headers.get('Idempotency-Key'), request.data.get('changes'))
+    except SyncError as e:
+        return Response({'error': str(e)}, status=e.status)
+    
+    response = Response(result)
+    if replayed:
+        response['Idempotent-Replayed'] = 'true'
+    return response
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def stock_changes(request):
+    pharmacy_id = request.GET.get('pharmacy_id')
+    if pharmacy_id:
+        try:
+            pharmacy_id = int(pharmacy_id)
+        except ValueError:
+            return Response({'error': 'Invalid pharmacy_id'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    paginator = KeysetPagination(STOCK_CHANGE_ORDERING)
+    rows = paginator.paginate_querysets(
+        [settled_stock_changes(pharmacy_id or None), settled_stock_deletions(pharmacy_id or None)], request
+    )
+    data = paginator.get_paginated_data([stock_change(row) for row in rows])
+    # Where to resume next time, even when this page is the last one.
+    data['cursor'] = paginator.encode_cursor(paginator.position_of(rows[-1])) if rows else request.GET.get('cursor')
+    return Response(data)
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def doctor_work_queue(request):
+    """The doctor's pending and confirmed appointments, most severe and longest waiting first, a page at a time."""
+    if not request.user.is_doctor:
+        return Response({'error': 'User is not a doctor'}, status=status.HTTP_403_FORBIDDEN)
+    
+    paginator = KeysetPagination(WORK_QUEUE_ORDERING)
+    queue = AppointmentSerializer.setup_eager_loading(work_queue(request.user.doctor))
+    rows = paginator.paginate_queryset(queue, request)
+    return paginator.get_paginated_response(AppointmentSerializer(rows, many=True).data)
 
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
+@versioned(SCHEDULE)
 def get_doctor_schedule(request):
     if not request.user.is_doctor:
         return Response({'error': 'User is not a doctor'}, status=status.HTTP_403_FORBIDDEN)
@@ -119,6 +238,64 @@ def get_doctor_schedule(request):
         'available_times': doctor.available_times
     })
 
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def doctor_directory(request):
+    try:
+        min_experience = request.GET.get('min_experience')
+        min_experience = int(min_experience) if min_experience else None
+        available_on = parse_date(request.GET.get('available_on', ''))
+    except ValueError:
+        return Response({'error': 'Invalid filter value'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    doctors = search_doctors(
+        specialization=request.GET.get('specialization') or None,
+        min_experience=min_experience,
+        available_on=available_on
+    )
+    paginator = KeysetPagination(DOCTOR_DIRECTORY_ORDERING, nulls_last=True)
+    if isinstance(doctors, list):
+        rows = load_doctors(paginator.paginate_list(doctors, request, Doctor))
+    else:
+        rows = paginator.paginate_queryset(doctors, request)
+    return paginator.get_paginated_response(DoctorDirectorySerializer(rows, many=True).data)
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def doctor_specializations(request):
+    version, facets = specialization_facets()
+    return Response({'version': version, 'specializations': facets})
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def get_doctor_slots(request, doctor_id):
+    doctor = get_object_or_404(Doctor, id=doctor_id)
+    
+    try:
+        start = parse_date(request.GET.get('start', '')) or datetime.now().date()
+        end = parse_date(request.GET.get('end', '')) or start + timedelta(days=6)
+    except ValueError:
+        return Response({'error': 'Invalid date'}, status=status.HTTP_400_BAD_REQUEST)
+    if end < start or (end - start).days >= MAX_RANGE_DAYS:
+        return Response({'error': f'Date range must cover 1 to {MAX_RANGE_DAYS} days'},
+                       status=status.HTTP_400_BAD_REQUEST)
+    
+    slots = get_availability_cache().open_slots(doctor, start, end)
+    return Response({
+        'doctor_id': doctor.id,
+        'start': start,
+        'end': end,
+        'slots': {
+            day.isoformat(): [slot.strftime('%H:%M') for slot in times]
+            for day, times in slots.items()
+        }
+    })
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def availability_cache_metrics(request):
+    return Response(get_availability_cache().metrics())
+
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
 def update_doctor_schedule(request):
@@ -137,6 +314,8 @@ def update_doctor_schedule(request):
 
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
+@replica_reads
+@versioned(PATIENTS)
 def patient_list(request):
     if not request.user.is_doctor:
         return Response({'error': 'User is not a doctor'}, status=status.HTTP_403_FORBIDDEN)
@@ -145,8 +324,7 @@ def patient_list(request):
     patients = Patient.objects.filter(
         appointment__doctor=request.user.doctor
     ).distinct()
-    serializer = PatientSerializer(patients, many=True)
-    return Response(serializer.data)
+    return Response(paginate(request, patients, PatientSerializer, PATIENT_ORDERING))
 
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
@@ -160,21 +338,26 @@ def get_patient_records(request):
         patients = Patient.objects.filter(
             appointment__doctor=request.user.doctor
         ).distinct()
-        serializer = PatientSerializer(patients, many=True)
-        return Response(serializer.data)
+        return Response(paginate(request, patients, PatientSerializer, PATIENT_ORDERING))
     
     # Return detailed patient records
-    patient = get_object_or_404(Patient, id=patient_id)
+    patient = get_object_or_404(PatientSerializer.setup_eager_loading(Patient.objects.all()), id=patient_id)
     records = HealthRecord.objects.filter(patient=patient)
     appointments = Appointment.objects.filter(
         doctor=request.user.doctor,
         patient=patient
-    ).order_by('-date', '-time')
+    )
     
     return Response({
         'patient': PatientSerializer(patient).data,
-        'health_records': HealthRecordSerializer(records, many=True).data,
-        'appointments': AppointmentSerializer(appointments, many=True).data
+        'health_records': paginate(
+            request, records, HealthRecordSerializer, HEALTH_RECORD_ORDERING,
+            cursor_query_param='records_cursor'
+        ),
+        'appointments': paginate(
+            request, appointments, AppointmentSerializer, APPOINTMENT_ORDERING,
+            cursor_query_param='appointments_cursor'
+        )
     })
 
 @api_view(['POST'])
@@ -190,7 +373,9 @@ def create_prescription(request):
     if not all([appointment_id, prescription_text]):
         return Response({'error': 'Missing required fields'}, status=status.HTTP_400_BAD_REQUEST)
     
-    appointment = get_object_or_404(Appointment, id=appointment_id)
+    appointment = get_object_or_404(
+        AppointmentSerializer.setup_eager_loading(Appointment.objects.all()), id=appointment_id
+    )
     if appointment.doctor != request.user.doctor:
         return Response({'error': 'Not authorized to update this appointment'}, 
                        status=status.HTTP_403_FORBIDDEN)
@@ -200,6 +385,7 @@ def create_prescription(request):
         appointment.diagnosis = diagnosis
     appointment.status = 'completed'
     appointment.save()
+    publish_appointment(appointment)
     
     return Response({
         'success': True,
@@ -208,6 +394,8 @@ def create_prescription(request):
 
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
+@replica_reads
+@versioned(APPOINTMENTS)
 def get_appointments(request):
     if hasattr(request.user, 'doctor'):
         appointments = Appointment.objects.filter(doctor=request.user.doctor)
@@ -217,8 +405,7 @@ def get_appointments(request):
         return Response({'error': 'User is neither a doctor nor a patient'}, 
                        status=status.HTTP_403_FORBIDDEN)
     
-    serializer = AppointmentSerializer(appointments, many=True)
-    return Response(serializer.data)
+    return Response(paginate(request, appointments, AppointmentSerializer, APPOINTMENT_ORDERING))
 
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
@@ -239,8 +426,110 @@ def create_health_record(request):
         record_type=record_type,
         description=description,
         file=file,
+        filename=file.name if file else '',
         date=date
     )
     
     serializer = HealthRecordSerializer(record)
     return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+def upload_status(upload):
+    return {
+        'id': str(upload.id),
+        'filename': upload.filename,
+        'size': upload.size,
+        'offset': upload.offset,
+    }
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def create_health_record_upload(request):
+    if not hasattr(request.user, 'patient'):
+        return Response({'error': 'User is not a patient'}, status=status.HTTP_403_FORBIDDEN)
+    
+    filename = request.data.get('filename')
+    record_type = request.data.get('record_type')
+    try:
+        size = int(request.data.get('size'))
+    except (TypeError, ValueError):
+        size = None
+    
+    if not all([filename, record_type]) or size is None or size < 0:
+        return Response({'error': 'Missing required fields'}, status=status.HTTP_400_BAD_REQUEST)
+    if size > max_upload_size():
+        return Response({'error': 'File is too large'}, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+    
+    upload = HealthRecordUpload.objects.create(
+        patient=request.user.patient,
+        filename=filename[:255],
+        size=size,
+        record_type=record_type,
+        description=request.data.get('description', ''),
+        is_private=request.data.get('is_private', True) not in (False, 'false', '0')
+    )
+    return Response(upload_status(upload), status=status.HTTP_201_CREATED)
+
+@api_view(['GET', 'PATCH'])
+@permission_classes([permissions.IsAuthenticated])
+def health_record_upload(request, upload_id):
+    upload = get_object_or_404(HealthRecordUpload, id=upload_id, patient__user=request.user)
+    if request.method == 'GET':
+        return Response(upload_status(upload))
+    
+    try:
+        offset = int(request.headers.get('Upload-Offset', ''))
+    except ValueError:
+        return Response({'error': 'Missing Upload-Offset header'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        # Read straight from the request stream; touching request.data would buffer the body.
+        append_chunk(upload, request.stream or BytesIO(), offset)
+    except UploadError as e:
+        return Response(dict(upload_status(upload), error=str(e)), status=e.status)
+    return Response(upload_status(upload))
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def complete_health_record_upload(request, upload_id):
+    with transaction.atomic():
+        # Locked so a repeated call waits for this one and then finds the upload gone.
+        upload = get_object_or_404(
+            HealthRecordUpload.objects.select_for_update(of=('self',)), id=upload_id, patient__user=request.user
+        )
+        if upload.offset != upload.size:
+            return Response(dict(upload_status(upload), error='Upload is incomplete'),
+                           status=status.HTTP_409_CONFLICT)
+        
+        record = HealthRecord(
+            patient=upload.patient,
+            record_type=upload.record_type,
+            description=upload.description,
+            is_private=upload.is_private,
+            filename=upload.filename
+        )
+        with open(partial_path(upload), 'rb') as partial:
+            record.file.save(upload.filename, PartialUpload(partial, partial_digest(upload)), save=False)
+        record.save()
+        upload.delete()
+    discard_partial(upload)
+    
+    serializer = HealthRecordSerializer(record)
+    return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+def can_access_health_record(user, record):
+    if hasattr(user, 'patient') and record.patient_id == user.patient.id:
+        return True
+    if hasattr(user, 'doctor'):
+        return Appointment.objects.filter(doctor=user.doctor, patient_id=record.patient_id).exists()
+    return False
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def download_health_record(request, record_id):
+    record = get_object_or_404(HealthRecord, id=record_id)
+    if not can_access_health_record(request.user, record):
+        return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
+    if not record.file:
+        return Response({'error': 'Record has no file'}, status=status.HTTP_404_NOT_FOUND)
+    
+    return ranged_file_response(request, record.file, filename=record.filename or None)
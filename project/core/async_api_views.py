@@ -0,0 +1,119 @@
+"""
+Async-native versions of the most-read JSON APIs.
+
+Under ASGI every sync view in ``api_views`` runs through ``sync_to_async``,
+holding Django's single sync thread for the whole request: session and user
+lookups, queries, serialization and rendering. These views keep all of that
+on the event loop and only cross into the sync thread for the queries
+themselves, via the async ORM. They return the same JSON as their sync
+counterparts and are routed under ``api/async/``.
+"""
+import functools
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user
+from django.http import JsonResponse
+from rest_framework import status
+from rest_framework.exceptions import APIException, MethodNotAllowed, NotAuthenticated
+from rest_framework.request import Request
+from rest_framework.utils.encoders import JSONEncoder
+
+from .api_views import medicine_search_result, medicines_with_stock
+from .db_routing import replica_reads
+from .geo import parse_location
+from .models import Appointment, Doctor, HealthRecord, User
+from .pagination import APPOINTMENT_ORDERING, HEALTH_RECORD_ORDERING, apaginate
+from .search import find_medicines
+from .serializers import AppointmentSerializer, HealthRecordSerializer
+from .versions import APPOINTMENTS, HEALTH_RECORDS, SCHEDULE, versioned
+
+
+def json_response(data, status=status.HTTP_200_OK):
+    return JsonResponse(data, status=status, encoder=JSONEncoder, safe=False)
+
+
+def async_api_view(view):
+    """
+    The async counterpart of ``@api_view(['GET'])`` with ``IsAuthenticated``:
+    the session user is resolved once, in a single hop, and the view gets a
+    DRF ``Request`` so pagination can read ``query_params``.
+    """
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        try:
+            if request.method not in ('GET', 'HEAD'):
+                raise MethodNotAllowed(request.method)
+            user = await sync_to_async(get_user)(request)
+            if not user.is_authenticated:
+                # Session authentication sends no WWW-Authenticate challenge, so DRF answers 403.
+                return json_response({'detail': NotAuthenticated.default_detail}, status=status.HTTP_403_FORBIDDEN)
+            api_request = Request(request, authenticators=())
+            api_request.user = user
+            return await view(api_request, *args, **kwargs)
+        except APIException as e:
+            return json_response({'detail': e.detail}, status=e.status_code)
+    return wrapper
+
+
+async def get_profile_ids(user):
+    """The user's doctor and patient ids (either may be None), in one query."""
+    return await User.objects.filter(pk=user.pk).values_list('doctor__id', 'patient__id').aget()
+
+
+@async_api_view
+@versioned(HEALTH_RECORDS)
+async def health_records_list(request):
+    _, patient_id = await get_profile_ids(request.user)
+    if patient_id is None:
+        return json_response({'error': 'User is not a patient'}, status=status.HTTP_403_FORBIDDEN)
+
+    records = HealthRecord.objects.filter(patient_id=patient_id)
+    return json_response(await apaginate(request, records, HealthRecordSerializer, HEALTH_RECORD_ORDERING))
+
+
+@async_api_view
+@replica_reads
+async def search_medicines(request):
+    query = request.GET.get('query', '')
+    if not query:
+        return json_response({'error': 'No search query provided'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        location = parse_location(request.GET)
+    except ValueError as e:
+        return json_response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    # The full-text backends issue raw SQL of their own, so the search and its
+    # prefetch run together in one hop.
+    medicines = await sync_to_async(lambda: list(find_medicines(medicines_with_stock(location), query)))()
+    return json_response([medicine_search_result(medicine, location) for medicine in medicines])
+
+
+@async_api_view
+@versioned(SCHEDULE)
+async def get_doctor_schedule(request):
+    if not request.user.is_doctor:
+        return json_response({'error': 'User is not a doctor'}, status=status.HTTP_403_FORBIDDEN)
+
+    try:
+        doctor = await Doctor.objects.only('available_times').aget(user=request.user)
+    except Doctor.DoesNotExist:
+        return json_response({'error': 'User is not a doctor'}, status=status.HTTP_403_FORBIDDEN)
+    return json_response({
+        'available_times': doctor.available_times
+    })
+
+
+@async_api_view
+@replica_reads
+@versioned(APPOINTMENTS)
+async def get_appointments(request):
+    doctor_id, patient_id = await get_profile_ids(request.user)
+    if doctor_id is not None:
+        appointments = Appointment.objects.filter(doctor_id=doctor_id)
+    elif patient_id is not None:
+        appointments = Appointment.objects.filter(patient_id=patient_id)
+    else:
+        return json_response({'error': 'User is neither a doctor nor a patient'},
+                             status=status.HTTP_403_FORBIDDEN)
+
+    return json_response(await apaginate(request, appointments, AppointmentSerializer, APPOINTMENT_ORDERING))
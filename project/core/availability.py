@@ -0,0 +1,195 @@
+"""
+Cached doctor availability calendar.
+
+Free slots for the next ``AVAILABILITY_CACHE_WEEKS`` weeks are computed once
+per doctor and stored one entry per (doctor, day). Appointment and schedule
+changes only drop the days they touch (see ``core.signals``), so the next
+lookup rebuilds just those days.
+
+By default entries live in a per-process LRU. Invalidation only reaches the
+process that made the change, so local entries also expire after
+``AVAILABILITY_CACHE_LOCAL_TTL`` seconds, which bounds how long another
+worker can show a booked slot as free. Set ``AVAILABILITY_CACHE_ALIAS`` to a
+``CACHES`` alias to share entries (and their invalidation) between workers
+instead.
+"""
+import threading
+import time as timer
+from collections import OrderedDict
+from datetime import date, time, timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+
+from . import scheduling
+
+
+class LocalLRUStore:
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get_many(self, keys):
+        found = {}
+        now = timer.monotonic()
+        with self.lock:
+            for key in keys:
+                if key in self.entries:
+                    expires, value = self.entries[key]
+                    if expires <= now:
+                        del self.entries[key]
+                        continue
+                    self.entries.move_to_end(key)
+                    found[key] = value
+        return found
+
+    def set_many(self, mapping):
+        expires = timer.monotonic() + self.ttl
+        with self.lock:
+            for key, value in mapping.items():
+                self.entries[key] = (expires, value)
+                self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def delete_many(self, keys):
+        with self.lock:
+            for key in keys:
+                self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+class DjangoCacheStore:
+    def __init__(self, alias, timeout):
+        self.cache = caches[alias]
+        self.timeout = timeout
+
+    def get_many(self, keys):
+        return self.cache.get_many(keys)
+
+    def set_many(self, mapping):
+        self.cache.set_many(mapping, timeout=self.timeout)
+
+    def delete_many(self, keys):
+        self.cache.delete_many(keys)
+
+    def clear(self):
+        self.cache.clear()
+
+
+class AvailabilityCache:
+    key_prefix = 'availability'
+
+    def __init__(self, store, weeks):
+        self.store = store
+        self.weeks = weeks
+        self.lock = threading.Lock()
+        self.reset_metrics()
+
+    def reset_metrics(self):
+        with self.lock:
+            self.hits = 0
+            self.misses = 0
+            self.rebuilt_days = 0
+            self.rebuild_seconds = 0.0
+
+    def key(self, doctor_id, day):
+        return f'{self.key_prefix}:{doctor_id}:{day.isoformat()}'
+
+    def horizon(self):
+        today = date.today()
+        return [today + timedelta(days=offset) for offset in range(self.weeks * 7)]
+
+    def open_slots(self, doctor, start, end):
+        """Same result as ``scheduling.open_slots``, served from the cache inside the horizon."""
+        days = self.horizon()
+        if start < days[0] or end > days[-1]:
+            return scheduling.open_slots(doctor, start, end)
+
+        keys = {day: self.key(doctor.pk, day) for day in days}
+        cached = self.store.get_many(list(keys.values()))
+        missing = [day for day in days if keys[day] not in cached]
+        requested_missing = [day for day in missing if start <= day <= end]
+
+        with self.lock:
+            if requested_missing:
+                self.misses += 1
+            else:
+                self.hits += 1
+
+        if missing:
+            cached.update(self.rebuild(doctor, missing, keys))
+
+        slots = {}
+        for day in days:
+            if start <= day <= end and cached[keys[day]]:
+                slots[day] = [time.fromisoformat(value) for value in cached[keys[day]]]
+        return slots
+
+    def rebuild(self, doctor, days, keys):
+        started = timer.perf_counter()
+        computed = scheduling.open_slots(doctor, days[0], days[-1])
+        entries = {
+            keys[day]: [slot.strftime('%H:%M') for slot in computed.get(day, [])]
+            for day in days
+        }
+        self.store.set_many(entries)
+        with self.lock:
+            self.rebuilt_days += len(days)
+            self.rebuild_seconds += timer.perf_counter() - started
+        return entries
+
+    def invalidate_days(self, doctor_id, days):
+        horizon = set(self.horizon())
+        keys = [self.key(doctor_id, day) for day in days if day in horizon]
+        if keys:
+            self.store.delete_many(keys)
+
+    def invalidate_weekdays(self, doctor_id, weekdays):
+        self.invalidate_days(doctor_id, [day for day in self.horizon() if day.weekday() in weekdays])
+
+    def metrics(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else None,
+                'rebuilt_days': self.rebuilt_days,
+                'rebuild_seconds': self.rebuild_seconds,
+                'avg_rebuild_ms_per_day': (
+                    self.rebuild_seconds * 1000 / self.rebuilt_days if self.rebuilt_days else None
+                ),
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_availability_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            weeks = getattr(settings, 'AVAILABILITY_CACHE_WEEKS', 4)
+            alias = getattr(settings, 'AVAILABILITY_CACHE_ALIAS', None)
+            if alias:
+                store = DjangoCacheStore(alias, timeout=weeks * 7 * 24 * 60 * 60)
+            else:
+                store = LocalLRUStore(
+                    getattr(settings, 'AVAILABILITY_CACHE_MAX_ENTRIES', 50_000),
+                    ttl=getattr(settings, 'AVAILABILITY_CACHE_LOCAL_TTL', 30),
+                )
+            _cache = AvailabilityCache(store, weeks)
+        return _cache
+
+
+def changed_weekdays(old_available_times, new_available_times):
+    old = scheduling.weekly_slots(old_available_times)
+    new = scheduling.weekly_slots(new_available_times)
+    return {weekday for weekday in old if old[weekday] != new[weekday]}
@@ -0,0 +1,566 @@
+"""
+Sharded, multi-process channel layer.
+
+``ShardedChannelLayer`` keeps messages and group memberships in one or more
+brokers and spreads them over the brokers with a consistent-hash ring, so a
+shard can be added or removed while moving only about 1/N of the keys. The
+ring is keyed by broker URL, so every worker process maps names the same way.
+
+Like ``channels_redis``, every worker gets one inbox for all of its
+consumers' channels (``specific.<worker>!<id>``). A single pump task per
+event loop drains that inbox and hands messages to the waiting consumers,
+so a worker holds one blocking read per process rather than one per socket.
+Group memberships expire ``group_expiry`` seconds after they were last
+added; messages expire ``expiry`` seconds after they were sent. ``capacity``
+limits named channels, while a worker's inbox, which is shared by all its
+sockets, holds up to ``inbox_capacity`` messages.
+
+Brokers are chosen by URL scheme:
+
+``memory://<name>``
+    In-process, shared by every layer in the process that uses the same
+    name. The default, and what the tests use.
+``sqlite:///<path>``
+    A SQLite file in WAL mode shared by all workers on one machine; a
+    stand-in for Redis that needs no server. Receivers poll, so delivery
+    can lag by up to ``SQLITE_MAX_POLL`` seconds.
+``redis://host:port/db``
+    Redis, through ``redis.asyncio`` (install ``redis``).
+"""
+import asyncio
+import base64
+import bisect
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import uuid
+import weakref
+from collections import defaultdict, deque
+from urllib.parse import urlparse
+
+from channels.exceptions import ChannelFull
+from channels.layers import BaseChannelLayer
+from django.core.exceptions import ImproperlyConfigured
+
+SQLITE_MIN_POLL = 0.001
+SQLITE_MAX_POLL = 0.02
+
+
+def encode(channel, message):
+    body = json.dumps(message, default=_encode_bytes, separators=(',', ':'))
+    return f'{channel}\0{body}'.encode()
+
+
+def decode(item):
+    channel, _, body = item.partition(b'\0')
+    return channel.decode(), json.loads(body, object_hook=_decode_bytes)
+
+
+def _encode_bytes(value):
+    if isinstance(value, (bytes, bytearray)):
+        return {'__bytes__': base64.b64encode(value).decode()}
+    raise TypeError(f'{type(value).__name__} cannot be sent over the channel layer')
+
+
+def _decode_bytes(value):
+    if len(value) == 1 and '__bytes__' in value:
+        return base64.b64decode(value['__bytes__'])
+    return value
+
+
+class HashRing:
+    def __init__(self, nodes, replicas=64):
+        self.nodes = list(nodes)
+        points = sorted(
+            (self.hash(f'{node.url}#{replica}'), index)
+            for index, node in enumerate(self.nodes)
+            for replica in range(replicas)
+        )
+        self.points = [point for point, _ in points]
+        self.owners = [index for _, index in points]
+
+    @staticmethod
+    def hash(key):
+        return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], 'big')
+
+    def node(self, key):
+        if len(self.nodes) == 1:
+            return self.nodes[0]
+        position = bisect.bisect(self.points, self.hash(key)) % len(self.points)
+        return self.nodes[self.owners[position]]
+
+
+class MemoryBroker:
+    """Queues and groups in process memory; safe to use from several threads and event loops."""
+
+    registry = {}
+    registry_lock = threading.Lock()
+
+    def __init__(self, url):
+        self.url = url
+        self.lock = threading.Lock()
+        self.queues = defaultdict(deque)
+        self.waiters = defaultdict(list)
+        self.groups = defaultdict(dict)
+
+    @classmethod
+    def named(cls, url):
+        with cls.registry_lock:
+            if url not in cls.registry:
+                cls.registry[url] = cls(url)
+            return cls.registry[url]
+
+    def _take(self, name, now):
+        queue = self.queues.get(name)
+        while queue:
+            expires, item = queue.popleft()
+            if expires >= now:
+                return item
+        self.queues.pop(name, None)
+        return None
+
+    async def push(self, name, item, expires, capacity):
+        now = time.time()
+        with self.lock:
+            queue = self.queues[name]
+            while queue and queue[0][0] < now:
+                queue.popleft()
+            if len(queue) >= capacity:
+                raise ChannelFull(name)
+            queue.append((expires, item))
+            waiters = self.waiters.pop(name, ())
+        for waiter in waiters:
+            waiter.get_loop().call_soon_threadsafe(_wake, waiter)
+
+    async def pop(self, name, timeout):
+        deadline = time.monotonic() + timeout
+        loop = asyncio.get_running_loop()
+        while True:
+            with self.lock:
+                item = self._take(name, time.time())
+                if item is not None:
+                    return item
+                waiter = loop.create_future()
+                self.waiters[name].append(waiter)
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0:
+                    return None
+                await asyncio.wait_for(waiter, remaining)
+            except asyncio.TimeoutError:
+                return None
+            finally:
+                with self.lock:
+                    if waiter in self.waiters.get(name, ()):
+                        self.waiters[name].remove(waiter)
+
+    async def group_add(self, group, channel, expires):
+        with self.lock:
+            self.groups[group][channel] = expires
+
+    async def group_discard(self, group, channel):
+        with self.lock:
+            members = self.groups.get(group)
+            if members is not None:
+                members.pop(channel, None)
+                if not members:
+                    del self.groups[group]
+
+    async def group_members(self, group, now):
+        with self.lock:
+            members = self.groups.get(group)
+            if not members:
+                return []
+            expired = [channel for channel, expires in members.items() if expires < now]
+            for channel in expired:
+                del members[channel]
+            return list(members)
+
+    async def flush(self):
+        with self.lock:
+            self.queues.clear()
+            self.groups.clear()
+
+    async def close(self):
+        pass
+
+
+def _wake(waiter):
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+class SQLiteBroker:
+    """Queues and groups in a SQLite file that every worker on the host opens."""
+
+    schema = (
+        'CREATE TABLE IF NOT EXISTS channel_messages ('
+        ' id INTEGER PRIMARY KEY AUTOINCREMENT, queue TEXT NOT NULL, expires REAL NOT NULL, item BLOB NOT NULL)',
+        'CREATE INDEX IF NOT EXISTS channel_messages_queue ON channel_messages (queue, id)',
+        'CREATE TABLE IF NOT EXISTS channel_groups ('
+        ' name TEXT NOT NULL, channel TEXT NOT NULL, expires REAL NOT NULL,'
+        ' PRIMARY KEY (name, channel)) WITHOUT ROWID',
+    )
+
+    def __init__(self, url):
+        self.url = url
+        self.path = urlparse(url).path
+        self.local = threading.local()
+        with self.connect() as connection:
+            for statement in self.schema:
+                connection.execute(statement)
+
+    def connect(self):
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self.local.connection = connection
+        return connection
+
+    def run(self, function, *args):
+        return asyncio.to_thread(function, *args)
+
+    def _push(self, name, item, expires, capacity):
+        connection = self.connect()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            connection.execute('DELETE FROM channel_messages WHERE queue = ? AND expires < ?', (name, time.time()))
+            (queued,) = connection.execute(
+                'SELECT count(*) FROM channel_messages WHERE queue = ?', (name,)
+            ).fetchone()
+            if queued >= capacity:
+                raise ChannelFull(name)
+            connection.execute(
+                'INSERT INTO channel_messages (queue, expires, item) VALUES (?, ?, ?)', (name, expires, item)
+            )
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+
+    def _take(self, name):
+        row = self.connect().execute(
+            'DELETE FROM channel_messages WHERE id = ('
+            ' SELECT id FROM channel_messages WHERE queue = ? AND expires >= ? ORDER BY id LIMIT 1'
+            ') RETURNING item',
+            (name, time.time()),
+        ).fetchone()
+        return row[0] if row else None
+
+    def _execute(self, sql, params):
+        return self.connect().execute(sql, params).fetchall()
+
+    async def push(self, name, item, expires, capacity):
+        await self.run(self._push, name, item, expires, capacity)
+
+    async def pop(self, name, timeout):
+        deadline = time.monotonic() + timeout
+        delay = SQLITE_MIN_POLL
+        while True:
+            item = await self.run(self._take, name)
+            if item is not None:
+                return item
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            await asyncio.sleep(min(delay, remaining))
+            delay = min(delay * 2, SQLITE_MAX_POLL)
+
+    async def group_add(self, group, channel, expires):
+        await self.run(
+            self._execute,
+            'INSERT OR REPLACE INTO channel_groups (name, channel, expires) VALUES (?, ?, ?)',
+            (group, channel, expires),
+        )
+
+    async def group_discard(self, group, channel):
+        await self.run(self._execute, 'DELETE FROM channel_groups WHERE name = ? AND channel = ?', (group, channel))
+
+    async def group_members(self, group, now):
+        rows = await self.run(
+            self._execute, 'SELECT channel FROM channel_groups WHERE name = ? AND expires >= ?', (group, now)
+        )
+        return [channel for (channel,) in rows]
+
+    async def flush(self):
+        await self.run(self._execute, 'DELETE FROM channel_messages', ())
+        await self.run(self._execute, 'DELETE FROM channel_groups', ())
+
+    async def close(self):
+        pass
+
+
+def close_with_loop(clients, loop):
+    """
+    Close ``clients[loop]`` just before ``loop`` closes. ``async_to_sync``
+    from sync code (WSGI views, management commands) runs every call in a
+    new event loop, so a client per loop must not outlive its loop.
+    """
+    original_close = loop.close
+
+    def close():
+        client = clients.pop(loop, None)
+        try:
+            if client is not None and not loop.is_running() and not loop.is_closed():
+                loop.run_until_complete(client.aclose())
+        finally:
+            del loop.close
+            original_close()
+
+    try:
+        loop.close = close
+    except AttributeError:
+        # Loops implemented in C (uvloop) cannot be patched; they are the
+        # long-lived server loops, and the weak key still drops the client.
+        pass
+
+
+class RedisBroker:
+    """Lists for queues and sorted sets (scored by expiry) for groups."""
+
+    def __init__(self, url, prefix='asgi'):
+        try:
+            import redis.asyncio  # noqa: F401
+        except ImportError:
+            raise ImproperlyConfigured('The redis:// channel layer shard requires the "redis" package')
+        self.url = url
+        self.prefix = prefix
+        self.clients = weakref.WeakKeyDictionary()
+
+    def client(self):
+        # redis.asyncio connections belong to the event loop that opened them.
+        import redis.asyncio
+
+        loop = asyncio.get_running_loop()
+        client = self.clients.get(loop)
+        if client is None:
+            client = self.clients[loop] = redis.asyncio.Redis.from_url(self.url)
+            close_with_loop(self.clients, loop)
+        return client
+
+    def queue_key(self, name):
+        return f'{self.prefix}:queue:{name}'
+
+    def group_key(self, group):
+        return f'{self.prefix}:group:{group}'
+
+    async def push(self, name, item, expires, capacity):
+        client = self.client()
+        key = self.queue_key(name)
+        if await client.llen(key) >= capacity:
+            raise ChannelFull(name)
+        async with client.pipeline(transaction=True) as pipe:
+            pipe.rpush(key, f'{expires!r}\0'.encode() + item)
+            pipe.expire(key, max(int(expires - time.time()) + 1, 1))
+            await pipe.execute()
+
+    async def pop(self, name, timeout):
+        client = self.client()
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            result = await client.blpop([self.queue_key(name)], timeout=max(remaining, 0.01))
+            if result is None:
+                return None
+            expires, _, item = result[1].partition(b'\0')
+            if float(expires) >= time.time():
+                return item
+
+    async def group_add(self, group, channel, expires):
+        client = self.client()
+        key = self.group_key(group)
+        async with client.pipeline(transaction=True) as pipe:
+            pipe.zadd(key, {channel: expires})
+            pipe.expireat(key, int(expires) + 1)
+            await pipe.execute()
+
+    async def group_discard(self, group, channel):
+        await self.client().zrem(self.group_key(group), channel)
+
+    async def group_members(self, group, now):
+        client = self.client()
+        key = self.group_key(group)
+        await client.zremrangebyscore(key, 0, now)
+        return [member.decode() for member in await client.zrange(key, 0, -1)]
+
+    async def flush(self):
+        client = self.client()
+        async for key in client.scan_iter(match=f'{self.prefix}:*'):
+            await client.delete(key)
+
+    async def close(self):
+        # Only this loop's client can be closed here; the others close with their loops.
+        client = self.clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+
+
+def open_broker(url, prefix):
+    scheme = urlparse(url).scheme
+    if scheme == 'memory':
+        return MemoryBroker.named(url)
+    if scheme == 'sqlite':
+        return SQLiteBroker(url)
+    if scheme in ('redis', 'rediss', 'unix'):
+        return RedisBroker(url, prefix=prefix)
+    raise ImproperlyConfigured(f'Unsupported channel layer shard URL: {url}')
+
+
+class LocalBuffer:
+    def __init__(self):
+        self.queue = asyncio.Queue()
+        self.receivers = 0
+        self.touched = time.monotonic()
+
+
+class ShardedChannelLayer(BaseChannelLayer):
+    extensions = ['groups', 'flush']
+
+    def __init__(self, shards=('memory://default',), expiry=60, group_expiry=86400, capacity=100,
+                 inbox_capacity=10_000, channel_capacity=None, prefix='asgi', replicas=64, poll_timeout=1.0,
+                 **kwargs):
+        super().__init__(expiry=expiry, capacity=capacity, **kwargs)
+        if isinstance(shards, str):
+            shards = [url.strip() for url in shards.split(',') if url.strip()]
+        if not shards:
+            raise ImproperlyConfigured('ShardedChannelLayer needs at least one shard')
+        self.channel_capacity = self.compile_capacities(channel_capacity or {})
+        self.group_expiry = group_expiry
+        self.inbox_capacity = inbox_capacity
+        self.poll_timeout = poll_timeout
+        self.ring = HashRing([open_broker(url, prefix) for url in shards], replicas=replicas)
+        self.client_prefix = uuid.uuid4().hex[:16]
+        self.inbox = f'specific.{self.client_prefix}!'
+        self.buffers = {}
+        self.pumps = {}
+
+    # Channel layer API
+
+    async def new_channel(self, prefix='specific.'):
+        return f'{prefix}{self.client_prefix}!{uuid.uuid4().hex[:12]}'
+
+    def queue_for(self, channel):
+        return self.non_local_name(channel)
+
+    def capacity_for(self, channel):
+        return self.inbox_capacity if '!' in channel else self.get_capacity(channel)
+
+    async def send(self, channel, message):
+        assert isinstance(message, dict), 'message is not a dict'
+        self.require_valid_channel_name(channel)
+        queue = self.queue_for(channel)
+        await self.ring.node(queue).push(
+            queue, encode(channel, message), time.time() + self.expiry, self.capacity_for(channel)
+        )
+
+    async def receive(self, channel):
+        self.require_valid_channel_name(channel)
+        if '!' not in channel:
+            broker = self.ring.node(channel)
+            while True:
+                item = await broker.pop(channel, self.poll_timeout)
+                if item is not None:
+                    return decode(item)[1]
+
+        if self.queue_for(channel) != self.inbox:
+            raise ValueError(f'{channel} belongs to another worker')
+        buffer = self.buffer(channel)
+        pump = self.start_pump()
+        pump['receivers'] += 1
+        buffer.receivers += 1
+        try:
+            while True:
+                expires, message = await buffer.queue.get()
+                if expires >= time.time():
+                    return message
+        finally:
+            pump['receivers'] -= 1
+            buffer.receivers -= 1
+            buffer.touched = time.monotonic()
+
+    def buffer(self, channel):
+        buffer = self.buffers.get(channel)
+        if buffer is None:
+            buffer = self.buffers[channel] = LocalBuffer()
+        return buffer
+
+    def start_pump(self):
+        loop = asyncio.get_running_loop()
+        pump = self.pumps.get(loop)
+        if pump is None or pump['stopped']:
+            pump = {'receivers': 0, 'stopped': False}
+            pump['task'] = loop.create_task(self.pump(pump))
+            self.pumps[loop] = pump
+        return pump
+
+    async def pump(self, state):
+        """Move messages from this worker's inbox into per-channel buffers until nobody is listening."""
+        broker = self.ring.node(self.inbox)
+        swept = time.monotonic()
+        try:
+            while True:
+                item = await broker.pop(self.inbox, self.poll_timeout)
+                if item is not None:
+                    channel, message = decode(item)
+                    self.buffer(channel).queue.put_nowait((time.time() + self.expiry, message))
+                elif state['receivers'] == 0:
+                    return
+                if time.monotonic() - swept > self.expiry:
+                    self.sweep_buffers()
+                    swept = time.monotonic()
+        finally:
+            state['stopped'] = True
+            loop = asyncio.get_running_loop()
+            if self.pumps.get(loop) is state:
+                del self.pumps[loop]
+
+    def sweep_buffers(self):
+        # Drop buffers of channels whose consumers went away; nothing will read them.
+        idle_since = time.monotonic() - self.expiry
+        for channel, buffer in list(self.buffers.items()):
+            if buffer.receivers == 0 and buffer.touched < idle_since:
+                del self.buffers[channel]
+
+    # Groups extension
+
+    async def group_add(self, group, channel):
+        self.require_valid_group_name(group)
+        self.require_valid_channel_name(channel)
+        await self.ring.node(group).group_add(group, channel, time.time() + self.group_expiry)
+
+    async def group_discard(self, group, channel):
+        self.require_valid_group_name(group)
+        self.require_valid_channel_name(channel)
+        await self.ring.node(group).group_discard(group, channel)
+
+    async def group_send(self, group, message):
+        assert isinstance(message, dict), 'message is not a dict'
+        self.require_valid_group_name(group)
+        now = time.time()
+        expires = now + self.expiry
+        body = encode('', message)
+        for channel in await self.ring.node(group).group_members(group, now):
+            queue = self.queue_for(channel)
+            try:
+                await self.ring.node(queue).push(
+                    queue, channel.encode() + body, expires, self.capacity_for(channel)
+                )
+            except ChannelFull:
+                pass
+
+    # Flush extension
+
+    async def flush(self):
+        for broker in self.ring.nodes:
+            await broker.flush()
+        self.buffers.clear()
+
+    async def close(self):
+        for broker in self.ring.nodes:
+            await broker.close()
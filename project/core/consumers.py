@@ -0,0 +1,171 @@
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+
+from .realtime import meeting_group, meeting_role, user_groups
+
+UNAUTHENTICATED = 4401
+FORBIDDEN = 4403
+REPLACED = 4409
+MAX_SIGNAL_BYTES = 64 * 1024
+
+
+class AppointmentUpdatesConsumer(AsyncJsonWebsocketConsumer):
+    """Streams ``appointment.updated`` messages for the connected user's appointments."""
+
+    async def connect(self):
+        self.joined = []
+        user = self.scope.get('user')
+        if user is None or not user.is_authenticated:
+            # Accept first so the browser sees the close code and stops retrying.
+            await self.accept()
+            await self.close(code=UNAUTHENTICATED)
+            return
+
+        self.joined = await database_sync_to_async(user_groups)(user)
+        for group in self.joined:
+            await self.channel_layer.group_add(group, self.channel_name)
+        await self.accept()
+
+    async def disconnect(self, code):
+        for group in self.joined:
+            await self.channel_layer.group_discard(group, self.channel_name)
+
+    async def dispatch(self, message):
+        # Pushed updates never touch the database, so skip the thread hop the
+        # base class makes before every message to close stale connections.
+        if message['type'] == 'appointment.update':
+            await self.appointment_update(message)
+        else:
+            await super().dispatch(message)
+
+    async def receive_json(self, content, **kwargs):
+        # The socket is push-only; clients change appointments through the API.
+        pass
+
+    async def appointment_update(self, event):
+        await self.send_json({
+            'type': 'appointment.updated',
+            'event': event['event'],
+            'appointment': event['appointment'],
+        })
+
+
+class MeetingConsumer(AsyncJsonWebsocketConsumer):
+    """
+    WebRTC signaling for one appointment's consultation.
+
+    Only the appointment's doctor and patient can join. Presence is tracked
+    through the channel layer alone: a newcomer announces itself to the
+    meeting group and whoever is already there answers directly, so it works
+    across worker processes. Until both sides are present the client is told
+    it is in the waiting room; after that, SDP offers/answers and ICE
+    candidates go straight to the peer's channel. The doctor always makes the
+    offer, so the two sides never both do.
+    """
+
+    signal_fields = {
+        'offer': ('sdp',),
+        'answer': ('sdp',),
+        'ice-candidate': ('candidate',),
+        'hangup': (),
+    }
+
+    async def connect(self):
+        self.group = None
+        self.peer = None
+        user = self.scope.get('user')
+        appointment_id = self.scope['url_route']['kwargs']['appointment_id']
+        self.role = None
+        if user is not None and user.is_authenticated:
+            self.role = await database_sync_to_async(meeting_role)(user, appointment_id)
+
+        await self.accept()
+        if self.role is None:
+            await self.close(code=FORBIDDEN if user is not None and user.is_authenticated else UNAUTHENTICATED)
+            return
+
+        self.group = meeting_group(appointment_id)
+        await self.channel_layer.group_add(self.group, self.channel_name)
+        await self.send_state()
+        await self.channel_layer.group_send(self.group, {
+            'type': 'presence.join', 'role': self.role, 'channel': self.channel_name,
+        })
+
+    async def disconnect(self, code):
+        if self.group is None:
+            return
+        await self.channel_layer.group_discard(self.group, self.channel_name)
+        await self.channel_layer.group_send(self.group, {'type': 'presence.leave', 'channel': self.channel_name})
+
+    async def dispatch(self, message):
+        # Signaling never touches the database; skip the base class's thread
+        # hop to close stale connections so relays stay fast.
+        handler = getattr(self, message['type'].replace('.', '_'), None)
+        if handler is not None and message['type'].startswith(('presence.', 'signal.')):
+            await handler(message)
+        else:
+            await super().dispatch(message)
+
+    async def send_state(self):
+        await self.send_json({
+            'type': 'state',
+            'state': 'ready' if self.peer else 'waiting',
+            'role': self.role,
+            'initiator': self.role == 'doctor',
+        })
+
+    async def presence_join(self, event):
+        if event['channel'] == self.channel_name:
+            return
+        if event['role'] == self.role:
+            # The same participant opened the meeting again; the newest page wins.
+            await self.close(code=REPLACED)
+            return
+        self.peer = event['channel']
+        await self.channel_layer.send(self.peer, {
+            'type': 'presence.here', 'role': self.role, 'channel': self.channel_name,
+        })
+        await self.send_state()
+
+    async def presence_here(self, event):
+        self.peer = event['channel']
+        await self.send_state()
+
+    async def presence_leave(self, event):
+        if event['channel'] != self.peer:
+            return
+        self.peer = None
+        await self.send_json({'type': 'peer-left'})
+        await self.send_state()
+
+    async def receive(self, text_data=None, bytes_data=None, **kwargs):
+        if text_data is None or len(text_data) > MAX_SIGNAL_BYTES:
+            await self.send_json({'type': 'error', 'error': 'Signals must be JSON text under 64 KiB'})
+            return
+        try:
+            content = await self.decode_json(text_data)
+        except ValueError:
+            # A malformed frame is the sender's problem; keep the call up.
+            await self.send_json({'type': 'error', 'error': 'Signals must be valid JSON'})
+            return
+        await self.receive_json(content, **kwargs)
+
+    async def receive_json(self, content, **kwargs):
+        kind = content.get('type') if isinstance(content, dict) else None
+        if kind not in self.signal_fields:
+            await self.send_json({'type': 'error', 'error': 'Unknown signal type'})
+            return
+        if self.peer is None:
+            await self.send_json({'type': 'error', 'error': 'The other participant has not joined yet'})
+            return
+        signal = {'type': kind}
+        for field in self.signal_fields[kind]:
+            signal[field] = content.get(field)
+        await self.channel_layer.send(self.peer, {
+            'type': 'signal.relay', 'signal': signal, 'channel': self.channel_name,
+        })
+
+    async def signal_relay(self, event):
+        # Ignore anything still in flight from a peer that has since been replaced.
+        if event['channel'] == self.peer:
+            await self.send_json(event['signal'])
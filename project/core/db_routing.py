@@ -0,0 +1,129 @@
+"""
+Primary/replica database routing.
+
+Writes, and reads by default, go to the primary. Views that only read opt
+in with ``@replica_reads``, and their queries are spread over the aliases in
+``DATABASE_REPLICAS``. A client that wrote anything is pinned to the primary
+for ``REPLICA_PIN_SECONDS`` through a cookie, so it reads its own writes
+despite replication lag; the cookie is shared by every worker, unlike any
+in-process record would be.
+"""
+import contextvars
+import functools
+import random
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils.decorators import sync_and_async_middleware
+
+PIN_COOKIE = 'db_primary'
+
+
+class RoutingState:
+    def __init__(self, pinned=False):
+        self.pinned = pinned
+        self.use_replica = False
+        self.wrote = False
+
+
+# One mutable state per request; sync_to_async copies the context into the
+# worker thread, so writes made there are still seen by the middleware.
+_state = contextvars.ContextVar('db_routing_state', default=None)
+
+
+def replica_aliases():
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state is None or not state.use_replica or state.pinned:
+            return None
+        replicas = replica_aliases()
+        # Reads inside a transaction must see the transaction's own writes.
+        if not replicas or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in replica_aliases()
+
+
+@contextmanager
+def use_replicas():
+    state = _state.get()
+    token = None
+    if state is None:
+        # Outside a request (management commands, tests) nothing is pinned.
+        state = RoutingState()
+        token = _state.set(state)
+    previous = state.use_replica
+    state.use_replica = True
+    try:
+        yield
+    finally:
+        state.use_replica = previous
+        if token is not None:
+            _state.reset(token)
+
+
+def replica_reads(view):
+    """Let ``view``'s queries read from a replica unless the client is pinned to the primary."""
+    if iscoroutinefunction(view):
+        @functools.wraps(view)
+        async def wrapper(*args, **kwargs):
+            with use_replicas():
+                return await view(*args, **kwargs)
+    else:
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            with use_replicas():
+                return view(*args, **kwargs)
+    return wrapper
+
+
+@sync_and_async_middleware
+def replica_pin_middleware(get_response):
+    """Track writes during the request and pin the client to the primary after one."""
+
+    def begin(request):
+        state = RoutingState(pinned=PIN_COOKIE in request.COOKIES)
+        return state, _state.set(state)
+
+    def finish(response, state):
+        if state.wrote and replica_aliases():
+            response.set_cookie(
+                PIN_COOKIE, '1', max_age=getattr(settings, 'REPLICA_PIN_SECONDS', 5), httponly=True, samesite='Lax'
+            )
+        return response
+
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            state, token = begin(request)
+            try:
+                response = await get_response(request)
+            finally:
+                _state.reset(token)
+            return finish(response, state)
+    else:
+        def middleware(request):
+            state, token = begin(request)
+            try:
+                response = get_response(request)
+            finally:
+                _state.reset(token)
+            return finish(response, state)
+    return middleware
@@ -0,0 +1,185 @@
+"""
+Doctor directory: filtering, soonest-slot ranking and specialization facets.
+
+Each doctor's soonest open slot in the availability horizon is stored on the
+row (``Doctor.next_available``), so the directory is ordered and paged by the
+database and reading it never writes. Appointment and schedule changes
+recompute the slot of the doctors they touch inside their own transaction
+(``update_next_available``, from ``core.signals``), under the doctor's row
+lock. Rows go stale on their own as time passes, when the stored slot goes
+by or an empty horizon moves on; the ``refresh_doctor_directory`` command
+recomputes those, and rows marked stale by writers that skip the signals,
+in bulk with one appointments query per batch. Run it every few minutes.
+
+Specialization facets are cached under a version that doctor changes bump.
+The version starts from the clock rather than 1, so a counter that was
+evicted or lost with a restart never comes back at a version whose facets
+are still cached. The default cache is per process and other workers do
+not see the bump, so facets also expire after
+``DOCTOR_FACETS_CACHE_SECONDS``.
+"""
+import time
+from collections import defaultdict, namedtuple
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from .availability import get_availability_cache
+from .models import Doctor
+from .scheduling import WEEKDAYS, booked_slots_by_doctor, expand_ranges, parse_ranges
+
+FACET_VERSION_KEY = 'doctor_facets:version'
+REFRESH_BATCH_SIZE = 500
+
+DirectoryEntry = namedtuple('DirectoryEntry', 'id next_available')
+
+
+def first_open_slots(schedules, start, end, after, doctors=None):
+    """
+    Map each doctor id in ``schedules`` (``{doctor_id: available_times}``) to
+    their first open slot between ``start`` and ``end`` that is later than
+    ``after``, or ``None``; one query for all of their bookings, selected by
+    the ``doctors`` queryset when it is given.
+    """
+    booked = booked_slots_by_doctor(list(schedules) if doctors is None else doctors.values('id'), start, end)
+    tz = timezone.get_current_timezone()
+    # Most doctors share a handful of opening hours; parse each one once.
+    parsed = {}
+    found = {}
+    for doctor_id, available_times in schedules.items():
+        found[doctor_id] = None
+        available_times = available_times if isinstance(available_times, dict) else {}
+        day = start
+        while day <= end and found[doctor_id] is None:
+            hours = available_times.get(WEEKDAYS[day.weekday()])
+            if not isinstance(hours, str):
+                slots = expand_ranges(parse_ranges(hours))
+            elif hours in parsed:
+                slots = parsed[hours]
+            else:
+                slots = parsed[hours] = expand_ranges(parse_ranges(hours))
+            for slot in slots:
+                moment = datetime.combine(day, slot)
+                if moment > after and slot not in booked[doctor_id][day]:
+                    found[doctor_id] = moment.replace(tzinfo=tz)
+                    break
+            day += timedelta(days=1)
+    return found
+
+
+def mark_next_available_stale(doctor_ids):
+    Doctor.objects.filter(pk__in=set(doctor_ids) - {None}).update(next_available_checked=None)
+
+
+def store_next_available(doctors):
+    """Recompute and save ``next_available`` for the ``doctors`` queryset; call it in a transaction."""
+    now = datetime.now()
+    horizon = get_availability_cache().horizon()
+    schedules = dict(doctors.select_for_update().values_list('id', 'available_times'))
+    # Slots fall on a shared grid, so one UPDATE per distinct slot is far
+    # cheaper than a CASE over every row of the batch.
+    by_slot = defaultdict(list)
+    for pk, slot in first_open_slots(schedules, horizon[0], horizon[-1], now).items():
+        by_slot[slot].append(pk)
+    for slot, pks in by_slot.items():
+        Doctor.objects.filter(pk__in=pks).update(next_available=slot, next_available_checked=now.date())
+    return len(schedules)
+
+
+def update_next_available(doctor_ids):
+    """Recompute ``next_available`` for ``doctor_ids`` as part of the current write."""
+    doctor_ids = set(doctor_ids) - {None}
+    if doctor_ids:
+        with transaction.atomic():
+            store_next_available(Doctor.objects.filter(pk__in=doctor_ids))
+
+
+def refresh_next_available(doctors=None):
+    """
+    Recompute ``next_available`` for the stale rows among ``doctors`` (all
+    doctors by default) and return how many were recomputed.
+    """
+    now = datetime.now()
+    stale = (Doctor.objects.all() if doctors is None else doctors).filter(
+        Q(next_available_checked__isnull=True)
+        | Q(next_available__lte=timezone.make_aware(now))
+        | Q(next_available__isnull=True, next_available_checked__lt=now.date())
+    ).order_by('pk')
+
+    refreshed = 0
+    while ids := list(stale.values_list('pk', flat=True)[:REFRESH_BATCH_SIZE]):
+        with transaction.atomic():
+            refreshed += store_next_available(stale.filter(pk__in=ids))
+        if len(ids) < REFRESH_BATCH_SIZE:
+            break
+    return refreshed
+
+
+def search_doctors(specialization=None, min_experience=None, available_on=None):
+    """
+    Filter doctors and rank them by their soonest open slot. Doctors with no
+    open slot in the horizon come last, in id order. Without ``available_on``
+    this is a queryset for ``DOCTOR_DIRECTORY_ORDERING`` to page through;
+    with it, a ranked list of ``DirectoryEntry`` (id and first slot that
+    day) for the doctors with an open slot, to be paged and then passed to
+    ``load_doctors``.
+    """
+    doctors = Doctor.objects.all()
+    if specialization:
+        doctors = doctors.filter(specialization=specialization)
+    if min_experience is not None:
+        doctors = doctors.filter(experience_years__gte=min_experience)
+
+    if available_on is None:
+        return doctors.select_related('user')
+
+    candidates = doctors.filter(available_times__has_key=WEEKDAYS[available_on.weekday()])
+    schedules = dict(candidates.values_list('id', 'available_times'))
+    slots = first_open_slots(schedules, available_on, available_on, datetime.now(), doctors=candidates)
+    return sorted(
+        (DirectoryEntry(pk, slot) for pk, slot in slots.items() if slot is not None),
+        key=lambda entry: (entry.next_available, entry.id),
+    )
+
+
+def load_doctors(entries):
+    """The directory rows for a page of ``DirectoryEntry``, in order."""
+    doctors = Doctor.objects.select_related('user').in_bulk([entry.id for entry in entries])
+    rows = []
+    for entry in entries:
+        if entry.id in doctors:
+            doctor = doctors[entry.id]
+            doctor.next_available = entry.next_available
+            rows.append(doctor)
+    return rows
+
+
+def facet_version():
+    return cache.get_or_set(FACET_VERSION_KEY, time.time_ns, timeout=None)
+
+
+def bump_facet_version():
+    try:
+        cache.incr(FACET_VERSION_KEY)
+    except ValueError:
+        cache.set(FACET_VERSION_KEY, time.time_ns(), timeout=None)
+
+
+def specialization_facets():
+    version = facet_version()
+    key = f'doctor_facets:{version}'
+    facets = cache.get(key)
+    if facets is None:
+        facets = [
+            {'name': row['specialization'], 'count': row['count']}
+            for row in Doctor.objects.values('specialization')
+            .annotate(count=Count('id'))
+            .order_by('specialization')
+            if row['specialization']
+        ]
+        cache.set(key, facets, timeout=getattr(settings, 'DOCTOR_FACETS_CACHE_SECONDS', 300))
+    return version, facets
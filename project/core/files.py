@@ -0,0 +1,246 @@
+"""
+Streaming health-record uploads and ranged downloads.
+
+Uploads are resumable: the client opens an upload, then sends the file as a
+series of ``PATCH`` bodies tagged with ``Upload-Offset``. Each body is copied
+to a partial file on disk in fixed-size blocks, so memory use does not depend
+on the size of the file, and hashed on the way for content-addressed storage.
+``hashlib`` cannot save a digest's state, so the running digest lives in the
+process; when a chunk lands on another worker, or after a restart, storage
+hashes the finished file instead. Downloads go through ``ranged_file_response``, which
+honours ``Range``, ``If-Range`` and ``If-None-Match``.
+"""
+import hashlib
+import os
+import re
+from pathlib import Path
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.db import transaction
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified
+from django.utils.http import http_date, parse_etags
+
+BLOCK_SIZE = 64 * 1024
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+MAX_RUNNING_DIGESTS = 1000
+
+# Upload id -> (offset, sha256 of the partial file up to that offset).
+_running_digests = {}
+
+
+class UploadError(Exception):
+    def __init__(self, message, status):
+        super().__init__(message)
+        self.status = status
+
+
+def upload_dir():
+    path = Path(getattr(settings, 'HEALTH_RECORD_UPLOAD_DIR', Path(settings.MEDIA_ROOT) / 'uploads'))
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def max_upload_size():
+    return getattr(settings, 'HEALTH_RECORD_MAX_UPLOAD_SIZE', 2 * 1024 ** 3)
+
+
+def partial_path(upload):
+    return upload_dir() / f'{upload.pk}.part'
+
+
+def resume_digest(upload):
+    offset, hasher = _running_digests.pop(upload.pk, (None, None))
+    if offset == upload.offset:
+        return hasher
+    return hashlib.sha256() if upload.offset == 0 else None
+
+
+def keep_digest(upload, hasher):
+    if len(_running_digests) >= MAX_RUNNING_DIGESTS:
+        # Abandoned uploads never complete; forget the oldest.
+        del _running_digests[next(iter(_running_digests))]
+    _running_digests[upload.pk] = (upload.offset, hasher)
+
+
+def partial_digest(upload):
+    """The SHA-256 of ``upload``'s finished partial file, or ``None`` if this process did not hash all of it."""
+    offset, hasher = _running_digests.pop(upload.pk, (None, None))
+    return hasher.hexdigest() if offset == upload.size else None
+
+
+def append_chunk(upload, stream, offset):
+    """
+    Copy ``stream`` to the end of ``upload``'s partial file and return the new
+    offset. Whatever arrived before a dropped connection is kept, so the
+    client can resume from the offset reported afterwards.
+
+    The upload's row stays locked while the chunk is written, so a retried
+    request that raced the original finds the offset already moved and gets
+    a 409 instead of appending the same bytes again.
+    """
+    failure = None
+    with transaction.atomic():
+        locked = type(upload).objects.select_for_update().filter(pk=upload.pk).first()
+        if locked is None:
+            raise UploadError('Upload is already complete', status=409)
+        upload.offset = locked.offset
+
+        path = partial_path(upload)
+        on_disk = path.stat().st_size if path.exists() else 0
+        if on_disk < upload.offset:
+            # The partial file lost data (e.g. it was cleaned up); resume from what is left.
+            upload.offset = on_disk
+            upload.save(update_fields=['offset', 'updated_at'])
+        if offset != upload.offset:
+            raise UploadError(f'Expected Upload-Offset {upload.offset}', status=409)
+
+        with open(path, 'ab') as destination:
+            # Drop bytes from an earlier request that died before the offset was saved.
+            destination.truncate(upload.offset)
+            destination.seek(upload.offset)
+            hasher = resume_digest(upload)
+            try:
+                while True:
+                    block = stream.read(BLOCK_SIZE)
+                    if not block:
+                        break
+                    if destination.tell() + len(block) > upload.size:
+                        # Back to where the request started; truncate() leaves the position alone.
+                        destination.truncate(upload.offset)
+                        destination.seek(upload.offset)
+                        hasher = None
+                        raise UploadError('Chunk goes past the declared upload size', status=413)
+                    destination.write(block)
+                    if hasher is not None:
+                        hasher.update(block)
+            except Exception as e:
+                # Raised once the offset is committed, so what arrived is kept.
+                failure = e
+            upload.offset = destination.tell()
+            upload.save(update_fields=['offset', 'updated_at'])
+            if hasher is not None:
+                keep_digest(upload, hasher)
+    if failure is not None:
+        raise failure
+    return upload.offset
+
+
+class HashingUploadHandler(TemporaryFileUploadHandler):
+    """
+    Spools multipart uploads to disk and computes their SHA-256 as the chunks
+    arrive, so content-addressed storage does not read the file a second time.
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.hasher = hashlib.sha256()
+
+    def receive_data_chunk(self, raw_data, start):
+        self.hasher.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        file = super().file_complete(file_size)
+        file.sha256 = self.hasher.hexdigest()
+        return file
+
+
+class PartialUpload(File):
+    def __init__(self, file, sha256=None):
+        super().__init__(file)
+        # Read by ContentAddressedStorage; None makes it hash the file itself.
+        self.sha256 = sha256
+
+    # Lets FileSystemStorage move the finished file into place instead of copying it.
+    def temporary_file_path(self):
+        return self.file.name
+
+
+def discard_partial(upload):
+    _running_digests.pop(upload.pk, None)
+    try:
+        os.remove(partial_path(upload))
+    except FileNotFoundError:
+        pass
+
+
+def file_etag(fieldfile):
+    storage = fieldfile.storage
+    size = storage.size(fieldfile.name)
+    modified = storage.get_modified_time(fieldfile.name)
+    return f'"{size:x}-{int(modified.timestamp() * 1000):x}"', size, modified
+
+
+def parse_range(header, size):
+    """Return ``(start, end)`` inclusive for a single byte range, or ``None`` to send the whole file."""
+    match = RANGE_RE.match(header.strip())
+    if not match or not any(match.groups()):
+        return None
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    else:
+        start = max(size - int(last), 0)
+        end = size - 1
+    if start > end or start >= size:
+        raise ValueError('Unsatisfiable range')
+    return start, end
+
+
+class RangeFile:
+    def __init__(self, file, start, length):
+        self.file = file
+        self.file.seek(start)
+        self.remaining = length
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b''
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def ranged_file_response(request, fieldfile, filename=None):
+    etag, size, modified = file_etag(fieldfile)
+    headers = {
+        'ETag': etag,
+        'Last-Modified': http_date(modified.timestamp()),
+        'Accept-Ranges': 'bytes',
+        'Cache-Control': 'private, no-cache',
+    }
+
+    if_none_match = parse_etags(request.headers.get('If-None-Match', ''))
+    if etag in if_none_match or '*' in if_none_match:
+        return HttpResponseNotModified(headers=headers)
+
+    byte_range = None
+    range_header = request.headers.get('Range')
+    if_range = request.headers.get('If-Range')
+    if range_header and (not if_range or if_range == etag):
+        try:
+            byte_range = parse_range(range_header, size)
+        except ValueError:
+            return HttpResponse(status=416, headers=dict(headers, **{'Content-Range': f'bytes */{size}'}))
+
+    filename = filename or os.path.basename(fieldfile.name)
+    file = fieldfile.storage.open(fieldfile.name, 'rb')
+    if byte_range is None:
+        response = FileResponse(file, as_attachment=False, filename=filename)
+        response['Content-Length'] = size
+    else:
+        start, end = byte_range
+        response = FileResponse(RangeFile(file, start, end - start + 1), status=206, filename=filename)
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = end - start + 1
+    for header, value in headers.items():
+        response[header] = value
+    return response
@@ -0,0 +1,108 @@
+"""
+Nearest-pharmacy lookup on a fixed latitude/longitude grid.
+
+Every pharmacy with coordinates is filed under the integer id of its
+``GRID_DEGREES`` cell (``Pharmacy.geo_cell``, set on save by
+``core.signals`` and covered by a B-tree index). A radius query turns the
+bounding box of the circle into one index range per grid row and measures
+great-circle distance only for the pharmacies in those cells, so it works
+the same on SQLite and PostgreSQL without a spatial extension.
+
+The grid does not wrap at the antimeridian; the service area is nowhere
+near it.
+"""
+import math
+from typing import NamedTuple
+
+from django.conf import settings
+from django.db.models import Q
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+GRID_DEGREES = 0.1
+GRID_ROWS = round(180 / GRID_DEGREES)
+GRID_COLUMNS = round(360 / GRID_DEGREES)
+
+
+class Location(NamedTuple):
+    latitude: float
+    longitude: float
+    radius_km: float
+
+
+def grid_row(latitude):
+    return min(int((latitude + 90) / GRID_DEGREES), GRID_ROWS - 1)
+
+
+def grid_column(longitude):
+    return min(int((longitude + 180) / GRID_DEGREES), GRID_COLUMNS - 1)
+
+
+def grid_cell(latitude, longitude):
+    if latitude is None or longitude is None:
+        return None
+    return grid_row(latitude) * GRID_COLUMNS + grid_column(longitude)
+
+
+def distance_km(latitude, longitude, other_latitude, other_longitude):
+    """Great-circle (haversine) distance."""
+    phi, other_phi = math.radians(latitude), math.radians(other_latitude)
+    half_chord = (
+        math.sin((other_phi - phi) / 2) ** 2
+        + math.cos(phi) * math.cos(other_phi) * math.sin(math.radians(other_longitude - longitude) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(half_chord)))
+
+
+def cells_within(location, field='geo_cell'):
+    """A filter on ``field`` matching the grid cells that overlap the circle's bounding box."""
+    span = location.radius_km / KM_PER_DEGREE
+    south, north = max(location.latitude - span, -90), min(location.latitude + span, 90)
+    # Meridians converge, so the box is widest at its edge nearest a pole.
+    widest = math.cos(math.radians(max(abs(south), abs(north))))
+    span = location.radius_km / (KM_PER_DEGREE * widest) if widest > 1e-6 else 360
+    west, east = max(location.longitude - span, -180), min(location.longitude + span, 180)
+
+    first, last = grid_column(west), grid_column(east)
+    condition = Q()
+    for row in range(grid_row(south), grid_row(north) + 1):
+        condition |= Q(**{f'{field}__range': (row * GRID_COLUMNS + first, row * GRID_COLUMNS + last)})
+    return condition
+
+
+def by_distance(location, items, coordinates):
+    """``(distance_km, item)`` for the items within the radius, nearest first; ``coordinates(item)`` gives lat/lng."""
+    found = []
+    for item in items:
+        latitude, longitude = coordinates(item)
+        if latitude is None or longitude is None:
+            continue
+        distance = distance_km(location.latitude, location.longitude, latitude, longitude)
+        if distance <= location.radius_km:
+            found.append((distance, item))
+    found.sort(key=lambda pair: pair[0])
+    return found
+
+
+def parse_location(params):
+    """
+    ``Location`` from ``lat``, ``lng`` and optional ``radius_km`` query
+    parameters, or None when no location was given. Raises ``ValueError``
+    for coordinates or a radius out of range.
+    """
+    if not params.get('lat') and not params.get('lng'):
+        return None
+    default_radius = getattr(settings, 'PHARMACY_SEARCH_RADIUS_KM', 25)
+    max_radius = getattr(settings, 'PHARMACY_SEARCH_MAX_RADIUS_KM', 100)
+    try:
+        location = Location(
+            float(params.get('lat', '')), float(params.get('lng', '')),
+            float(params.get('radius_km') or default_radius),
+        )
+    except ValueError:
+        raise ValueError('lat, lng and radius_km must be numbers')
+    if not (-90 <= location.latitude <= 90 and -180 <= location.longitude <= 180):
+        raise ValueError('lat must be within [-90, 90] and lng within [-180, 180]')
+    if not 0 < location.radius_km <= max_radius:
+        raise ValueError(f'radius_km must be greater than 0 and at most {max_radius}')
+    return location
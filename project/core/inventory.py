@@ -0,0 +1,133 @@
+"""
+Per-medicine availability aggregates.
+
+``MedicineAvailability`` holds each medicine's total units in stock, the
+number of pharmacies stocking it and its lowest price among them, so search
+results and availability filters read one precomputed row instead of
+summing ``PharmacyMedicine`` on every query. ``Medicine.stock`` and
+``Medicine.is_available`` mirror the same totals.
+
+``refresh_availability`` recomputes the given medicines from
+``PharmacyMedicine`` inside the caller's transaction: single saves and
+deletes go through ``core.signals``, bulk writes call it with the ids they
+touched. Recomputing rather than applying deltas keeps a refresh right
+however the rows changed. The aggregate rows are locked first, so
+concurrent writers to one medicine recompute one after the other and the
+later one sees the earlier one's rows.
+
+Pharmacies do not price medicines individually yet, so ``min_price`` is the
+catalogue price while any pharmacy has stock, and empty otherwise.
+"""
+from typing import NamedTuple
+
+from django.db import connection, transaction
+from django.db.models import Count, Exists, OuterRef, Subquery, Sum
+from django.db.models.functions import Least
+from django.utils import timezone
+
+from .models import Medicine, MedicineAvailability, PharmacyMedicine
+
+MAX_STOCK = 2147483647
+DEFAULT_BATCH_SIZE = 2000
+AVAILABILITY_TABLE = MedicineAvailability._meta.db_table
+
+
+class Availability(NamedTuple):
+    total_stock: int
+    pharmacy_count: int
+    min_price: object
+
+
+def compute_availability(medicine_ids):
+    """Fresh ``Availability`` for every existing medicine in ``medicine_ids``."""
+    in_stock = (
+        PharmacyMedicine.objects.filter(medicine_id__in=medicine_ids, stock__gt=0)
+        .values('medicine_id')
+        .annotate(total_stock=Sum('stock'), pharmacy_count=Count('id'))
+        .order_by()
+    )
+    totals = {row['medicine_id']: (row['total_stock'], row['pharmacy_count']) for row in in_stock}
+    availability = {}
+    for medicine_id, price in Medicine.objects.filter(id__in=medicine_ids).values_list('id', 'price'):
+        total_stock, pharmacy_count = totals.get(medicine_id, (0, 0))
+        availability[medicine_id] = Availability(total_stock, pharmacy_count, price if pharmacy_count else None)
+    return availability
+
+
+def mirrored_fields(availability):
+    return min(availability.total_stock, MAX_STOCK), availability.pharmacy_count > 0
+
+
+def refresh_availability(medicine_ids):
+    medicine_ids = sorted(set(medicine_ids))
+    if not medicine_ids:
+        return
+    with transaction.atomic():
+        list(
+            MedicineAvailability.objects.select_for_update()
+            .filter(medicine_id__in=medicine_ids)
+            .order_by('medicine_id')
+            .values_list('medicine_id', flat=True)
+        )
+        # One INSERT ... SELECT upsert (SQLite and PostgreSQL) instead of
+        # building a model instance per medicine, which dominated bulk imports.
+        placeholders = ', '.join(['%s'] * len(medicine_ids))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {AVAILABILITY_TABLE} (medicine_id, total_stock, pharmacy_count, min_price, updated_at) '
+                f'SELECT m.id, COALESCE(SUM(pm.stock), 0), COUNT(pm.id), '
+                f'CASE WHEN COUNT(pm.id) > 0 THEN m.price END, %s '
+                f'FROM {Medicine._meta.db_table} m '
+                f'LEFT JOIN {PharmacyMedicine._meta.db_table} pm ON pm.medicine_id = m.id AND pm.stock > 0 '
+                f'WHERE m.id IN ({placeholders}) GROUP BY m.id, m.price '
+                f'ON CONFLICT (medicine_id) DO UPDATE SET total_stock = excluded.total_stock, '
+                f'pharmacy_count = excluded.pharmacy_count, min_price = excluded.min_price, '
+                f'updated_at = excluded.updated_at',
+                [timezone.now(), *medicine_ids],
+            )
+        aggregate = MedicineAvailability.objects.filter(medicine=OuterRef('pk'))
+        Medicine.objects.filter(id__in=medicine_ids).update(
+            stock=Least(Subquery(aggregate.values('total_stock')), MAX_STOCK),
+            is_available=Exists(aggregate.filter(pharmacy_count__gt=0)),
+        )
+
+
+def medicine_id_batches(batch_size=DEFAULT_BATCH_SIZE):
+    last = 0
+    while ids := list(Medicine.objects.filter(id__gt=last).order_by('id').values_list('id', flat=True)[:batch_size]):
+        yield ids
+        last = ids[-1]
+
+
+def rebuild_availability(batch_size=DEFAULT_BATCH_SIZE):
+    """Recompute every medicine's aggregate, one transaction per batch; return how many were refreshed."""
+    refreshed = 0
+    for ids in medicine_id_batches(batch_size):
+        refresh_availability(ids)
+        refreshed += len(ids)
+    return refreshed
+
+
+def find_drift(batch_size=DEFAULT_BATCH_SIZE):
+    """Yield ``(medicine_id, problem)`` for every medicine whose stored aggregate or mirrored fields are wrong."""
+    for ids in medicine_id_batches(batch_size):
+        fresh = compute_availability(ids)
+        stored = {
+            row.medicine_id: Availability(row.total_stock, row.pharmacy_count, row.min_price)
+            for row in MedicineAvailability.objects.filter(medicine_id__in=ids)
+        }
+        mirrored = {
+            medicine_id: (stock, is_available)
+            for medicine_id, stock, is_available in Medicine.objects.filter(id__in=ids).values_list(
+                'id', 'stock', 'is_available'
+            )
+        }
+        for medicine_id, expected in fresh.items():
+            if medicine_id not in stored:
+                yield medicine_id, 'no aggregate row'
+            elif stored[medicine_id] != expected:
+                yield medicine_id, f'aggregate {tuple(stored[medicine_id])}, expected {tuple(expected)}'
+            elif mirrored.get(medicine_id) != mirrored_fields(expected):
+                yield medicine_id, (
+                    f'stock/is_available {mirrored.get(medicine_id)}, expected {mirrored_fields(expected)}'
+                )
@@ -0,0 +1,146 @@
+import random
+import statistics
+import time
+from datetime import date, time as clock, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from core.models import (
+    Appointment, Doctor, HealthRecord, Medicine, Patient, Pharmacy, PharmacyMedicine, User
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed appointments, health records and pharmacy stock inside a rolled-back "
+        "transaction and report query plans and latency with and without the "
+        "access-pattern indexes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--appointments", type=int, default=1_000_000)
+        parser.add_argument("--doctors", type=int, default=500)
+        parser.add_argument("--patients", type=int, default=20_000)
+        parser.add_argument("--repeat", type=int, default=20)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        with transaction.atomic():
+            doctors, patients, medicines = self.seed(rng, options)
+            doctor, patient, medicine = doctors[0], patients[0], medicines[0]
+            queries = {
+                "appointments by doctor": lambda: Appointment.objects.filter(
+                    doctor=doctor).order_by("-date", "-time")[:50],
+                "appointments by patient": lambda: Appointment.objects.filter(
+                    patient=patient).order_by("-date", "-time")[:50],
+                "appointments by doctor+patient": lambda: Appointment.objects.filter(
+                    doctor=doctor, patient=patient).order_by("-date", "-time"),
+                "health records by patient": lambda: HealthRecord.objects.filter(
+                    patient=patient).order_by("-date")[:50],
+                "in-stock pharmacies": lambda: PharmacyMedicine.objects.filter(
+                    medicine=medicine, stock__gt=0),
+            }
+
+            with_indexes = self.measure(queries, options["repeat"], "with")
+            self.drop_indexes()
+            without_indexes = self.measure(queries, options["repeat"], "without")
+
+            for label in queries:
+                after_plan, after = with_indexes[label]
+                before_plan, before = without_indexes[label]
+                self.stdout.write(self.style.MIGRATE_HEADING(label))
+                self.stdout.write(f"  without indexes: {before:8.3f}ms  {before_plan}")
+                self.stdout.write(f"  with indexes:    {after:8.3f}ms  {after_plan}")
+            transaction.set_rollback(True)
+
+    def seed(self, rng, options):
+        password = make_password(None)
+        users = User.objects.bulk_create(
+            User(username=f"bench-doctor-{i}", password=password, is_doctor=True, is_patient=False)
+            for i in range(options["doctors"])
+        )
+        doctors = Doctor.objects.bulk_create(
+            Doctor(user=user, specialization="General Medicine", license_number=f"BENCH-{user.pk}")
+            for user in users
+        )
+        users = User.objects.bulk_create(
+            User(username=f"bench-patient-{i}", password=password)
+            for i in range(options["patients"])
+        )
+        patients = Patient.objects.bulk_create(Patient(user=user) for user in users)
+
+        start = date.today() - timedelta(days=3 * 365)
+        statuses = [choice for choice, _ in Appointment.STATUS_CHOICES]
+        times = [clock(hour, minute) for hour in range(8, 18) for minute in (0, 15, 30, 45)]
+        # Distinct (doctor, day, time) slots, so active appointments never
+        # break unique_active_doctor_slot.
+        slots = rng.sample(range(len(doctors) * 3 * 365 * len(times)), options["appointments"])
+        self.bulk(Appointment, (
+            Appointment(
+                doctor=doctors[slot % len(doctors)],
+                patient=rng.choice(patients),
+                date=start + timedelta(days=slot // len(doctors) // len(times)),
+                time=times[slot // len(doctors) % len(times)],
+                status=rng.choice(statuses),
+            )
+            for slot in slots
+        ))
+        self.bulk(HealthRecord, (
+            HealthRecord(patient=rng.choice(patients), record_type="lab", file="health_records/bench.pdf")
+            for _ in range(options["appointments"] // 10)
+        ))
+
+        medicines = Medicine.objects.bulk_create(
+            Medicine(name=f"Bench medicine {i}", manufacturer="Bench", price=Decimal("1.00"))
+            for i in range(2000)
+        )
+        pharmacies = Pharmacy.objects.bulk_create(
+            Pharmacy(name=f"Bench pharmacy {i}", address="-", phone_number="-", email="bench@example.com")
+            for i in range(200)
+        )
+        self.bulk(PharmacyMedicine, (
+            PharmacyMedicine(pharmacy=pharmacy, medicine=medicine, stock=rng.choice([0, 0, 0, 5, 20]))
+            for pharmacy in pharmacies
+            for medicine in rng.sample(medicines, 500)
+        ))
+        return doctors, patients, medicines
+
+    def bulk(self, model, objects, batch_size=10_000):
+        batch = []
+        for obj in objects:
+            batch.append(obj)
+            if len(batch) == batch_size:
+                model.objects.bulk_create(batch)
+                batch = []
+        model.objects.bulk_create(batch)
+
+    def explain(self, queryset, phase):
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            # The trailing comment stops SQLite from reusing a plan cached before the DDL.
+            cursor.execute(f"{connection.ops.explain_query_prefix()} {sql} -- {phase}", params)
+            return " | ".join(str(row[-1]) for row in cursor.fetchall())
+
+    def measure(self, queries, repeat, phase):
+        results = {}
+        for label, build in queries.items():
+            plan = self.explain(build(), phase)
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                list(build())
+                timings.append((time.perf_counter() - started) * 1000)
+            results[label] = (plan, statistics.median(timings))
+        return results
+
+    def drop_indexes(self):
+        # Not entered as a context manager: SQLite refuses that inside atomic(),
+        # and the DROP INDEX statements are rolled back with everything else.
+        schema_editor = connection.schema_editor()
+        for model in (Appointment, HealthRecord, PharmacyMedicine):
+            for index in model._meta.indexes:
+                schema_editor.remove_index(model, index)
@@ -0,0 +1,137 @@
+import asyncio
+import statistics
+import time
+from datetime import date, time as clock, timedelta
+
+from channels.layers import get_channel_layer
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+
+from core.models import Appointment, Doctor, Patient, User
+from core.realtime import appointment_message
+from core.routing import websocket_urlpatterns
+
+
+class Command(BaseCommand):
+    help = (
+        "Open thousands of concurrent appointment-update sockets against the ASGI "
+        "application in this process, push status changes through the channel layer "
+        "and report connect time, delivery latency and throughput."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sockets", type=int, default=2000, help="Patient sockets, one appointment each.")
+        parser.add_argument("--doctors", type=int, default=20, help="Doctors, one socket each.")
+        parser.add_argument("--rounds", type=int, default=3, help="Status changes per appointment.")
+        parser.add_argument("--concurrency", type=int, default=100, help="Updates in flight at once.")
+
+    def handle(self, *args, **options):
+        # The consumers look users up from other threads, so the data has to be
+        # committed; it is deleted again afterwards.
+        doctors, patients, appointments = self.seed(options)
+        try:
+            messages = [appointment_message(appointment, "updated") for appointment in appointments]
+            asyncio.run(self.run(doctors, patients, messages, options))
+        finally:
+            User.objects.filter(username__startswith="bench-socket-").delete()
+
+    def seed(self, options):
+        password = make_password(None)
+        users = User.objects.bulk_create(
+            User(username=f"bench-socket-doctor-{i}", password=password, is_doctor=True, is_patient=False)
+            for i in range(options["doctors"])
+        )
+        doctors = Doctor.objects.bulk_create(
+            Doctor(user=user, specialization="General Medicine", license_number=f"BENCH-SOCKET-{user.pk}")
+            for user in users
+        )
+        users = User.objects.bulk_create(
+            User(username=f"bench-socket-patient-{i}", password=password) for i in range(options["sockets"])
+        )
+        patients = Patient.objects.bulk_create(Patient(user=user) for user in users)
+
+        day = date.today() + timedelta(days=1)
+        Appointment.objects.bulk_create(
+            Appointment(
+                doctor=doctors[i % len(doctors)], patient=patient,
+                date=day + timedelta(days=i // (len(doctors) * 16)),
+                time=clock(8 + (i // len(doctors)) % 16 // 2, 30 * ((i // len(doctors)) % 2)),
+                status="confirmed",
+            )
+            for i, patient in enumerate(patients)
+        )
+        appointments = list(
+            Appointment.objects.filter(patient__in=patients).select_related("doctor__user", "patient__user")
+        )
+        return doctors, patients, appointments
+
+    async def connect(self, application, user):
+        communicator = WebsocketCommunicator(application, "/ws/appointments/")
+        communicator.scope["user"] = user
+        connected, _ = await communicator.connect(timeout=30)
+        if not connected:
+            raise RuntimeError(f"Socket for {user.username} was rejected")
+        return communicator
+
+    async def run(self, doctors, patients, messages, options):
+        application = URLRouter(websocket_urlpatterns)
+        layer = get_channel_layer()
+
+        started = time.perf_counter()
+        doctor_sockets = await asyncio.gather(*(self.connect(application, d.user) for d in doctors))
+        patient_sockets = await asyncio.gather(*(self.connect(application, p.user) for p in patients))
+        connect_seconds = time.perf_counter() - started
+        sockets = {p.id: s for p, s in zip(patients, patient_sockets)}
+        total = len(doctor_sockets) + len(patient_sockets)
+        self.stdout.write(
+            f"Connected {total} sockets in {connect_seconds:.2f}s "
+            f"({connect_seconds * 1000 / total:.2f}ms each)"
+        )
+
+        received = {"doctor": 0}
+
+        async def drain(communicator):
+            while True:
+                await communicator.receive_json_from(timeout=3600)
+                received["doctor"] += 1
+
+        drains = [asyncio.create_task(drain(socket)) for socket in doctor_sockets]
+        latencies = []
+        gate = asyncio.Semaphore(options["concurrency"])
+
+        async def deliver(groups, message):
+            async with gate:
+                sent = time.perf_counter()
+                for group in groups:
+                    await layer.group_send(group, message)
+                patient_id = message["appointment"]["patient"]["id"]
+                await sockets[patient_id].receive_json_from(timeout=30)
+                latencies.append((time.perf_counter() - sent) * 1000)
+
+        started = time.perf_counter()
+        for _ in range(options["rounds"]):
+            await asyncio.gather(*(deliver(groups, message) for groups, message in messages))
+        expected = len(messages) * options["rounds"]
+        while received["doctor"] < expected and time.perf_counter() - started < 60:
+            await asyncio.sleep(0.01)
+        elapsed = time.perf_counter() - started
+
+        for task in drains:
+            task.cancel()
+        await asyncio.gather(*(s.disconnect() for s in doctor_sockets + patient_sockets))
+
+        delivered = len(latencies) + received["doctor"]
+        latencies.sort()
+        self.stdout.write(
+            f"Delivered {delivered} messages ({len(latencies)} to patients, {received['doctor']} to doctors) "
+            f"in {elapsed:.2f}s: {delivered / elapsed:,.0f} msg/s"
+        )
+        self.stdout.write(
+            f"Patient latency: p50 {statistics.median(latencies):.2f}ms  "
+            f"p95 {latencies[int(len(latencies) * 0.95)]:.2f}ms  "
+            f"p99 {latencies[int(len(latencies) * 0.99)]:.2f}ms"
+        )
+        if received["doctor"] != expected:
+            self.stdout.write(self.style.WARNING(f"Doctors missed {expected - received['doctor']} messages"))
@@ -0,0 +1,195 @@
+import asyncio
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from datetime import date, time as clock, timedelta
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncClient, Client
+
+from core.models import Appointment, Doctor, HealthRecord, Medicine, Patient, Pharmacy, PharmacyMedicine, User
+
+ENDPOINTS = [
+    ("appointments", "/api/appointments/", "/api/async/appointments/", "patient"),
+    ("health records", "/api/health-records/", "/api/async/health-records/", "patient"),
+    ("medicine search", "/api/medicines/search/?query=bench", "/api/async/medicines/search/?query=bench", "patient"),
+    ("doctor schedule", "/api/doctor/schedule/", "/api/async/doctor/schedule/", "doctor"),
+]
+
+
+class HTTPConnection:
+    """A keep-alive HTTP/1.1 client, just enough for Django's Content-Length responses."""
+
+    def __init__(self, port, cookie):
+        self.port = port
+        self.cookie = cookie
+        self.reader = self.writer = None
+
+    async def get(self, path):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection("127.0.0.1", self.port)
+        self.writer.write(
+            f"GET {path} HTTP/1.1\r\nHost: localhost\r\nCookie: {self.cookie}\r\n\r\n".encode()
+        )
+        head = (await self.reader.readuntil(b"\r\n\r\n")).decode("latin-1").split("\r\n")
+        headers = dict(line.lower().split(": ", 1) for line in head[1:] if line)
+        await self.reader.readexactly(int(headers["content-length"]))
+        return int(head[0].split()[1])
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+class InProcessConnection:
+    def __init__(self, cookie):
+        self.client = AsyncClient(HTTP_COOKIE=cookie)
+
+    async def get(self, path):
+        return (await self.client.get(path)).status_code
+
+    async def close(self):
+        pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the sync DRF read APIs with their async-native versions under ASGI: "
+        "many concurrent clients issue requests against each pair of endpoints and "
+        "the command reports throughput and p50/p99 latency."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--clients", type=int, default=1000, help="Concurrent clients.")
+        parser.add_argument("--requests", type=int, default=5, help="Requests per client and endpoint.")
+        parser.add_argument("--users", type=int, default=50, help="Seeded doctors and patients (each).")
+        parser.add_argument(
+            "--server", choices=["uvicorn", "inprocess"], default="uvicorn",
+            help="Serve through a uvicorn subprocess, or call the ASGI handler in this process.",
+        )
+        parser.add_argument("--port", type=int, default=8765)
+
+    def handle(self, *args, **options):
+        # Requests are served from other threads (or another process), so the
+        # data has to be committed; it is deleted again afterwards.
+        cookies = self.seed(options)
+        server = None
+        try:
+            if options["server"] == "uvicorn":
+                server = self.start_uvicorn(options["port"])
+            asyncio.run(self.run(cookies, options))
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait()
+            User.objects.filter(username__startswith="bench-api-").delete()
+            Medicine.objects.filter(name__startswith="Bench Medicine").delete()
+            Pharmacy.objects.filter(name="Bench Pharmacy").delete()
+
+    def seed(self, options):
+        password = make_password(None)
+        users = User.objects.bulk_create(
+            User(username=f"bench-api-doctor-{i}", password=password, is_doctor=True, is_patient=False)
+            for i in range(options["users"])
+        )
+        doctors = Doctor.objects.bulk_create(
+            Doctor(
+                user=user, specialization="General Medicine", license_number=f"BENCH-API-{user.pk}",
+                available_times={"monday": "09:00-13:00"},
+            )
+            for user in users
+        )
+        users = User.objects.bulk_create(
+            User(username=f"bench-api-patient-{i}", password=password) for i in range(options["users"])
+        )
+        patients = Patient.objects.bulk_create(Patient(user=user) for user in users)
+
+        start = date.today() - timedelta(days=365)
+        Appointment.objects.bulk_create(
+            Appointment(
+                doctor=doctors[(i + j) % len(doctors)], patient=patient,
+                date=start + timedelta(days=j * 7), time=clock(9 + i % 8), status="completed",
+            )
+            for i, patient in enumerate(patients)
+            for j in range(20)
+        )
+        HealthRecord.objects.bulk_create(
+            HealthRecord(patient=patient, record_type="lab", description=f"Panel {j}", date=start + timedelta(days=j))
+            for patient in patients
+            for j in range(20)
+        )
+        # Created one by one so the search index picks them up.
+        pharmacy = Pharmacy.objects.create(name="Bench Pharmacy", address="Bench Road", phone_number="0")
+        for i in range(50):
+            medicine = Medicine.objects.create(name=f"Bench Medicine {i}", manufacturer="Bench Labs", price=10 + i)
+            PharmacyMedicine.objects.create(pharmacy=pharmacy, medicine=medicine, stock=i % 5)
+
+        cookies = {"doctor": [], "patient": []}
+        for role, people in (("doctor", doctors), ("patient", patients)):
+            for person in people:
+                client = Client()
+                client.force_login(User.objects.get(pk=person.user_id))
+                cookies[role].append(f"{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}")
+        return cookies
+
+    def start_uvicorn(self, port):
+        server = subprocess.Popen(
+            [
+                sys.executable, "-m", "uvicorn", "telemedicine.asgi:application", "--port", str(port),
+                "--log-level", "warning", "--no-access-log", "--backlog", "4096",
+            ],
+            cwd=settings.BASE_DIR, env=os.environ.copy(),
+        )
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise CommandError("uvicorn exited; is it installed?")
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout=1).close()
+                return server
+            except OSError:
+                time.sleep(0.1)
+        server.terminate()
+        raise CommandError(f"uvicorn did not start listening on port {port}")
+
+    def connect(self, cookie, options):
+        if options["server"] == "uvicorn":
+            return HTTPConnection(options["port"], cookie)
+        return InProcessConnection(cookie)
+
+    async def load(self, path, role, cookies, options):
+        connections = [self.connect(cookies[role][i % len(cookies[role])], options) for i in range(options["clients"])]
+        latencies = []
+        failures = 0
+
+        async def client(connection):
+            nonlocal failures
+            for _ in range(options["requests"]):
+                sent = time.perf_counter()
+                if await connection.get(path) != 200:
+                    failures += 1
+                latencies.append((time.perf_counter() - sent) * 1000)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(client(connection) for connection in connections))
+        elapsed = time.perf_counter() - started
+        await asyncio.gather(*(connection.close() for connection in connections))
+        latencies.sort()
+        return len(latencies) / elapsed, statistics.median(latencies), latencies[int(len(latencies) * 0.99)], failures
+
+    async def run(self, cookies, options):
+        self.stdout.write(
+            f"{options['clients']} clients x {options['requests']} requests per endpoint ({options['server']})"
+        )
+        for label, sync_path, async_path, role in ENDPOINTS:
+            for mode, path in (("sync", sync_path), ("async", async_path)):
+                rate, p50, p99, failures = await self.load(path, role, cookies, options)
+                line = f"  {label:<16}{mode:<6}{rate:9,.0f} req/s   p50 {p50:8.1f}ms   p99 {p99:8.1f}ms"
+                self.stdout.write(line)
+                if failures:
+                    self.stdout.write(self.style.WARNING(f"    {failures} requests did not return 200"))
@@ -0,0 +1,111 @@
+import asyncio
+import multiprocessing
+import statistics
+import time
+
+from channels.layers import InMemoryChannelLayer
+from django.core.management.base import BaseCommand, CommandError
+
+from core.channel_layers import ShardedChannelLayer
+
+
+def make_layer(options):
+    if options["backend"] == "inmemory":
+        return InMemoryChannelLayer(capacity=options["messages"])
+    return ShardedChannelLayer(shards=options["shards"], inbox_capacity=options["messages"] * options["workers"])
+
+
+async def drain(layer, channel, counter, total, done):
+    while counter[0] < total:
+        await layer.receive(channel)
+        counter[0] += 1
+        if counter[0] == total:
+            done.set()
+
+
+async def measure(layer, channels, total, send):
+    counter = [0]
+    done = asyncio.Event()
+    receivers = [asyncio.create_task(drain(layer, channel, counter, total, done)) for channel in channels]
+    started = time.perf_counter()
+    await send()
+    await asyncio.wait_for(done.wait(), timeout=300)
+    elapsed = time.perf_counter() - started
+    for task in receivers:
+        task.cancel()
+    await asyncio.gather(*receivers, return_exceptions=True)
+    return total / elapsed
+
+
+async def run_worker(options, barrier):
+    layer = make_layer(options)
+    channels = [await layer.new_channel() for _ in range(options["channels"])]
+
+    async def point_to_point():
+        for i in range(options["messages"]):
+            await layer.send(channels[i % len(channels)], {"type": "bench.message", "n": i, "text": "x" * 200})
+
+    await asyncio.to_thread(barrier.wait)
+    direct = await measure(layer, channels, options["messages"], point_to_point)
+
+    # Every worker joins one channel to a shared group and every worker sends
+    # to that group, so each message crosses to every worker.
+    await layer.group_add("bench.fanout", channels[0])
+    await asyncio.to_thread(barrier.wait)
+    fanout_messages = options["messages"] // 10
+
+    async def group_fanout():
+        for i in range(fanout_messages):
+            await layer.group_send("bench.fanout", {"type": "bench.message", "n": i, "text": "x" * 200})
+
+    fanout = await measure(layer, channels[:1], fanout_messages * options["workers"], group_fanout)
+    await asyncio.to_thread(barrier.wait)
+    await layer.group_discard("bench.fanout", channels[0])
+    return direct, fanout
+
+
+def worker(options, barrier, results):
+    results.put(asyncio.run(run_worker(options, barrier)))
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure channel-layer throughput (messages per second per worker) for point-to-point "
+        "sends and group fan-out, with one OS process per worker."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--shards", default="memory://bench",
+            help="Comma-separated shard URLs, e.g. sqlite:///tmp/a.sqlite3,sqlite:///tmp/b.sqlite3",
+        )
+        parser.add_argument("--backend", choices=["sharded", "inmemory"], default="sharded",
+                            help="'inmemory' measures channels' InMemoryChannelLayer as a baseline.")
+        parser.add_argument("--workers", type=int, default=1)
+        parser.add_argument("--channels", type=int, default=100, help="Receiving channels per worker.")
+        parser.add_argument("--messages", type=int, default=20_000, help="Point-to-point messages per worker.")
+
+    def handle(self, *args, **options):
+        single_process = options["backend"] == "inmemory" or all(
+            url.strip().startswith("memory://") for url in options["shards"].split(",")
+        )
+        if single_process and options["workers"] > 1:
+            raise CommandError("In-process backends cannot be shared between workers; use sqlite:// or redis:// shards")
+
+        asyncio.run(make_layer(options).flush())
+        context = multiprocessing.get_context("fork")
+        barrier = context.Barrier(options["workers"])
+        results = context.Queue()
+        processes = [context.Process(target=worker, args=(options, barrier, results)) for _ in range(options["workers"])]
+        for process in processes:
+            process.start()
+        rates = [results.get(timeout=600) for _ in processes]
+        for process in processes:
+            process.join()
+
+        label = "InMemoryChannelLayer" if options["backend"] == "inmemory" else options["shards"]
+        direct = [rate for rate, _ in rates]
+        fanout = [rate for _, rate in rates]
+        self.stdout.write(self.style.MIGRATE_HEADING(f"{label}, {options['workers']} worker(s)"))
+        self.stdout.write(f"  point-to-point: {statistics.mean(direct):10,.0f} msg/s per worker")
+        self.stdout.write(f"  group fan-out:  {statistics.mean(fanout):10,.0f} msg/s per worker")
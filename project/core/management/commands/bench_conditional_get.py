@@ -0,0 +1,102 @@
+import random
+import statistics
+import time
+from datetime import date, time as clock, timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from core.models import Appointment, Doctor, HealthRecord, Patient, User
+
+ENDPOINTS = [
+    ("doctor schedule", "/api/doctor/schedule/", "doctor"),
+    ("doctor appointments", "/api/appointments/", "doctor"),
+    ("doctor patients", "/api/patients/list/", "doctor"),
+    ("patient appointments", "/api/appointments/", "patient"),
+    ("patient health records", "/api/health-records/", "patient"),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a doctor's appointments and a patient's records inside a rolled-back transaction and "
+        "compare full polls of the dashboard read APIs with conditional polls answered by 304."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--appointments", type=int, default=5_000)
+        parser.add_argument("--patients", type=int, default=1_000)
+        parser.add_argument("--records", type=int, default=500, help="Health records of the polling patient.")
+        parser.add_argument("--repeat", type=int, default=30)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        with transaction.atomic():
+            doctor, patient = self.seed(rng, options)
+            clients = {}
+            for role, user in (("doctor", doctor.user), ("patient", patient.user)):
+                # ALLOWED_HOSTS only admits localhost in development.
+                clients[role] = Client(HTTP_HOST="localhost")
+                clients[role].force_login(user)
+
+            for label, path, role in ENDPOINTS:
+                client = clients[role]
+                etag = client.get(path)["ETag"]
+                self.report(f"{label}, full", self.run(lambda: client.get(path), options["repeat"], 200))
+                self.report(
+                    f"{label}, 304",
+                    self.run(lambda: client.get(path, HTTP_IF_NONE_MATCH=etag), options["repeat"], 304),
+                )
+            transaction.set_rollback(True)
+
+    def seed(self, rng, options):
+        password = make_password(None)
+        user = User.objects.create(username="bench-etag-doctor", password=password, is_doctor=True, is_patient=False)
+        doctor = Doctor.objects.create(
+            user=user, specialization="General Medicine", license_number="BENCH-ETAG",
+            available_times={"monday": "09:00-17:00", "thursday": "09:00-13:00"},
+        )
+        users = User.objects.bulk_create(
+            User(username=f"bench-etag-patient-{i}", password=password, first_name="Bench", last_name=f"Patient {i}")
+            for i in range(options["patients"])
+        )
+        patients = Patient.objects.bulk_create(Patient(user=user) for user in users)
+        Appointment.objects.bulk_create(
+            (
+                Appointment(
+                    doctor=doctor, patient=patients[0] if i % 10 == 0 else rng.choice(patients),
+                    date=date(2020, 1, 1) + timedelta(days=i // 32), time=clock(9 + i % 32 // 4, i % 4 * 15),
+                    status=rng.choice(["completed", "cancelled", "pending", "confirmed"]),
+                    symptoms="fever and cough",
+                )
+                for i in range(options["appointments"])
+            ),
+            batch_size=2000,
+        )
+        HealthRecord.objects.bulk_create(
+            HealthRecord(patient=patients[0], record_type="lab", description="Bench record", file="health_records/bench.pdf")
+            for _ in range(options["records"])
+        )
+        return doctor, patients[0]
+
+    def run(self, poll, repeat, expected):
+        timings, queries = [], 0
+        for _ in range(repeat):
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                response = poll()
+                timings.append((time.perf_counter() - started) * 1000)
+            assert response.status_code == expected, response.status_code
+            queries = len(captured)
+        return sorted(timings), queries, len(response.content)
+
+    def report(self, label, outcome):
+        timings, queries, size = outcome
+        self.stdout.write(
+            f"{label:<30} mean={statistics.mean(timings):8.2f}ms p50={statistics.median(timings):8.2f}ms "
+            f"p95={timings[int(len(timings) * 0.95) - 1]:8.2f}ms  queries={queries}  bytes={size:,}"
+        )
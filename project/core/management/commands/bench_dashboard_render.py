@@ -0,0 +1,93 @@
+import random
+import statistics
+import time
+from datetime import date, time as clock, timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import Client
+
+from core.models import Appointment, Doctor, Patient, User
+from core.versions import APPOINTMENTS, bump_data_versions
+
+PAGES = [
+    ("doctor appointments page", "/appointments/", "doctor"),
+    ("doctor dashboard", "/doctor/dashboard/", "doctor"),
+    ("patient appointments page", "/appointments/", "patient"),
+    ("patient dashboard", "/patient/dashboard/", "patient"),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a doctor with thousands of appointments inside a rolled-back transaction and time the "
+        "dashboard and appointments pages with their appointment lists rendered afresh (data "
+        "version bumped before every request) and served from the fragment cache."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--appointments", type=int, default=5_000)
+        parser.add_argument("--patients", type=int, default=500)
+        parser.add_argument("--repeat", type=int, default=20)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        with transaction.atomic():
+            users = self.seed(rng, options)
+            for label, path, role in PAGES:
+                # ALLOWED_HOSTS only admits localhost in development.
+                client = Client(HTTP_HOST="localhost")
+                client.force_login(users[role])
+
+                def changed():
+                    bump_data_versions(APPOINTMENTS, [users[role].pk])
+                    return client.get(path)
+
+                self.report(f"{label}, rendered", self.run(changed, options["repeat"]))
+                self.report(f"{label}, cached", self.run(lambda: client.get(path), options["repeat"]))
+            transaction.set_rollback(True)
+
+    def seed(self, rng, options):
+        password = make_password(None)
+        user = User.objects.create(
+            username="bench-render-doctor", password=password, first_name="Bench", last_name="Doctor",
+            is_doctor=True, is_patient=False,
+        )
+        doctor = Doctor.objects.create(user=user, specialization="General Medicine", license_number="BENCH-RENDER")
+        patient_users = User.objects.bulk_create(
+            User(username=f"bench-render-patient-{i}", password=password, first_name="Bench", last_name=f"Patient {i}")
+            for i in range(options["patients"])
+        )
+        patients = Patient.objects.bulk_create(Patient(user=user) for user in patient_users)
+        statuses = ["completed", "cancelled", "pending", "confirmed"]
+        Appointment.objects.bulk_create(
+            (
+                Appointment(
+                    doctor=doctor, patient=patients[0] if i % 25 == 0 else rng.choice(patients),
+                    date=date(2020, 1, 1) + timedelta(days=i // 32), time=clock(9 + i % 32 // 4, i % 4 * 15),
+                    status=(status := rng.choice(statuses)), symptoms="fever and cough for two days",
+                    queue_priority=0 if status in ("pending", "confirmed") else None,
+                )
+                for i in range(options["appointments"])
+            ),
+            batch_size=2000,
+        )
+        return {"doctor": user, "patient": patient_users[0]}
+
+    def run(self, request, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            response = request()
+            timings.append((time.perf_counter() - started) * 1000)
+            assert response.status_code == 200, response.status_code
+        return sorted(timings), len(response.content)
+
+    def report(self, label, outcome):
+        timings, size = outcome
+        self.stdout.write(
+            f"{label:<36} mean={statistics.mean(timings):8.2f}ms p50={statistics.median(timings):8.2f}ms "
+            f"p95={timings[int(len(timings) * 0.95) - 1]:8.2f}ms  bytes={size:,}"
+        )
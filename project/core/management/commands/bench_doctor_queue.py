@@ -0,0 +1,107 @@
+import random
+import statistics
+import time
+from datetime import date, time as clock, timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from core.models import Appointment, Doctor, Patient, User
+from core.pagination import WORK_QUEUE_ORDERING
+from core.scheduling import ACTIVE_STATUSES
+from core.serializers import AppointmentSerializer
+from core.triage import queue_priority, work_queue
+
+NOTES = [
+    "mild cough", "fever and cough", "severe headache and high fever", "chest pain and difficulty breathing",
+    "stomach ache since yesterday", "feeling tired", "vomiting and diarrhea", "",
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed one doctor's appointment history inside a rolled-back transaction and time the "
+        "triage work queue against sorting the doctor's active appointments by status and "
+        "against the old unordered dashboard list."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--history", type=int, default=50_000, help="Completed and cancelled appointments.")
+        parser.add_argument("--active", type=int, default=2_000, help="Pending and confirmed appointments.")
+        parser.add_argument("--page-size", type=int, default=50)
+        parser.add_argument("--repeat", type=int, default=50)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        with transaction.atomic():
+            doctor = self.seed(rng, options)
+            size = options["page_size"]
+            queries = {
+                "work queue page": lambda: work_queue(doctor)[:size],
+                "work queue page, serialized": lambda: AppointmentSerializer(
+                    AppointmentSerializer.setup_eager_loading(work_queue(doctor))[:size], many=True
+                ).data,
+                "active by status, sorted": lambda: Appointment.objects.filter(
+                    doctor=doctor, status__in=ACTIVE_STATUSES
+                ).order_by(*WORK_QUEUE_ORDERING)[:size],
+                "old dashboard list": lambda: AppointmentSerializer.setup_eager_loading(
+                    Appointment.objects.filter(doctor=doctor)
+                ),
+            }
+            for label, build in queries.items():
+                query = build()
+                plan = self.explain(query) if hasattr(query, "query") else ""
+                self.report(label, self.run(build, options["repeat"]), plan)
+            transaction.set_rollback(True)
+
+    def seed(self, rng, options):
+        password = make_password(None)
+        user = User.objects.create(username="bench-queue-doctor", password=password, is_doctor=True, is_patient=False)
+        doctor = Doctor.objects.create(user=user, specialization="General Medicine", license_number="BENCH-QUEUE")
+        users = User.objects.bulk_create(User(username=f"bench-queue-patient-{i}", password=password) for i in range(500))
+        patients = Patient.objects.bulk_create(Patient(user=user) for user in users)
+
+        now = timezone.now()
+        severities = ["low", "low", "low", "moderate", "high"]
+        rows = []
+        for i in range(options["history"] + options["active"]):
+            active = i >= options["history"]
+            status = rng.choice(ACTIVE_STATUSES if active else ("completed", "cancelled"))
+            severity = rng.choice(severities)
+            rows.append(Appointment(
+                doctor=doctor, patient=rng.choice(patients),
+                date=date(2020, 1, 1) + timedelta(days=i // 40), time=clock(8 + i % 40 // 4, i % 4 * 15),
+                status=status, symptoms=rng.choice(NOTES), booked_at=now - timedelta(minutes=rng.randrange(100_000)),
+                triage_score=rng.random() * 10, triage_severity=severity,
+                queue_priority=queue_priority(status, severity),
+            ))
+        Appointment.objects.bulk_create(rows, batch_size=5000)
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+        return doctor
+
+    def explain(self, queryset):
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f"{connection.ops.explain_query_prefix()} {sql}", params)
+            return " | ".join(str(row[-1]) for row in cursor.fetchall())
+
+    def run(self, build, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            result = build()
+            list(result)
+            timings.append((time.perf_counter() - started) * 1000)
+        return sorted(timings)
+
+    def report(self, label, timings, plan):
+        self.stdout.write(
+            f"{label:<30} mean={statistics.mean(timings):8.2f}ms p50={statistics.median(timings):8.2f}ms "
+            f"p95={timings[int(len(timings) * 0.95) - 1]:8.2f}ms"
+        )
+        if plan:
+            self.stdout.write(f"    {plan}")
@@ -0,0 +1,67 @@
+import random
+import statistics
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.models import Medicine
+from core.search import IcontainsSearchBackend, get_backend
+
+SYLLABLES = [
+    'pa', 'ra', 'ce', 'ta', 'mo', 'xi', 'ci', 'lin', 'bu', 'pro', 'fen', 'tri', 'zi', 'met',
+    'for', 'az', 'thro', 'my', 'pan', 'to', 'do', 'lo', 'om', 'pra', 'sar', 'val', 'dex', 'nol',
+]
+MANUFACTURERS = ['Cipla', 'Sun Pharma', 'Lupin', 'Mankind', 'Zydus', 'Abbott', 'Alkem', 'Torrent']
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed medicines inside a rolled-back transaction and compare the "
+        "indexed search backend with the icontains scan."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--medicines", type=int, default=100_000)
+        parser.add_argument("--queries", type=int, default=200)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        with transaction.atomic():
+            self.seed(rng, options["medicines"])
+            backend = get_backend()
+            backend.rebuild()
+
+            names = list(Medicine.objects.values_list("name", flat=True)[:1000])
+            queries = [rng.choice(names)[: rng.randint(3, 6)] for _ in range(options["queries"])]
+            for label, candidate in [("icontains", IcontainsSearchBackend()), (type(backend).__name__, backend)]:
+                timings = self.run(candidate, queries)
+                self.stdout.write(
+                    f"{label:<24} mean={statistics.mean(timings):7.2f}ms "
+                    f"p50={statistics.median(timings):7.2f}ms "
+                    f"p95={timings[int(len(timings) * 0.95) - 1]:7.2f}ms"
+                )
+            transaction.set_rollback(True)
+
+    def seed(self, rng, count):
+        batch = []
+        for i in range(count):
+            batch.append(Medicine(
+                name=f"{''.join(rng.choices(SYLLABLES, k=4)).title()} {rng.choice([100, 250, 500, 650])}mg",
+                manufacturer=rng.choice(MANUFACTURERS),
+                price=Decimal(rng.randint(100, 50000)) / 100,
+            ))
+            if len(batch) == 5000:
+                Medicine.objects.bulk_create(batch)
+                batch = []
+        Medicine.objects.bulk_create(batch)
+
+    def run(self, backend, queries):
+        timings = []
+        for query in queries:
+            start = time.perf_counter()
+            list(backend.search(Medicine.objects.all(), query))
+            timings.append((time.perf_counter() - start) * 1000)
+        return sorted(timings)
@@ -0,0 +1,102 @@
+import random
+import statistics
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.api_views import medicine_search_result, medicines_with_stock
+from core.geo import Location, by_distance, cells_within, grid_cell
+from core.inventory import rebuild_availability
+from core.models import Medicine, Pharmacy, PharmacyMedicine
+from core.search import get_backend
+
+# Roughly Punjab.
+SOUTH, NORTH, WEST, EAST = 29.5, 32.5, 73.9, 76.9
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed pharmacies with coordinates and stock inside a rolled-back transaction, then compare "
+        "the grid-indexed nearest-pharmacy lookup with a full scan and time located medicine searches."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--pharmacies", type=int, default=50_000)
+        parser.add_argument("--medicines", type=int, default=100)
+        parser.add_argument("--stocked", type=int, default=5, help="Medicines stocked by each pharmacy.")
+        parser.add_argument("--queries", type=int, default=100)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        with transaction.atomic():
+            started = time.perf_counter()
+            self.seed(rng, options)
+            self.stdout.write(f"Seeded {options['pharmacies']:,} pharmacies in {time.perf_counter() - started:.1f}s")
+
+            locations = [
+                (rng.uniform(SOUTH, NORTH), rng.uniform(WEST, EAST)) for _ in range(options["queries"])
+            ]
+            for radius in (5, 10, 25):
+                queries = [Location(latitude, longitude, radius) for latitude, longitude in locations]
+                self.report(f"nearest, full scan, {radius} km", self.run(self.full_scan, queries))
+                self.report(f"nearest, grid, {radius} km", self.run(self.grid, queries))
+
+            backend = get_backend()
+            name = Medicine.objects.order_by("id").values_list("name", flat=True).first()
+            queries = [Location(latitude, longitude, 25) for latitude, longitude in locations]
+            self.report("search, no location", self.run(lambda _: self.search(backend, name, None), queries[:20]))
+            self.report("search, 25 km", self.run(lambda location: self.search(backend, name, location), queries))
+            transaction.set_rollback(True)
+
+    def seed(self, rng, options):
+        medicines = Medicine.objects.bulk_create(
+            Medicine(name=f"Geo Bench Medicine {i}", manufacturer="Bench Labs", price=Decimal(rng.randint(100, 5000)) / 100)
+            for i in range(options["medicines"])
+        )
+        get_backend().reindex(medicine.id for medicine in medicines)
+        for start in range(0, options["pharmacies"], 5000):
+            pharmacies = []
+            for i in range(start, min(start + 5000, options["pharmacies"])):
+                latitude, longitude = rng.uniform(SOUTH, NORTH), rng.uniform(WEST, EAST)
+                pharmacies.append(Pharmacy(
+                    name=f"Geo bench pharmacy {i}", address="-", phone_number="-", email="bench@example.com",
+                    latitude=latitude, longitude=longitude, geo_cell=grid_cell(latitude, longitude),
+                ))
+            pharmacies = Pharmacy.objects.bulk_create(pharmacies)
+            PharmacyMedicine.objects.bulk_create(
+                PharmacyMedicine(pharmacy=pharmacy, medicine=medicine, stock=rng.randint(1, 50))
+                for pharmacy in pharmacies
+                for medicine in rng.sample(medicines, options["stocked"])
+            )
+        rebuild_availability()
+
+    def full_scan(self, location):
+        rows = Pharmacy.objects.values_list("id", "latitude", "longitude")
+        return by_distance(location, rows, lambda row: row[1:])
+
+    def grid(self, location):
+        rows = Pharmacy.objects.filter(cells_within(location)).values_list("id", "latitude", "longitude")
+        return by_distance(location, rows, lambda row: row[1:])
+
+    def search(self, backend, query, location):
+        medicines = backend.search(medicines_with_stock(location), query)
+        return [medicine_search_result(medicine, location) for medicine in medicines]
+
+    def run(self, lookup, queries):
+        timings, found = [], 0
+        for query in queries:
+            start = time.perf_counter()
+            result = lookup(query)
+            timings.append((time.perf_counter() - start) * 1000)
+            found += len(result)
+        return sorted(timings), found / len(queries)
+
+    def report(self, label, outcome):
+        timings, found = outcome
+        self.stdout.write(
+            f"{label:<28} mean={statistics.mean(timings):8.2f}ms p50={statistics.median(timings):8.2f}ms "
+            f"p95={timings[int(len(timings) * 0.95) - 1]:8.2f}ms  results={found:,.1f}"
+        )
@@ -0,0 +1,126 @@
+import os
+import tempfile
+import threading
+import time
+from datetime import date, time as clock, timedelta
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connections, transaction
+from django.db.utils import OperationalError
+
+from core.models import Appointment, Doctor, HealthRecord, Patient, User
+
+BACKENDS = [
+    ("stock sqlite3", "django.db.backends.sqlite3"),
+    ("tuned (WAL)", "telemedicine.sqlite3"),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Run concurrent readers and writers against a fresh SQLite file with Django's stock "
+        "backend and with the WAL-tuned telemedicine.sqlite3 backend, and report throughput "
+        "and the rate of 'database is locked' errors."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--writers", type=int, default=8, help="Threads creating records and booking.")
+        parser.add_argument("--readers", type=int, default=8, help="Threads listing appointments.")
+        parser.add_argument("--seconds", type=float, default=5.0, help="Duration of each run.")
+
+    def handle(self, *args, **options):
+        directory = tempfile.mkdtemp(prefix="bench-sqlite-")
+        try:
+            for label, engine in BACKENDS:
+                alias = f"bench_{engine.split('.')[0]}"
+                path = os.path.join(directory, f"{alias}.sqlite3")
+                connections.settings[alias] = connections.configure_settings(
+                    {"default": connections.settings["default"], alias: {"ENGINE": engine, "NAME": path}}
+                )[alias]
+                call_command("migrate", database=alias, verbosity=0)
+                patients = self.seed(alias, options)
+                self.report(label, self.run(alias, patients, options))
+                connections[alias].close()
+        finally:
+            for name in os.listdir(directory):
+                os.remove(os.path.join(directory, name))
+            os.rmdir(directory)
+
+    def seed(self, alias, options):
+        users = User.objects.using(alias).bulk_create(
+            User(username=f"bench-writer-{i}") for i in range(options["writers"])
+        )
+        doctor_user = User.objects.db_manager(alias).create(username="bench-doctor", is_doctor=True, is_patient=False)
+        self.doctor = Doctor.objects.using(alias).create(
+            user=doctor_user, specialization="General Medicine", license_number="BENCH-SQLITE"
+        )
+        return Patient.objects.using(alias).bulk_create(Patient(user=user) for user in users)
+
+    def run(self, alias, patients, options):
+        counts = {"writes": 0, "reads": 0, "writes_locked": 0, "reads_locked": 0, "other": 0}
+        lock = threading.Lock()
+        deadline = time.monotonic() + options["seconds"]
+        start = threading.Barrier(options["writers"] + options["readers"])
+
+        def count(key):
+            with lock:
+                counts[key] += 1
+
+        def attempt(kind, operation):
+            try:
+                operation()
+            except OperationalError as e:
+                count(f"{kind}_locked" if "locked" in str(e) else "other")
+            else:
+                count(kind)
+
+        def writer(index):
+            patient = patients[index]
+            slot = 0
+            start.wait()
+            while time.monotonic() < deadline:
+                attempt("writes", lambda: HealthRecord.objects.using(alias).create(
+                    patient=patient, record_type="lab", description="Stress test"
+                ))
+                slot += 1
+
+                def book():
+                    # Read-then-write, as booking does: check the slot, then insert.
+                    day = date(2030, 1, 1) + timedelta(days=index * 10_000 + slot)
+                    with transaction.atomic(using=alias):
+                        taken = Appointment.objects.using(alias).filter(doctor=self.doctor, date=day).exists()
+                        if not taken:
+                            Appointment.objects.using(alias).create(
+                                doctor=self.doctor, patient=patient, date=day, time=clock(9, 0)
+                            )
+
+                attempt("writes", book)
+            connections[alias].close()
+
+        def reader():
+            start.wait()
+            while time.monotonic() < deadline:
+                attempt("reads", lambda: list(Appointment.objects.using(alias).filter(doctor=self.doctor)[:50]))
+            connections[alias].close()
+
+        threads = [threading.Thread(target=writer, args=(i,)) for i in range(options["writers"])]
+        threads += [threading.Thread(target=reader) for _ in range(options["readers"])]
+        started = time.monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        counts["seconds"] = time.monotonic() - started
+        return counts
+
+    def report(self, label, counts):
+        self.stdout.write(self.style.MIGRATE_HEADING(label))
+        for kind in ("writes", "reads"):
+            locked = counts[f"{kind}_locked"]
+            self.stdout.write(
+                f"  {kind:<7}{counts[kind] / counts['seconds']:8,.0f}/s   "
+                f"locked errors {locked} ({locked / max(counts[kind] + locked, 1):.1%})"
+            )
+        if counts["other"]:
+            self.stdout.write(self.style.WARNING(f"  other database errors: {counts['other']}"))
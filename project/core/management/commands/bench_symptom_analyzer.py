@@ -0,0 +1,127 @@
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.symptoms import SymptomAnalyzer
+
+SYLLABLES = [
+    'ka', 'ro', 'mi', 'te', 'su', 'la', 'ven', 'dor', 'pli', 'gan', 'tho', 'rex', 'mu', 'zel', 'qua', 'bri',
+    'sto', 'nep', 'fa', 'yor', 'chi', 'wel', 'dra', 'ost',
+]
+FILLER = (
+    'i have had since two days the patient reports with some and in my also feels for a week at night '
+    'after eating morning child mother says it started'
+).split()
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate a synthetic symptom knowledge base and compare the compiled analyzer with a "
+        "per-term substring scan over the same notes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--conditions", type=int, default=10_000)
+        parser.add_argument("--terms", type=int, default=50_000, help="Synonym phrases across all symptoms.")
+        parser.add_argument("--terms-per-symptom", type=int, default=10)
+        parser.add_argument("--notes", type=int, default=2_000)
+        parser.add_argument("--note-words", type=int, default=60)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        knowledge = self.knowledge_base(rng, options)
+        fd, path = tempfile.mkstemp(suffix=".json", prefix="symptoms-")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(knowledge, f)
+            started = time.perf_counter()
+            analyzer = SymptomAnalyzer.from_file(path)
+            self.stdout.write(
+                f"Compiled {options['conditions']:,} conditions and {options['terms']:,} terms "
+                f"in {time.perf_counter() - started:.2f}s"
+            )
+        finally:
+            os.remove(path)
+
+        terms = [term for spec in knowledge["symptoms"].values() for term in spec["terms"]]
+        notes = [self.note(rng, terms, options["note_words"]) for _ in range(options["notes"])]
+        self.report("compiled analyzer", self.run(analyzer.analyze, notes))
+        substring = SubstringScan(knowledge)
+        self.report("substring scan", self.run(substring.analyze, notes[: max(1, len(notes) // 20)]))
+
+    def knowledge_base(self, rng, options):
+        symptoms, seen = {}, set()
+        while len(seen) < options["terms"]:
+            name = f"symptom {len(symptoms)}"
+            phrases = []
+            while len(phrases) < options["terms_per_symptom"] and len(seen) < options["terms"]:
+                phrase = " ".join(
+                    "".join(rng.choices(SYLLABLES, k=rng.randint(2, 4))) for _ in range(rng.randint(1, 3))
+                )
+                if phrase not in seen:
+                    seen.add(phrase)
+                    phrases.append(phrase)
+            symptoms[name] = {"weight": rng.choice([0.5, 1, 1.5, 2, 3, 6]), "terms": phrases}
+        names = list(symptoms)
+        return {
+            "symptoms": symptoms,
+            "conditions": {
+                f"Condition {i}": rng.sample(names, rng.randint(3, 8)) for i in range(options["conditions"])
+            },
+            "intensifiers": {"severe": 4, "very": 1.5, "mild": 0.5},
+            "negations": ["no", "not", "without", "denies"],
+            "clause_breaks": ["but", "however"],
+            "severity_thresholds": {"moderate": 3, "high": 6},
+        }
+
+    def note(self, rng, terms, words):
+        parts = []
+        while len(parts) < words:
+            roll = rng.random()
+            if roll < 0.15:
+                parts.append(rng.choice(terms))
+            elif roll < 0.2:
+                parts.append(rng.choice(["no", "severe", "very", "mild", "but", ",", "."]))
+            else:
+                parts.append(rng.choice(FILLER))
+        return " ".join(parts)
+
+    def run(self, analyze, notes):
+        timings = []
+        for note in notes:
+            start = time.perf_counter()
+            analyze(note)
+            timings.append((time.perf_counter() - start) * 1000)
+        return sorted(timings)
+
+    def report(self, label, timings):
+        mean = statistics.mean(timings)
+        self.stdout.write(
+            f"{label:<18} notes={len(timings):>5}  mean={mean:8.3f}ms  p95={timings[int(len(timings) * 0.95) - 1]:8.3f}ms  "
+            f"throughput={1000 / mean:10,.0f} notes/s"
+        )
+
+
+class SubstringScan:
+    """The previous approach, a ``term in text`` test per known term, for comparison."""
+
+    def __init__(self, knowledge):
+        self.terms = [(term, name) for name, spec in knowledge["symptoms"].items() for term in spec["terms"]]
+        self.conditions = {}
+        for condition, symptoms in knowledge["conditions"].items():
+            for symptom in symptoms:
+                self.conditions.setdefault(symptom, []).append(condition)
+
+    def analyze(self, text):
+        text = text.lower()
+        found = set()
+        for term, symptom in self.terms:
+            if term in text:
+                found.update(self.conditions.get(symptom, ()))
+        return found
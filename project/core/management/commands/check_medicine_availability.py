@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.inventory import DEFAULT_BATCH_SIZE, find_drift, refresh_availability
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare every medicine's stored availability aggregate with pharmacy stock and report drift. "
+        "Exits with an error when drift is found, unless --fix repairs it."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--fix", action="store_true", help="Recompute the medicines that drifted.")
+        parser.add_argument(
+            "--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Medicines compared per query."
+        )
+        parser.add_argument("--show", type=int, default=20, help="How many drifted medicines to list.")
+
+    def handle(self, *args, **options):
+        drifted = []
+        for medicine_id, problem in find_drift(options["batch_size"]):
+            if len(drifted) < options["show"]:
+                self.stderr.write(f"Medicine {medicine_id}: {problem}")
+            drifted.append(medicine_id)
+
+        if not drifted:
+            self.stdout.write(self.style.SUCCESS("Medicine availability is consistent"))
+            return
+        if not options["fix"]:
+            raise CommandError(f"{len(drifted)} medicines have drifted; run with --fix or rebuild_medicine_availability")
+        for start in range(0, len(drifted), options["batch_size"]):
+            refresh_availability(drifted[start:start + options["batch_size"]])
+        self.stdout.write(self.style.SUCCESS(f"Fixed availability for {len(drifted)} medicines"))
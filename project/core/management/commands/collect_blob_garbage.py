@@ -0,0 +1,22 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from core.storage import collect_garbage
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete health-record blobs that no record has pointed at for longer than "
+        "HEALTH_RECORD_BLOB_GRACE. Run it periodically, e.g. hourly from cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--grace-minutes", type=float, help="Override HEALTH_RECORD_BLOB_GRACE for this run."
+        )
+
+    def handle(self, *args, **options):
+        grace = options["grace_minutes"]
+        count, freed = collect_garbage(grace=None if grace is None else timedelta(minutes=grace))
+        self.stdout.write(self.style.SUCCESS(f"Deleted {count} unreferenced blobs ({freed} bytes)"))
@@ -0,0 +1,77 @@
+import csv
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import Pharmacy
+from core.stock_import import DEFAULT_BATCH_SIZE, FORMATS, guess_format, import_stock, text_stream
+
+
+class Command(BaseCommand):
+    help = (
+        "Import medicines and pharmacy stock from a CSV or JSON-lines file, streaming it "
+        "through batched upserts and reporting progress and rejected rows."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="File to import, or - for standard input.")
+        parser.add_argument("--format", choices=FORMATS, help="Defaults to the file extension, else csv.")
+        parser.add_argument("--pharmacy", type=int, help="Pharmacy id for files without a pharmacy_id column.")
+        parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+        parser.add_argument("--progress", type=int, default=100_000, help="Report progress every this many rows.")
+        parser.add_argument("--rejects", help="Write every rejected line and its error to this CSV file.")
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        pharmacy_id = options["pharmacy"]
+        if pharmacy_id is not None and not Pharmacy.objects.filter(id=pharmacy_id).exists():
+            raise CommandError(f"Pharmacy {pharmacy_id} does not exist")
+
+        rejects_file = rejects = None
+        if options["rejects"]:
+            rejects_file = open(options["rejects"], "w", newline="")
+            rejects = csv.writer(rejects_file)
+            rejects.writerow(["line", "error"])
+
+        started = time.perf_counter()
+        reported = [0]
+
+        def progress(report):
+            if report.rows - reported[0] >= options["progress"]:
+                reported[0] = report.rows
+                rate = report.rows / (time.perf_counter() - started)
+                self.stdout.write(
+                    f"{report.rows:,} rows read, {report.imported:,} imported, "
+                    f"{report.rejected:,} rejected ({rate:,.0f} rows/s)"
+                )
+
+        binary = sys.stdin.buffer if path == "-" else open(path, "rb")
+        try:
+            report = import_stock(
+                text_stream(binary),
+                format=options["format"] or guess_format(path),
+                pharmacy_id=pharmacy_id,
+                batch_size=options["batch_size"],
+                on_batch=progress,
+                on_reject=rejects.writerow if rejects else None,
+            )
+        finally:
+            if binary is not sys.stdin.buffer:
+                binary.close()
+            if rejects_file:
+                rejects_file.close()
+
+        for rejection in report.rejections[:20]:
+            self.stderr.write(f"Line {rejection['line']}: {rejection['error']}")
+        if report.rejected > 20:
+            self.stderr.write(f"... and {report.rejected - 20:,} more rejected rows")
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Imported {report.imported:,} of {report.rows:,} rows in {elapsed:.1f}s, "
+                f"{report.rejected:,} rejected"
+            )
+        )
+        if report.error:
+            raise CommandError(report.error)
@@ -0,0 +1,81 @@
+import os
+import shutil
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.models import HealthRecord
+from core.storage import blob_name, claim_blob, collect_garbage, digest_from_name, hash_file, health_record_storage
+
+
+class Command(BaseCommand):
+    help = (
+        "Move health-record files saved under their upload names into content-addressed "
+        "blobs, sharing one blob between identical files, and report the space saved."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true", help="Only report what would be saved.")
+        parser.add_argument(
+            "--collect-garbage", action="store_true", help="Also delete unreferenced blobs past the grace period."
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options["dry_run"]
+        storage = health_record_storage()
+        legacy = {}
+        for record in HealthRecord.objects.exclude(file="").only("id", "file", "filename").iterator():
+            if digest_from_name(record.file.name) is None:
+                legacy.setdefault(record.file.name, []).append(record)
+
+        migrated = missing = before = after = 0
+        seen = set()
+        for name, records in legacy.items():
+            if not storage.exists(name):
+                missing += len(records)
+                self.stderr.write(f"Missing file {name} (records {', '.join(str(r.id) for r in records)})")
+                continue
+
+            path = storage.path(name)
+            size = os.path.getsize(path)
+            digest = hash_file(path)
+            target = blob_name(digest)
+            before += size
+            if digest not in seen and not storage.exists(target):
+                after += size
+            seen.add(digest)
+            migrated += len(records)
+            if dry_run:
+                continue
+
+            storage.reserve(digest, lambda blob_path: self.link_or_copy(path, blob_path))
+
+            # Point the records at the blob before removing the old file, so an
+            # interrupted run leaves every record readable.
+            with transaction.atomic():
+                for record in records:
+                    HealthRecord.objects.filter(pk=record.pk).update(
+                        file=target, filename=record.filename or os.path.basename(name)
+                    )
+                    claim_blob(target)
+            storage.delete(name)
+
+        verb = "Would migrate" if dry_run else "Migrated"
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{verb} {migrated} files: {before} bytes into {after} bytes of new blobs "
+                f"({before - after} bytes saved)"
+            )
+        )
+        if missing:
+            self.stdout.write(self.style.WARNING(f"Skipped {missing} records whose files are missing"))
+
+        if options["collect_garbage"] and not dry_run:
+            count, freed = collect_garbage()
+            self.stdout.write(self.style.SUCCESS(f"Deleted {count} unreferenced blobs ({freed} bytes)"))
+
+    def link_or_copy(self, source, destination):
+        try:
+            os.link(source, destination)
+        except OSError:
+            shutil.copyfile(source, destination)
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from core.inventory import DEFAULT_BATCH_SIZE, rebuild_availability
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute every medicine's availability aggregate (total stock, pharmacy count, minimum price) "
+        "and its stock/is_available fields from pharmacy stock."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Medicines recomputed per transaction."
+        )
+
+    def handle(self, *args, **options):
+        refreshed = rebuild_availability(options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt availability for {refreshed} medicines"))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from core.directory import refresh_next_available
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the stored soonest open slot of doctors whose slot has passed, whose "
+        "empty horizon has moved on or that were marked stale. Run it every few minutes, "
+        "e.g. from cron."
+    )
+
+    def handle(self, *args, **options):
+        count = refresh_next_available()
+        self.stdout.write(self.style.SUCCESS(f"Refreshed the next available slot of {count} doctors"))
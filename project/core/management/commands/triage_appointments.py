@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from core.triage import DEFAULT_BATCH_SIZE, triage_active_appointments
+
+
+class Command(BaseCommand):
+    help = (
+        "Run the symptom analyzer over pending and confirmed appointments and store each one's "
+        "triage score and severity, so doctors' queues can be sorted by them."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Appointments scored per batch."
+        )
+        parser.add_argument(
+            "--all", action="store_true", help="Re-score appointments that have already been triaged."
+        )
+
+    def handle(self, *args, **options):
+        severities = triage_active_appointments(options["batch_size"], retriage=options["all"])
+        breakdown = ", ".join(f"{severity}: {severities[severity]}" for severity in ("high", "moderate", "low"))
+        self.stdout.write(self.style.SUCCESS(
+            f"Triaged {sum(severities.values())} active appointments ({breakdown})"
+        ))
@@ -0,0 +1,47 @@
+# Generated by Django 4.2.30 on 2026-10-18 09:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0002_medicine_search_index"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="appointment",
+            index=models.Index(
+                fields=["doctor", "-date", "-time"], name="appointment_doctor_date_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="appointment",
+            index=models.Index(
+                fields=["patient", "-date", "-time"],
+                name="appointment_patient_date_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="appointment",
+            index=models.Index(
+                fields=["doctor", "patient", "-date", "-time"],
+                name="appointment_doc_pat_date_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="healthrecord",
+            index=models.Index(
+                fields=["patient", "-date"], name="healthrecord_patient_date_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="pharmacymedicine",
+            index=models.Index(
+                condition=models.Q(("stock__gt", 0)),
+                fields=["medicine", "pharmacy"],
+                name="pharmacymedicine_in_stock_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.30 on 2026-10-18 09:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0003_access_pattern_indexes"),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name="appointment",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("status__in", ["pending", "confirmed"])),
+                fields=("doctor", "date", "time"),
+                name="unique_active_doctor_slot",
+            ),
+        ),
+    ]
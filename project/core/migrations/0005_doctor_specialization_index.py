@@ -0,0 +1,20 @@
+# Generated by Django 4.2.30 on 2026-10-18 09:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0004_appointment_unique_active_slot"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="doctor",
+            index=models.Index(
+                fields=["specialization", "experience_years"],
+                name="doctor_specialization_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,52 @@
+from django.db import migrations, models
+from django.db.models import Count, Max, Min, Sum
+
+
+def merge_duplicates(apps, schema_editor):
+    # Bulk imports upsert on these keys, so existing duplicates are folded
+    # into the oldest medicine and the newest stock row, which takes the
+    # stock of all its copies, before the constraints go on.
+    Medicine = apps.get_model("core", "Medicine")
+    PharmacyMedicine = apps.get_model("core", "PharmacyMedicine")
+
+    groups = (
+        Medicine.objects.values("name", "manufacturer")
+        .annotate(keep=Min("id"), copies=Count("id"))
+        .filter(copies__gt=1)
+    )
+    for group in groups:
+        duplicates = Medicine.objects.filter(name=group["name"], manufacturer=group["manufacturer"])
+        PharmacyMedicine.objects.filter(medicine__in=duplicates).update(medicine_id=group["keep"])
+        duplicates.exclude(id=group["keep"]).delete()
+
+    pairs = (
+        PharmacyMedicine.objects.values("pharmacy", "medicine")
+        .annotate(keep=Max("id"), copies=Count("id"), total=Sum("stock"))
+        .filter(copies__gt=1)
+    )
+    for pair in pairs:
+        PharmacyMedicine.objects.filter(id=pair["keep"]).update(stock=pair["total"])
+        PharmacyMedicine.objects.filter(pharmacy=pair["pharmacy"], medicine=pair["medicine"]).exclude(
+            id=pair["keep"]
+        ).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0007_health_record_blob_storage"),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="medicine",
+            constraint=models.UniqueConstraint(
+                fields=("name", "manufacturer"), name="unique_medicine_name_manufacturer"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="pharmacymedicine",
+            constraint=models.UniqueConstraint(fields=("pharmacy", "medicine"), name="unique_pharmacy_medicine"),
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 4.2.30 on 2026-10-18 10:24
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0008_stock_import_keys"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StockSyncBatch",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("idempotency_key", models.CharField(max_length=64)),
+                ("request_hash", models.CharField(max_length=64)),
+                ("response", models.JSONField()),
+                ("created_at", models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="pharmacymedicine",
+            index=models.Index(
+                fields=["last_updated", "id"], name="pharmacymedicine_sync_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="pharmacymedicine",
+            index=models.Index(
+                fields=["pharmacy", "last_updated", "id"],
+                name="pharmacymedicine_psync_idx",
+            ),
+        ),
+        migrations.AddField(
+            model_name="stocksyncbatch",
+            name="pharmacy",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE, to="core.pharmacy"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="stocksyncbatch",
+            constraint=models.UniqueConstraint(
+                fields=("pharmacy", "idempotency_key"), name="unique_stock_sync_key"
+            ),
+        ),
+    ]
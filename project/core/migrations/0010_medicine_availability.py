@@ -0,0 +1,73 @@
+# Generated by Django 4.2.30 on 2026-10-18 10:28
+
+from django.db import migrations, models
+from django.db.models import Count, Exists, OuterRef, Subquery, Sum
+from django.db.models.functions import Least
+import django.db.models.deletion
+
+
+def backfill(apps, schema_editor):
+    # Mirrors core.inventory.refresh_availability with the historical models.
+    Medicine = apps.get_model("core", "Medicine")
+    MedicineAvailability = apps.get_model("core", "MedicineAvailability")
+    PharmacyMedicine = apps.get_model("core", "PharmacyMedicine")
+
+    totals = {
+        row["medicine_id"]: (row["total_stock"], row["pharmacy_count"])
+        for row in PharmacyMedicine.objects.filter(stock__gt=0)
+        .values("medicine_id")
+        .annotate(total_stock=Sum("stock"), pharmacy_count=Count("id"))
+        .order_by()
+    }
+    aggregates = []
+    for medicine in Medicine.objects.only("id", "price").iterator():
+        total_stock, pharmacy_count = totals.get(medicine.id, (0, 0))
+        aggregates.append(
+            MedicineAvailability(
+                medicine_id=medicine.id,
+                total_stock=total_stock,
+                pharmacy_count=pharmacy_count,
+                min_price=medicine.price if pharmacy_count else None,
+            )
+        )
+    MedicineAvailability.objects.bulk_create(aggregates, batch_size=1000)
+    aggregate = MedicineAvailability.objects.filter(medicine=OuterRef("pk"))
+    Medicine.objects.update(
+        stock=Least(Subquery(aggregate.values("total_stock")), 2147483647),
+        is_available=Exists(aggregate.filter(pharmacy_count__gt=0)),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0009_stock_delta_sync"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MedicineAvailability",
+            fields=[
+                (
+                    "medicine",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="availability",
+                        serialize=False,
+                        to="core.medicine",
+                    ),
+                ),
+                ("total_stock", models.PositiveBigIntegerField(default=0)),
+                ("pharmacy_count", models.PositiveIntegerField(default=0)),
+                (
+                    "min_price",
+                    models.DecimalField(
+                        blank=True, decimal_places=2, max_digits=10, null=True
+                    ),
+                ),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-18 10:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0011_pharmacy_coordinates"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="appointment",
+            name="triage_score",
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="appointment",
+            name="triage_severity",
+            field=models.CharField(blank=True, editable=False, max_length=10),
+        ),
+    ]
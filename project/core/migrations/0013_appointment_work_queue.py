@@ -0,0 +1,69 @@
+# Generated by Django 4.2.30 on 2026-10-18 10:47
+
+from datetime import datetime
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+def date_existing_bookings(apps, schema_editor):
+    # The real booking time was never recorded. The appointment's own slot is
+    # the best stand-in, capped at now so that rows booked before this
+    # migration still queue ahead of every booking made after it.
+    Appointment = apps.get_model("core", "Appointment")
+    now = django.utils.timezone.now()
+    tz = django.utils.timezone.get_current_timezone()
+    appointments = Appointment.objects.only("id", "date", "time").order_by("id")
+    last = 0
+    while batch := list(appointments.filter(id__gt=last)[:1000]):
+        for appointment in batch:
+            slot = datetime.combine(appointment.date, appointment.time)
+            appointment.booked_at = min(django.utils.timezone.make_aware(slot, tz), now)
+        Appointment.objects.bulk_update(batch, ["booked_at"])
+        last = batch[-1].id
+
+
+def queue_active_appointments(apps, schema_editor):
+    # Appointments triaged by the triage_appointments command keep their
+    # severity; the rest join the queue as low until they are triaged.
+    Appointment = apps.get_model("core", "Appointment")
+    Appointment.objects.filter(status__in=["pending", "confirmed"]).update(
+        queue_priority=models.Case(
+            models.When(triage_severity="high", then=2),
+            models.When(triage_severity="moderate", then=1),
+            default=0,
+        )
+    )
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0012_appointment_triage"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="appointment",
+            name="booked_at",
+            field=models.DateTimeField(
+                default=django.utils.timezone.now, editable=False
+            ),
+        ),
+        migrations.AddField(
+            model_name="appointment",
+            name="queue_priority",
+            field=models.PositiveSmallIntegerField(
+                blank=True, editable=False, null=True
+            ),
+        ),
+        migrations.RunPython(date_existing_bookings, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="appointment",
+            index=models.Index(
+                condition=models.Q(("queue_priority__isnull", False)),
+                fields=["doctor", "-queue_priority", "booked_at", "id"],
+                name="appointment_triage_queue_idx",
+            ),
+        ),
+        migrations.RunPython(queue_active_appointments, migrations.RunPython.noop),
+    ]
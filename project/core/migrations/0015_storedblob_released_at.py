@@ -0,0 +1,25 @@
+# Generated by Django 4.2.30 on 2026-10-18 12:10
+
+from django.db import migrations, models
+
+
+def date_existing_releases(apps, schema_editor):
+    # The time an unreferenced blob was released was not recorded; its last
+    # claim is the closest known time, and the grace period runs from there.
+    StoredBlob = apps.get_model("core", "StoredBlob")
+    StoredBlob.objects.filter(ref_count=0).update(released_at=models.F("claimed_at"))
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0014_data_versions"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="storedblob",
+            name="released_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(date_existing_releases, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0015_storedblob_released_at"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="doctor",
+            name="next_available",
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="doctor",
+            name="next_available_checked",
+            field=models.DateField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="doctor",
+            index=models.Index(
+                fields=["next_available", "id"], name="doctor_next_available_idx"
+            ),
+        ),
+    ]
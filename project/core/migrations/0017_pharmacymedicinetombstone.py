@@ -0,0 +1,54 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:21
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0016_doctor_next_available"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PharmacyMedicineTombstone",
+            fields=[
+                ("id", models.BigIntegerField(primary_key=True, serialize=False)),
+                (
+                    "last_updated",
+                    models.DateTimeField(default=django.utils.timezone.now),
+                ),
+                (
+                    "medicine",
+                    models.ForeignKey(
+                        db_constraint=False,
+                        on_delete=django.db.models.deletion.DO_NOTHING,
+                        related_name="+",
+                        to="core.medicine",
+                    ),
+                ),
+                (
+                    "pharmacy",
+                    models.ForeignKey(
+                        db_constraint=False,
+                        on_delete=django.db.models.deletion.DO_NOTHING,
+                        related_name="+",
+                        to="core.pharmacy",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["last_updated", "id"], name="stocktombstone_sync_idx"
+                    ),
+                    models.Index(
+                        fields=["pharmacy", "last_updated", "id"],
+                        name="stocktombstone_psync_idx",
+                    ),
+                ],
+            },
+        ),
+    ]
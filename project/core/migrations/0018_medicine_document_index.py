@@ -0,0 +1,33 @@
+from django.db import migrations
+
+DOCUMENT_INDEX = "core_medicine_document"
+
+
+def create_document_index(apps, schema_editor):
+    # Must stay the same expression as core.search.medicine_document(), which
+    # PostgresSearchBackend filters on, or the planner cannot use the index.
+    if schema_editor.connection.vendor == "postgresql":
+        from django.contrib.postgres.indexes import GinIndex
+        from django.contrib.postgres.search import SearchVector
+
+        Medicine = apps.get_model("core", "Medicine")
+        document = SearchVector("name", weight="A", config="simple") + SearchVector(
+            "manufacturer", weight="B", config="simple"
+        )
+        schema_editor.add_index(Medicine, GinIndex(document, name=DOCUMENT_INDEX))
+
+
+def drop_document_index(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(f"DROP INDEX IF EXISTS {DOCUMENT_INDEX}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0017_pharmacymedicinetombstone"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_document_index, drop_document_index),
+    ]
@@ -1,7 +1,12 @@
+import uuid
+
 from django.db import models
 from django.contrib.auth.models import AbstractUser
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
+from .storage import health_record_storage
+
 class User(AbstractUser):
     is_doctor = models.BooleanField(default=False)
     is_patient = models.BooleanField(default=True)
@@ -14,6 +19,16 @@ class Doctor(models.Model):
     license_number = models.CharField(max_length=50, unique=True)
     experience_years = models.PositiveIntegerField(default=0)
     available_times = models.JSONField(default=dict)
+    # Soonest open slot in the availability horizon, kept by core.directory;
+    # NULL checked date means an appointment or schedule change made it stale.
+    next_available = models.DateTimeField(null=True, blank=True, editable=False)
+    next_available_checked = models.DateField(null=True, blank=True, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['specialization', 'experience_years'], name='doctor_specialization_idx'),
+            models.Index(fields=['next_available', 'id'], name='doctor_next_available_idx'),
+        ]
 
 class Patient(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
@@ -39,14 +54,65 @@ class Appointment(models.Model):
     diagnosis = models.TextField(blank=True)
     prescription = models.TextField(blank=True)
     meeting_link = models.URLField(blank=True)
+    booked_at = models.DateTimeField(default=timezone.now, editable=False)
+    # Set by the symptom analyzer (core.triage); empty until the appointment is triaged.
+    triage_score = models.FloatField(null=True, blank=True, editable=False)
+    triage_severity = models.CharField(max_length=10, blank=True, editable=False)
+    # Severity rank while pending or confirmed, NULL otherwise: the work queue's sort key and index predicate.
+    queue_priority = models.PositiveSmallIntegerField(null=True, blank=True, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['doctor', '-date', '-time'], name='appointment_doctor_date_idx'),
+            models.Index(fields=['patient', '-date', '-time'], name='appointment_patient_date_idx'),
+            models.Index(fields=['doctor', 'patient', '-date', '-time'], name='appointment_doc_pat_date_idx'),
+            # Doctors' work queues (core.triage.work_queue); holds only the queued rows.
+            models.Index(
+                fields=['doctor', '-queue_priority', 'booked_at', 'id'],
+                name='appointment_triage_queue_idx',
+                condition=models.Q(queue_priority__isnull=False),
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['doctor', 'date', 'time'],
+                condition=models.Q(status__in=['pending', 'confirmed']),
+                name='unique_active_doctor_slot',
+            ),
+        ]
 
 class HealthRecord(models.Model):
     patient = models.ForeignKey(Patient, on_delete=models.CASCADE)
     date = models.DateField(auto_now_add=True)
     record_type = models.CharField(max_length=50)
-    file = models.FileField(upload_to='health_records/')
+    file = models.FileField(upload_to='health_records/', storage=health_record_storage)
+    filename = models.CharField(max_length=255, blank=True)
+    description = models.TextField(blank=True)
+    is_private = models.BooleanField(default=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['patient', '-date'], name='healthrecord_patient_date_idx'),
+        ]
+
+class StoredBlob(models.Model):
+    digest = models.CharField(max_length=64, primary_key=True)
+    size = models.PositiveBigIntegerField()
+    ref_count = models.PositiveIntegerField(default=0)
+    claimed_at = models.DateTimeField(auto_now=True)
+    released_at = models.DateTimeField(null=True, blank=True)
+
+class HealthRecordUpload(models.Model):
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    patient = models.ForeignKey(Patient, on_delete=models.CASCADE)
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField()
+    offset = models.PositiveBigIntegerField(default=0)
+    record_type = models.CharField(max_length=50)
     description = models.TextField(blank=True)
     is_private = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
 class Medicine(models.Model):
     name = models.CharField(max_length=100)
@@ -56,15 +122,94 @@ class Medicine(models.Model):
     price = models.DecimalField(max_digits=10, decimal_places=2)
     stock = models.PositiveIntegerField(default=0)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['name', 'manufacturer'], name='unique_medicine_name_manufacturer'),
+        ]
+
 class Pharmacy(models.Model):
     name = models.CharField(max_length=100)
     address = models.TextField()
     phone_number = models.CharField(max_length=15)
     email = models.EmailField()
+    latitude = models.FloatField(null=True, blank=True)
+    longitude = models.FloatField(null=True, blank=True)
+    # Grid cell of the coordinates for nearest-pharmacy lookups (core.geo).
+    geo_cell = models.IntegerField(null=True, blank=True, editable=False)
     medicines = models.ManyToManyField(Medicine, through='PharmacyMedicine')
 
+    class Meta:
+        indexes = [
+            # Covers the candidate scan, so distances are computed without touching the table.
+            models.Index(fields=['geo_cell', 'latitude', 'longitude'], name='pharmacy_geo_cell_idx'),
+        ]
+
 class PharmacyMedicine(models.Model):
     pharmacy = models.ForeignKey(Pharmacy, on_delete=models.CASCADE)
     medicine = models.ForeignKey(Medicine, on_delete=models.CASCADE)
     stock = models.PositiveIntegerField(default=0)
     last_updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['medicine', 'pharmacy'],
+                condition=models.Q(stock__gt=0),
+                name='pharmacymedicine_in_stock_idx',
+            ),
+            # Delta sync pulls walk rows in (last_updated, id) order, overall or per pharmacy.
+            models.Index(fields=['last_updated', 'id'], name='pharmacymedicine_sync_idx'),
+            models.Index(fields=['pharmacy', 'last_updated', 'id'], name='pharmacymedicine_psync_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['pharmacy', 'medicine'], name='unique_pharmacy_medicine'),
+        ]
+
+class PharmacyMedicineTombstone(models.Model):
+    """A deleted ``PharmacyMedicine`` row, kept under its old id so delta sync pulls report the deletion."""
+    id = models.BigIntegerField(primary_key=True)
+    # Like DataVersion: written during cascading deletes of the rows it points at.
+    pharmacy = models.ForeignKey(Pharmacy, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+    medicine = models.ForeignKey(Medicine, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+    last_updated = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['last_updated', 'id'], name='stocktombstone_sync_idx'),
+            models.Index(fields=['pharmacy', 'last_updated', 'id'], name='stocktombstone_psync_idx'),
+        ]
+
+class MedicineAvailability(models.Model):
+    """In-stock totals per medicine, kept in step with ``PharmacyMedicine`` by ``core.inventory``."""
+    medicine = models.OneToOneField(Medicine, on_delete=models.CASCADE, primary_key=True, related_name='availability')
+    total_stock = models.PositiveBigIntegerField(default=0)
+    pharmacy_count = models.PositiveIntegerField(default=0)
+    min_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+class StockSyncBatch(models.Model):
+    """A pushed batch of stock changes, kept so a retried push is answered instead of reapplied."""
+    pharmacy = models.ForeignKey(Pharmacy, on_delete=models.CASCADE)
+    idempotency_key = models.CharField(max_length=64)
+    request_hash = models.CharField(max_length=64)
+    response = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['pharmacy', 'idempotency_key'], name='unique_stock_sync_key'),
+        ]
+
+class DataVersion(models.Model):
+    """How many times the data behind one of a user's read APIs has changed, for conditional GETs (``core.versions``)."""
+    # No constraint or cascade: a bump during a cascading delete could otherwise
+    # recreate a row the delete has already collected. Leftover rows are harmless.
+    user = models.ForeignKey(User, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+    scope = models.CharField(max_length=32)
+    version = models.PositiveBigIntegerField(default=1)
+    changed_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'scope'], name='unique_data_version'),
+        ]
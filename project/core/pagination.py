@@ -0,0 +1,194 @@
+"""
+Keyset (cursor) pagination for the list APIs.
+
+Pages are selected with a ``WHERE (date, time, id) < (...)`` style predicate on
+the last row of the previous page instead of an OFFSET, so the cost of a page
+does not grow with the position in a user's history.
+"""
+import base64
+import json
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from .serializers import setup_eager_loading
+
+
+class KeysetPagination(BasePagination):
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def __init__(self, ordering, cursor_query_param=None, nulls_last=False):
+        # The last field must be unique so that every row has a distinct position.
+        # With nulls_last, NULLs in the other fields sort after every value.
+        self.ordering = tuple(ordering)
+        if cursor_query_param:
+            self.cursor_query_param = cursor_query_param
+        self.nulls_last = nulls_last
+        self.next_position = None
+
+    @property
+    def fields(self):
+        return [field.lstrip('-') for field in self.ordering]
+
+    def get_page_size(self, request):
+        default = getattr(settings, 'API_PAGE_SIZE', 50)
+        maximum = getattr(settings, 'API_MAX_PAGE_SIZE', 200)
+        try:
+            page_size = int(request.query_params.get(self.page_size_query_param, default))
+        except (TypeError, ValueError):
+            return default
+        return max(1, min(page_size, maximum))
+
+    def encode_cursor(self, position):
+        raw = json.dumps(position, separators=(',', ':')).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+    def decode_cursor(self, request, model):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            raw = base64.urlsafe_b64decode(encoded + '=' * (-len(encoded) % 4))
+            position = json.loads(raw)
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        try:
+            return [
+                model._meta.get_field(field).to_python(value)
+                for field, value in zip(self.fields, position)
+            ]
+        except (TypeError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def order_by(self):
+        if not self.nulls_last:
+            return self.ordering
+        return [
+            F(field[1:]).desc(nulls_last=True) if field.startswith('-') else F(field).asc(nulls_last=True)
+            for field in self.ordering[:-1]
+        ] + [self.ordering[-1]]
+
+    def after(self, position):
+        # (a, b) after (x, y)  ==  a after x OR (a = x AND b after y), per ordering direction
+        condition = Q()
+        for field, value in reversed(list(zip(self.ordering, position))):
+            name = field.lstrip('-')
+            lookup = f'{name}__lt' if field.startswith('-') else f'{name}__gt'
+            if value is None:
+                # Nothing sorts after NULL but other NULLs.
+                beyond, same = Q(pk__in=[]), Q(**{f'{name}__isnull': True})
+            else:
+                beyond, same = Q(**{lookup: value}), Q(**{name: value})
+                if self.nulls_last:
+                    beyond |= Q(**{f'{name}__isnull': True})
+            condition = beyond if not condition else beyond | (same & condition)
+        return condition
+
+    def position_of(self, obj):
+        position = []
+        for field in self.fields:
+            value = getattr(obj, field)
+            position.append(value.isoformat() if hasattr(value, 'isoformat') else value)
+        return position
+
+    def page_queryset(self, queryset, request):
+        """The ordered queryset for the requested page, with one extra row to tell whether another follows."""
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        queryset = queryset.order_by(*self.order_by())
+
+        position = self.decode_cursor(request, queryset.model)
+        if position is not None:
+            queryset = queryset.filter(self.after(position))
+        return queryset[:self.page_size + 1]
+
+    def paginate_list(self, rows, request, model):
+        """
+        ``paginate_queryset`` for rows of ``model`` (instances, or anything
+        with its ordering fields as attributes) already sorted in Python by an
+        all-ascending ordering without NULLs.
+        """
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        position = self.decode_cursor(request, model)
+        if position is not None:
+            position = tuple(position)
+            rows = [row for row in rows if tuple(getattr(row, field) for field in self.fields) > position]
+        return self.take_page(rows[:self.page_size + 1])
+
+    def take_page(self, rows):
+        page = rows[:self.page_size]
+        self.next_position = self.position_of(page[-1]) if len(rows) > self.page_size else None
+        return page
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.take_page(list(self.page_queryset(queryset, request)))
+
+    def paginate_querysets(self, querysets, request):
+        """
+        ``paginate_queryset`` over several querysets read as one, for an
+        all-ascending ordering without NULLs under which no two of their rows
+        tie (e.g. models sharing one id space).
+        """
+        rows = [row for queryset in querysets for row in self.page_queryset(queryset, request)]
+        rows.sort(key=lambda row: tuple(getattr(row, field) for field in self.fields))
+        return self.take_page(rows[:self.page_size + 1])
+
+    async def apaginate_queryset(self, queryset, request):
+        return self.take_page([row async for row in self.page_queryset(queryset, request)])
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.next_position))
+
+    def get_paginated_data(self, data):
+        return {
+            'next': self.get_next_link(),
+            'results': data,
+        }
+
+    def get_paginated_response(self, data):
+        return Response(self.get_paginated_data(data))
+
+
+APPOINTMENT_ORDERING = ('-date', '-time', '-id')
+HEALTH_RECORD_ORDERING = ('-date', '-id')
+PATIENT_ORDERING = ('id',)
+STOCK_CHANGE_ORDERING = ('last_updated', 'id')
+DOCTOR_DIRECTORY_ORDERING = ('next_available', 'id')
+WORK_QUEUE_ORDERING = ('-queue_priority', 'booked_at', 'id')
+
+
+def paginate(request, queryset, serializer_class, ordering, cursor_query_param=None):
+    """
+    Serialize one keyset page of ``queryset``: ``API_PAGE_SIZE`` rows unless
+    the client asks for another ``?page_size=`` (up to ``API_MAX_PAGE_SIZE``),
+    with a ``next`` link while more remain.
+    """
+    paginator = KeysetPagination(ordering, cursor_query_param)
+    queryset = setup_eager_loading(queryset, serializer_class)
+    page = paginator.paginate_queryset(queryset, request)
+    return paginator.get_paginated_data(serializer_class(page, many=True).data)
+
+
+async def apaginate(request, queryset, serializer_class, ordering, cursor_query_param=None):
+    """
+    ``paginate`` for async views: rows are read with the async ORM and
+    serialized on the event loop, so ``serializer_class`` must not touch the
+    database beyond its eager-loaded relations.
+    """
+    paginator = KeysetPagination(ordering, cursor_query_param)
+    queryset = setup_eager_loading(queryset, serializer_class)
+    page = await paginator.apaginate_queryset(queryset, request)
+    return paginator.get_paginated_data(serializer_class(page, many=True).data)
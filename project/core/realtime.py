@@ -0,0 +1,79 @@
+"""
+Channel-layer groups for the WebSocket consumers in ``core.consumers``.
+
+Appointment changes are pushed to the groups of the doctor and patient
+involved, so open pages update in place instead of reloading the whole
+appointment list. Each appointment also has a meeting group used for WebRTC
+signaling between its doctor and patient.
+"""
+import json
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from .models import Appointment
+from .serializers import AppointmentSerializer
+
+MEETING_STATUSES = ('confirmed',)
+
+
+def doctor_group(doctor_id):
+    return f'appointments.doctor.{doctor_id}'
+
+
+def patient_group(patient_id):
+    return f'appointments.patient.{patient_id}'
+
+
+def user_groups(user):
+    """Groups a user's sockets join; runs queries, so call it from sync code."""
+    groups = []
+    if hasattr(user, 'doctor'):
+        groups.append(doctor_group(user.doctor.id))
+    if hasattr(user, 'patient'):
+        groups.append(patient_group(user.patient.id))
+    return groups
+
+
+def appointment_message(appointment, event):
+    # Round-trip through JSON so the message only holds plain types that any
+    # channel layer can serialize.
+    data = json.loads(JSONRenderer().render(AppointmentSerializer(appointment).data))
+    groups = [doctor_group(appointment.doctor_id), patient_group(appointment.patient_id)]
+    return groups, {'type': 'appointment.update', 'event': event, 'appointment': data}
+
+
+def publish_appointment(appointment, event='updated'):
+    """Send ``appointment`` to both participants once the current transaction commits."""
+    groups, message = appointment_message(appointment, event)
+
+    def send():
+        layer = get_channel_layer()
+        if layer is None:
+            return
+        for group in groups:
+            async_to_sync(layer.group_send)(group, message)
+
+    transaction.on_commit(send)
+
+
+def meeting_group(appointment_id):
+    return f'meeting.{appointment_id}'
+
+
+def meeting_role(user, appointment_id):
+    """Return ``'doctor'`` or ``'patient'`` if ``user`` may join the appointment's meeting, else ``None``."""
+    appointment = (
+        Appointment.objects.filter(id=appointment_id, status__in=MEETING_STATUSES)
+        .values('doctor__user_id', 'patient__user_id')
+        .first()
+    )
+    if appointment is None:
+        return None
+    if appointment['doctor__user_id'] == user.id:
+        return 'doctor'
+    if appointment['patient__user_id'] == user.id:
+        return 'patient'
+    return None
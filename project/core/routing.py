@@ -0,0 +1,8 @@
+from django.urls import path
+
+from . import consumers
+
+websocket_urlpatterns = [
+    path('ws/appointments/', consumers.AppointmentUpdatesConsumer.as_asgi(), name='appointment_updates'),
+    path('ws/meetings/<int:appointment_id>/', consumers.MeetingConsumer.as_asgi(), name='meeting_signaling'),
+]
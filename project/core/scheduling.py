@@ -0,0 +1,125 @@
+"""
+Slot-based availability for doctors.
+
+``Doctor.available_times`` maps weekday names to time ranges, as saved by the
+schedule page (``{"monday": "09:00-12:00, 14:00-17:00"}``). Each range is cut
+into fixed-length slots; a slot is open when no pending or confirmed
+appointment holds it.
+"""
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+
+from .models import Appointment, Doctor
+
+WEEKDAYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+ACTIVE_STATUSES = ('pending', 'confirmed')
+MAX_RANGE_DAYS = 62
+
+
+class SlotUnavailable(Exception):
+    pass
+
+
+def slot_minutes():
+    return getattr(settings, 'APPOINTMENT_SLOT_MINUTES', 30)
+
+
+def parse_ranges(value):
+    if isinstance(value, str):
+        value = value.split(',')
+    ranges = []
+    for item in value or []:
+        try:
+            start, end = (
+                datetime.strptime(part.strip(), '%H:%M').time() for part in str(item).split('-')
+            )
+        except ValueError:
+            continue
+        if start < end:
+            ranges.append((start, end))
+    return ranges
+
+
+def expand_ranges(ranges):
+    step = timedelta(minutes=slot_minutes())
+    slots = []
+    for start, end in ranges:
+        current = datetime.combine(date.min, start)
+        limit = datetime.combine(date.min, end)
+        while current + step <= limit:
+            slots.append(current.time())
+            current += step
+    return sorted(set(slots))
+
+
+def weekly_slots(available_times):
+    """Map weekday number (Monday is 0) to the sorted slot start times on that day."""
+    available_times = available_times if isinstance(available_times, dict) else {}
+    return {
+        weekday: expand_ranges(parse_ranges(available_times.get(name)))
+        for weekday, name in enumerate(WEEKDAYS)
+    }
+
+
+def booked_slots(doctor, start, end):
+    booked = defaultdict(set)
+    rows = Appointment.objects.filter(
+        doctor=doctor, date__range=(start, end), status__in=ACTIVE_STATUSES
+    ).values_list('date', 'time')
+    for day, slot in rows:
+        booked[day].add(slot)
+    return booked
+
+
+def booked_slots_by_doctor(doctor_ids, start, end):
+    """
+    ``booked_slots`` for many doctors (ids, or a queryset of them) in one
+    query: ``{doctor_id: {date: {time, ...}}}``.
+    """
+    booked = defaultdict(lambda: defaultdict(set))
+    rows = Appointment.objects.filter(
+        doctor_id__in=doctor_ids, date__range=(start, end), status__in=ACTIVE_STATUSES
+    ).values_list('doctor_id', 'date', 'time')
+    for doctor_id, day, slot in rows:
+        booked[doctor_id][day].add(slot)
+    return booked
+
+
+def open_slots(doctor, start, end):
+    """Return ``{date: [time, ...]}`` of free slots between ``start`` and ``end`` inclusive."""
+    weekly = weekly_slots(doctor.available_times)
+    booked = booked_slots(doctor, start, end)
+    slots = {}
+    day = start
+    while day <= end:
+        free = [slot for slot in weekly[day.weekday()] if slot not in booked[day]]
+        if free:
+            slots[day] = free
+        day += timedelta(days=1)
+    return slots
+
+
+def book_appointment(doctor, patient, day, slot, symptoms=''):
+    if day < date.today():
+        raise SlotUnavailable('Appointments cannot be booked in the past')
+    if slot not in weekly_slots(doctor.available_times)[day.weekday()]:
+        raise SlotUnavailable('The doctor is not available at that time')
+
+    try:
+        with transaction.atomic():
+            # Serializes bookings for the doctor on backends with row locks; the
+            # partial unique constraint catches anything that slips past.
+            Doctor.objects.select_for_update().filter(pk=doctor.pk).first()
+            taken = Appointment.objects.filter(
+                doctor=doctor, date=day, time=slot, status__in=ACTIVE_STATUSES
+            ).exists()
+            if taken:
+                raise SlotUnavailable('That slot has already been booked')
+            return Appointment.objects.create(
+                doctor=doctor, patient=patient, date=day, time=slot, symptoms=symptoms
+            )
+    except IntegrityError:
+        raise SlotUnavailable('That slot has already been booked')
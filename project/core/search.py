@@ -0,0 +1,199 @@
+"""
+Medicine search backends.
+
+Every backend exposes the same interface: ``search(queryset, query)`` returns
+the matching medicines ordered by relevance, and ``index``/``reindex``/``remove``/
+``rebuild`` keep whatever index the backend relies on in sync with the
+``Medicine`` table. ``reindex`` takes a batch of ids, for bulk writes that
+bypass the model signals.
+
+A backend works on one database alias. ``find_medicines`` picks the alias
+the queryset reads from (a replica inside ``@replica_reads`` views) and runs
+both the index lookup and the row fetch there, so the expensive match does
+not land on the primary and the ids and rows never come from databases at
+different points of replication.
+"""
+import re
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import Case, F, IntegerField, Q, When
+
+FTS_TABLE = 'core_medicine_fts'
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def tokenize(query):
+    return [token.lower() for token in TOKEN_RE.findall(query)]
+
+
+def result_limit():
+    return getattr(settings, 'MEDICINE_SEARCH_LIMIT', 50)
+
+
+class SearchBackend:
+    def __init__(self, using=DEFAULT_DB_ALIAS):
+        self.using = using
+
+    @property
+    def connection(self):
+        return connections[self.using]
+
+
+class IcontainsSearchBackend(SearchBackend):
+    """Unindexed substring scan, used when no full-text index is available."""
+
+    def search(self, queryset, query):
+        return queryset.filter(
+            Q(name__icontains=query) | Q(manufacturer__icontains=query)
+        ).order_by('name', 'id')[:result_limit()]
+
+    def index(self, medicine):
+        pass
+
+    def reindex(self, medicine_ids):
+        pass
+
+    def remove(self, medicine_id):
+        pass
+
+    def rebuild(self):
+        pass
+
+
+class SQLiteFTSSearchBackend(SearchBackend):
+    """FTS5 virtual table keyed by medicine id, ranked by bm25 with name weighted above manufacturer."""
+
+    def search(self, queryset, query):
+        tokens = tokenize(query)
+        if not tokens:
+            return queryset.none()
+
+        match = ' '.join(f'"{token}"*' for token in tokens)
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s '
+                f'ORDER BY bm25({FTS_TABLE}, 10.0, 1.0) LIMIT %s',
+                [match, result_limit()],
+            )
+            ids = [row[0] for row in cursor.fetchall()]
+
+        if not ids:
+            return queryset.none()
+        ranking = Case(
+            *[When(pk=pk, then=position) for position, pk in enumerate(ids)],
+            output_field=IntegerField(),
+        )
+        return queryset.filter(pk__in=ids).order_by(ranking)
+
+    def index(self, medicine):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [medicine.pk])
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, name, manufacturer) VALUES (%s, %s, %s)',
+                [medicine.pk, medicine.name, medicine.manufacturer],
+            )
+
+    def reindex(self, medicine_ids):
+        medicine_ids = list(medicine_ids)
+        if not medicine_ids:
+            return
+        placeholders = ', '.join(['%s'] * len(medicine_ids))
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})', medicine_ids)
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, name, manufacturer) '
+                f'SELECT id, name, manufacturer FROM core_medicine WHERE id IN ({placeholders})',
+                medicine_ids,
+            )
+
+    def remove(self, medicine_id):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [medicine_id])
+
+    def rebuild(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, name, manufacturer) '
+                f'SELECT id, name, manufacturer FROM core_medicine'
+            )
+
+
+def medicine_document():
+    """The weighted tsvector Postgres matches medicines on; migration 0018 indexes a copy of it."""
+    from django.contrib.postgres.search import SearchVector
+
+    return (
+        SearchVector('name', weight='A', config='simple')
+        + SearchVector('manufacturer', weight='B', config='simple')
+    )
+
+
+class PostgresSearchBackend(SearchBackend):
+    """
+    Weighted tsvector prefix match combined with trigram similarity on the name.
+
+    Both filters are written the way the GIN indexes are built, the vector
+    through ``medicine_document`` and the trigram match with the ``%``
+    operator (above ``pg_trgm.similarity_threshold``, 0.3 by default), so
+    Postgres can OR two index scans instead of ranking every row.
+    """
+
+    def search(self, queryset, query):
+        from django.contrib.postgres.lookups import TrigramSimilar
+        from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramSimilarity
+
+        tokens = tokenize(query)
+        if not tokens:
+            return queryset.none()
+
+        search_query = SearchQuery(
+            ' & '.join(f'{token}:*' for token in tokens), search_type='raw', config='simple'
+        )
+        return queryset.annotate(
+            document=medicine_document(),
+        ).filter(
+            Q(document=search_query) | Q(TrigramSimilar(F('name'), query))
+        ).annotate(
+            rank=SearchRank(F('document'), search_query) + TrigramSimilarity('name', query),
+        ).order_by('-rank', 'id')[:result_limit()]
+
+    # The GIN indexes are maintained by Postgres itself.
+    def index(self, medicine):
+        pass
+
+    def reindex(self, medicine_ids):
+        pass
+
+    def remove(self, medicine_id):
+        pass
+
+    def rebuild(self):
+        pass
+
+
+_fts_tables = {}
+
+
+def fts_table_exists(using=DEFAULT_DB_ALIAS):
+    connection = connections[using]
+    name = connection.settings_dict['NAME']
+    if name not in _fts_tables:
+        _fts_tables[name] = FTS_TABLE in connection.introspection.table_names()
+    return _fts_tables[name]
+
+
+def get_backend(using=DEFAULT_DB_ALIAS):
+    vendor = connections[using].vendor
+    if vendor == 'postgresql':
+        return PostgresSearchBackend(using)
+    if vendor == 'sqlite' and fts_table_exists(using):
+        return SQLiteFTSSearchBackend(using)
+    return IcontainsSearchBackend(using)
+
+
+def find_medicines(queryset, query):
+    """Search ``queryset`` on the database it reads from, index lookup and rows alike."""
+    using = queryset.db
+    return get_backend(using).search(queryset.using(using), query)
@@ -1,6 +1,28 @@
+from django.urls import reverse
 from rest_framework import serializers
 from .models import HealthRecord, Appointment, Doctor, Patient, Medicine, Pharmacy
 
+class EagerLoadingMixin:
+    """
+    Serializers list the relations they walk so that views can load them with
+    the queryset instead of issuing one query per row and relation.
+    """
+    select_related_fields = ()
+    prefetch_related_fields = ()
+
+    @classmethod
+    def setup_eager_loading(cls, queryset):
+        if cls.select_related_fields:
+            queryset = queryset.select_related(*cls.select_related_fields)
+        if cls.prefetch_related_fields:
+            queryset = queryset.prefetch_related(*cls.prefetch_related_fields)
+        return queryset
+
+def setup_eager_loading(queryset, serializer_class):
+    if issubclass(serializer_class, EagerLoadingMixin):
+        return serializer_class.setup_eager_loading(queryset)
+    return queryset
+
 class UserSerializer(serializers.Serializer):
     id = serializers.IntegerField()
     username = serializers.CharField()
@@ -8,41 +30,63 @@ class UserSerializer(serializers.Serializer):
     first_name = serializers.CharField()
     last_name = serializers.CharField()
 
-class DoctorSerializer(serializers.ModelSerializer):
+class DoctorSerializer(EagerLoadingMixin, serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
+    select_related_fields = ('user',)
     
     class Meta:
         model = Doctor
         fields = ['id', 'user', 'specialization', 'experience_years', 'available_times']
 
-class PatientSerializer(serializers.ModelSerializer):
+class DoctorDirectorySerializer(DoctorSerializer):
+    next_available = serializers.DateTimeField(read_only=True, format='%Y-%m-%dT%H:%M')
+    
+    class Meta(DoctorSerializer.Meta):
+        fields = ['id', 'user', 'specialization', 'experience_years', 'next_available']
+
+class PatientSerializer(EagerLoadingMixin, serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
+    select_related_fields = ('user',)
     
     class Meta:
         model = Patient
         fields = ['id', 'user', 'date_of_birth', 'blood_group', 'emergency_contact']
 
 class HealthRecordSerializer(serializers.ModelSerializer):
+    file = serializers.SerializerMethodField()
+    
+    def get_file(self, record):
+        # Files are served through the authorized, Range-aware download view rather than MEDIA_URL.
+        if not record.file:
+            return None
+        return reverse('download_health_record', args=[record.id])
+    
     class Meta:
         model = HealthRecord
-        fields = ['id', 'date', 'record_type', 'file', 'description', 'is_private']
+        fields = ['id', 'date', 'record_type', 'file', 'filename', 'description', 'is_private']
 
-class AppointmentSerializer(serializers.ModelSerializer):
+class AppointmentSerializer(EagerLoadingMixin, serializers.ModelSerializer):
     doctor = DoctorSerializer(read_only=True)
     patient = PatientSerializer(read_only=True)
+    select_related_fields = ('doctor__user', 'patient__user')
     
     class Meta:
         model = Appointment
-        fields = ['id', 'doctor', 'patient', 'date', 'time', 'status', 'symptoms', 'diagnosis', 'prescription', 'meeting_link']
+        fields = [
+            'id', 'doctor', 'patient', 'date', 'time', 'status', 'symptoms', 'diagnosis', 'prescription', 'meeting_link',
+            'booked_at', 'triage_score', 'triage_severity'
+        ]
 
 class MedicineSerializer(serializers.ModelSerializer):
     class Meta:
         model = Medicine
         fields = ['id', 'name', 'manufacturer', 'description', 'is_available', 'price', 'stock']
+        read_only_fields = ['is_available', 'stock']
 
-class PharmacySerializer(serializers.ModelSerializer):
+class PharmacySerializer(EagerLoadingMixin, serializers.ModelSerializer):
     medicines = MedicineSerializer(many=True, read_only=True)
+    prefetch_related_fields = ('medicines',)
     
     class Meta:
         model = Pharmacy
-        fields = ['id', 'name', 'address', 'phone_number', 'email', 'medicines']
+        fields = ['id', 'name', 'address', 'phone_number', 'email', 'latitude', 'longitude', 'medicines']
@@ -0,0 +1,269 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save, pre_save
+from django.dispatch import receiver
+from django.utils.dateparse import parse_date
+
+from .availability import changed_weekdays, get_availability_cache
+from .directory import bump_facet_version, update_next_available
+from .geo import grid_cell
+from .inventory import refresh_availability
+from .models import Appointment, Doctor, HealthRecord, Medicine, Patient, Pharmacy, PharmacyMedicine, PharmacyMedicineTombstone, User
+from .search import get_backend
+from .storage import claim_blob, release_blob
+from .triage import queue_priority, triage_appointment
+from .versions import APPOINTMENTS, HEALTH_RECORDS, PATIENTS, SCHEDULE, bump_data_versions
+
+
+@receiver(post_save, sender=Medicine)
+def index_medicine(sender, instance, raw=False, **kwargs):
+    if not raw:
+        get_backend().index(instance)
+
+
+@receiver(post_delete, sender=Medicine)
+def unindex_medicine(sender, instance, **kwargs):
+    get_backend().remove(instance.pk)
+
+
+@receiver(post_save, sender=Medicine)
+def refresh_medicine_availability(sender, instance, raw=False, **kwargs):
+    # Creates the aggregate row and follows price changes into min_price.
+    if not raw:
+        refresh_availability([instance.pk])
+
+
+@receiver(pre_save, sender=Pharmacy)
+def assign_pharmacy_grid_cell(sender, instance, **kwargs):
+    instance.geo_cell = grid_cell(instance.latitude, instance.longitude)
+
+
+@receiver(post_init, sender=PharmacyMedicine)
+def remember_stocked_medicine(sender, instance, **kwargs):
+    if 'medicine_id' not in instance.get_deferred_fields():
+        instance._saved_medicine_id = instance.medicine_id
+
+
+@receiver(post_save, sender=PharmacyMedicine)
+def refresh_availability_on_stock_save(sender, instance, raw=False, **kwargs):
+    if not raw:
+        refresh_availability({instance.medicine_id, getattr(instance, '_saved_medicine_id', None)} - {None})
+    instance._saved_medicine_id = instance.medicine_id
+
+
+@receiver(post_delete, sender=PharmacyMedicine)
+def refresh_availability_on_stock_delete(sender, instance, origin=None, **kwargs):
+    # When the medicine itself is being deleted its aggregate goes with it;
+    # refreshing here could recreate the row mid-cascade.
+    if isinstance(origin, Medicine) or getattr(origin, 'model', None) is Medicine:
+        return
+    refresh_availability([instance.medicine_id])
+
+
+@receiver(post_delete, sender=PharmacyMedicine)
+def record_stock_tombstone(sender, instance, **kwargs):
+    PharmacyMedicineTombstone.objects.create(
+        id=instance.id, pharmacy_id=instance.pharmacy_id, medicine_id=instance.medicine_id
+    )
+
+
+def invalidate_now_and_on_commit(invalidate):
+    # Dropping entries right away keeps this process consistent; dropping them
+    # again after commit discards anything a concurrent reader cached from the
+    # pre-commit state.
+    invalidate()
+    transaction.on_commit(invalidate)
+
+
+@receiver(post_init, sender=Doctor)
+def remember_doctor_state(sender, instance, **kwargs):
+    deferred = instance.get_deferred_fields()
+    if 'available_times' not in deferred:
+        instance._saved_available_times = instance.available_times
+    if 'specialization' not in deferred:
+        instance._saved_specialization = instance.specialization
+
+
+@receiver(post_save, sender=Doctor)
+def invalidate_doctor_availability(sender, instance, created=False, **kwargs):
+    cache = get_availability_cache()
+    if created:
+        weekdays = set(range(7))
+    elif hasattr(instance, '_saved_available_times'):
+        weekdays = changed_weekdays(instance._saved_available_times, instance.available_times)
+    else:
+        return
+    instance._saved_available_times = instance.available_times
+    if weekdays:
+        invalidate_now_and_on_commit(lambda: cache.invalidate_weekdays(instance.pk, weekdays))
+
+
+@receiver(post_save, sender=Doctor)
+def update_doctor_next_available(sender, instance, raw=False, **kwargs):
+    # A save writes back whatever next_available the instance was loaded with.
+    if not raw:
+        update_next_available([instance.pk])
+
+
+@receiver(post_save, sender=Doctor)
+def refresh_specialization_facets(sender, instance, created=False, **kwargs):
+    if created or getattr(instance, '_saved_specialization', None) != instance.specialization:
+        invalidate_now_and_on_commit(bump_facet_version)
+    instance._saved_specialization = instance.specialization
+
+
+@receiver(post_delete, sender=Doctor)
+def refresh_specialization_facets_on_delete(sender, instance, **kwargs):
+    invalidate_now_and_on_commit(bump_facet_version)
+
+
+@receiver(post_init, sender=Appointment)
+def remember_appointment_slot(sender, instance, **kwargs):
+    deferred = instance.get_deferred_fields()
+    if not {'doctor_id', 'date'} & deferred:
+        instance._saved_slot = (instance.doctor_id, instance.date)
+    if 'symptoms' not in deferred and instance.pk is not None:
+        instance._saved_symptoms = instance.symptoms
+
+
+@receiver(pre_save, sender=Appointment)
+def triage_appointment_symptoms(sender, instance, raw=False, **kwargs):
+    # Scores new bookings and edited symptoms; status changes keep the score
+    # and only move the appointment into or out of the work queue.
+    if raw:
+        return
+    if instance.triage_score is None or getattr(instance, '_saved_symptoms', None) != instance.symptoms:
+        triage_appointment(instance)
+    instance._saved_symptoms = instance.symptoms
+    instance.queue_priority = queue_priority(instance.status, instance.triage_severity)
+
+
+def invalidate_appointment_days(instance):
+    affected = {(instance.doctor_id, instance.date)}
+    if getattr(instance, '_saved_slot', None) and instance._saved_slot[0]:
+        affected.add(instance._saved_slot)
+    instance._saved_slot = (instance.doctor_id, instance.date)
+    update_next_available(doctor_id for doctor_id, day in affected)
+
+    cache = get_availability_cache()
+
+    def invalidate():
+        for doctor_id, day in affected:
+            if isinstance(day, str):
+                day = parse_date(day)
+            if doctor_id and day:
+                cache.invalidate_days(doctor_id, [day])
+
+    invalidate_now_and_on_commit(invalidate)
+
+
+@receiver(post_save, sender=Appointment)
+def invalidate_availability_on_save(sender, instance, **kwargs):
+    invalidate_appointment_days(instance)
+
+
+@receiver(post_delete, sender=Appointment)
+def invalidate_availability_on_delete(sender, instance, **kwargs):
+    invalidate_appointment_days(instance)
+
+
+@receiver(post_init, sender=HealthRecord)
+def remember_health_record_file(sender, instance, **kwargs):
+    if 'file' not in instance.get_deferred_fields():
+        instance._saved_file_name = instance.file.name
+
+
+@receiver(post_save, sender=HealthRecord)
+def count_health_record_blob(sender, instance, created=False, **kwargs):
+    previous = None if created else getattr(instance, '_saved_file_name', None)
+    if instance.file.name != previous:
+        claim_blob(instance.file.name)
+        release_blob(previous)
+    instance._saved_file_name = instance.file.name
+
+
+@receiver(post_delete, sender=HealthRecord)
+def release_health_record_blob(sender, instance, **kwargs):
+    release_blob(instance.file.name)
+
+
+# Data versions (core.versions): every write bumps the counters of the users
+# whose polled responses it changes.
+
+def profile_user_ids(model, ids):
+    return list(model.objects.filter(pk__in=set(ids) - {None}).values_list('user_id', flat=True))
+
+
+@receiver(post_init, sender=Appointment)
+def remember_appointment_parties(sender, instance, **kwargs):
+    if not {'doctor_id', 'patient_id'} & instance.get_deferred_fields():
+        instance._saved_parties = (instance.doctor_id, instance.patient_id)
+
+
+def bump_appointment_versions(instance, joined_or_left):
+    parties = (instance.doctor_id, instance.patient_id)
+    saved = getattr(instance, '_saved_parties', None) or parties
+    instance._saved_parties = parties
+    doctors = profile_user_ids(Doctor, {parties[0], saved[0]})
+    bump_data_versions(APPOINTMENTS, doctors + profile_user_ids(Patient, {parties[1], saved[1]}))
+    if joined_or_left or saved != parties:
+        bump_data_versions(PATIENTS, doctors)
+
+
+@receiver(post_save, sender=Appointment)
+def bump_versions_on_appointment_save(sender, instance, created=False, **kwargs):
+    bump_appointment_versions(instance, created)
+
+
+@receiver(post_delete, sender=Appointment)
+def bump_versions_on_appointment_delete(sender, instance, **kwargs):
+    bump_appointment_versions(instance, True)
+
+
+def bump_profile_versions(doctor=None, patient=None):
+    # Doctors and patients are serialized into every appointment they share,
+    # and patients into their doctors' patient lists.
+    if doctor is not None:
+        patients = Patient.objects.filter(appointment__doctor=doctor).values_list('user_id', flat=True).distinct()
+        bump_data_versions(APPOINTMENTS, [doctor.user_id, *patients])
+    if patient is not None:
+        doctors = list(Doctor.objects.filter(appointment__patient=patient).values_list('user_id', flat=True).distinct())
+        bump_data_versions(APPOINTMENTS, [patient.user_id, *doctors])
+        bump_data_versions(PATIENTS, doctors)
+
+
+@receiver(post_save, sender=Doctor)
+def bump_versions_on_doctor_save(sender, instance, **kwargs):
+    bump_data_versions(SCHEDULE, [instance.user_id])
+    bump_profile_versions(doctor=instance)
+
+
+@receiver(post_save, sender=Patient)
+def bump_versions_on_patient_save(sender, instance, **kwargs):
+    bump_profile_versions(patient=instance)
+
+
+SERIALIZED_USER_FIELDS = ('username', 'email', 'first_name', 'last_name')
+
+
+@receiver(post_init, sender=User)
+def remember_user_details(sender, instance, **kwargs):
+    if not set(SERIALIZED_USER_FIELDS) & instance.get_deferred_fields():
+        instance._saved_details = tuple(getattr(instance, field) for field in SERIALIZED_USER_FIELDS)
+
+
+@receiver(post_save, sender=User)
+def bump_versions_on_user_save(sender, instance, created=False, **kwargs):
+    # Logins save last_login on every sign-in; only changes that show up in responses count.
+    details = tuple(getattr(instance, field) for field in SERIALIZED_USER_FIELDS)
+    if not created and getattr(instance, '_saved_details', None) != details:
+        bump_profile_versions(
+            doctor=Doctor.objects.filter(user=instance).first(),
+            patient=Patient.objects.filter(user=instance).first(),
+        )
+    instance._saved_details = details
+
+
+@receiver(post_save, sender=HealthRecord)
+@receiver(post_delete, sender=HealthRecord)
+def bump_versions_on_health_record_change(sender, instance, **kwargs):
+    bump_data_versions(HEALTH_RECORDS, profile_user_ids(Patient, [instance.patient_id]))
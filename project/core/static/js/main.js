@@ -1,5 +1,170 @@
 // Main JavaScript file for the telemedicine platform
 
+function getCookie(name) {
+    const match = document.cookie.split(';').map(c => c.trim()).find(c => c.startsWith(name + '='));
+    return match ? decodeURIComponent(match.slice(name.length + 1)) : null;
+}
+
+// Upload a health record in resumable chunks so large scans never have to be
+// sent (or held by the server) in one piece. Resolves with the created record.
+async function uploadHealthRecordInChunks(file, fields, chunkSize = 5 * 1024 * 1024) {
+    const headers = {'X-CSRFToken': getCookie('csrftoken')};
+    let response = await fetch('/api/health-records/uploads/', {
+        method: 'POST',
+        headers: {...headers, 'Content-Type': 'application/json'},
+        body: JSON.stringify({...fields, filename: file.name, size: file.size})
+    });
+    let upload = await response.json();
+    if (!response.ok) {
+        throw new Error(upload.error || 'Failed to start upload');
+    }
+
+    let retries = 0;
+    while (upload.offset < upload.size) {
+        try {
+            response = await fetch(`/api/health-records/uploads/${upload.id}/`, {
+                method: 'PATCH',
+                headers: {
+                    ...headers,
+                    'Content-Type': 'application/offset+octet-stream',
+                    'Upload-Offset': upload.offset
+                },
+                body: file.slice(upload.offset, upload.offset + chunkSize)
+            });
+            if (!response.ok && response.status !== 409) {
+                throw new Error((await response.json()).error || 'Chunk upload failed');
+            }
+            upload = await response.json();
+            retries = 0;
+        } catch (error) {
+            if (++retries > 5) {
+                throw error;
+            }
+            // Ask the server how much it kept, then resume from there.
+            upload = await (await fetch(`/api/health-records/uploads/${upload.id}/`)).json();
+        }
+    }
+
+    response = await fetch(`/api/health-records/uploads/${upload.id}/complete/`, {
+        method: 'POST',
+        headers: headers
+    });
+    const record = await response.json();
+    if (!response.ok) {
+        throw new Error(record.error || 'Failed to finish upload');
+    }
+    return record;
+}
+
+// Append one page of a list API ({next, results}) to `container`, rendering
+// each result with renderItem(result) as HTML. While the API reports a next
+// page a "Load more" button fetches it; `pick` takes the page out of a
+// response that holds more than one list.
+function showPages(container, page, renderItem, pick = data => data) {
+    container.querySelectorAll('[data-load-more]').forEach(button => button.remove());
+    container.insertAdjacentHTML('beforeend', page.results.map(renderItem).join(''));
+    if (!page.next) {
+        return;
+    }
+    const button = document.createElement('button');
+    button.type = 'button';
+    button.className = 'btn btn-secondary';
+    button.dataset.loadMore = '';
+    button.textContent = 'Load more';
+    button.addEventListener('click', () => {
+        button.disabled = true;
+        fetch(page.next)
+            .then(response => response.json())
+            .then(data => showPages(container, pick(data), renderItem, pick))
+            .catch(error => {
+                console.error('Error:', error);
+                button.disabled = false;
+            });
+    });
+    container.appendChild(button);
+}
+
+// Open a WebSocket that receives changes to the user's appointments and call
+// onUpdate(appointment, event) for each one. Reconnects with backoff.
+function connectAppointmentUpdates(onUpdate) {
+    const scheme = location.protocol === 'https:' ? 'wss' : 'ws';
+    let delay = 1000;
+
+    function connect() {
+        const socket = new WebSocket(`${scheme}://${location.host}/ws/appointments/`);
+        socket.onopen = () => { delay = 1000; };
+        socket.onmessage = message => {
+            const data = JSON.parse(message.data);
+            if (data.type === 'appointment.updated') {
+                onUpdate(data.appointment, data.event);
+            }
+        };
+        socket.onclose = event => {
+            if (event.code === 4401) {
+                return;  // Not logged in; retrying will not help.
+            }
+            setTimeout(connect, delay);
+            delay = Math.min(delay * 2, 30000);
+        };
+    }
+    connect();
+}
+
+function displayName(user) {
+    return `${user.first_name} ${user.last_name}`.trim() || user.username;
+}
+
+// Bring every element rendered for an appointment in line with its latest
+// state. Elements are marked with data-appointment-id; inside them,
+// data-field elements show a field, data-link-field links point at one (and
+// hide while it is empty) and data-when-status elements are only shown for
+// the listed statuses. Returns false if the appointment is not on the page.
+function applyAppointmentUpdate(appointment) {
+    const items = document.querySelectorAll(`[data-appointment-id="${appointment.id}"]`);
+    const fields = {
+        ...appointment,
+        status: appointment.status.charAt(0).toUpperCase() + appointment.status.slice(1),
+        time: appointment.time.slice(0, 5),
+        doctor_name: displayName(appointment.doctor.user),
+        patient_name: displayName(appointment.patient.user),
+        specialization: appointment.doctor.specialization
+    };
+    items.forEach(item => {
+        item.querySelectorAll('.status').forEach(badge => {
+            badge.className = `status ${appointment.status}`;
+        });
+        item.querySelectorAll('[data-field]').forEach(element => {
+            element.textContent = fields[element.dataset.field] || '';
+            const wrapper = element.closest('[data-optional]');
+            if (wrapper) {
+                wrapper.hidden = !fields[element.dataset.field];
+            }
+        });
+        item.querySelectorAll('[data-link-field]').forEach(link => {
+            link.href = fields[link.dataset.linkField] || '';
+            link.hidden = !fields[link.dataset.linkField];
+        });
+        item.querySelectorAll('[data-when-status]').forEach(element => {
+            element.hidden = !element.dataset.whenStatus.split(' ').includes(appointment.status);
+        });
+    });
+    return items.length > 0;
+}
+
+// Show a pushed appointment: update it in place, or add it to the top of
+// `list` using the <template> with id `templateId`.
+function showAppointment(appointment, list, templateId) {
+    if (applyAppointmentUpdate(appointment) || !list) {
+        return;
+    }
+    const item = document.getElementById(templateId).content.firstElementChild.cloneNode(true);
+    item.dataset.appointmentId = appointment.id;
+    list.prepend(item);
+    list.hidden = false;
+    document.querySelectorAll('[data-empty-appointments]').forEach(element => element.remove());
+    applyAppointmentUpdate(appointment);
+}
+
 document.addEventListener('DOMContentLoaded', function() {
     // Handle form submissions
     const forms = document.querySelectorAll('form');
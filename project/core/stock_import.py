@@ -0,0 +1,224 @@
+"""
+Streaming import of medicines and pharmacy stock.
+
+Rows flow through a generator pipeline (read, validate, batch, upsert), so
+memory is bounded by the batch size however large the file is. Each batch
+is one transaction that upserts medicines on (name, manufacturer) and stock
+on (pharmacy, medicine) with ``bulk_create(update_conflicts=True)``.
+
+CSV files need a header row; JSON-lines files hold one object per line.
+Rows carry ``name``, ``manufacturer``, ``price`` and ``stock``, plus
+``pharmacy_id`` unless the whole file is for one pharmacy, and optionally
+``description``, which replaces the stored one when present.
+"""
+import csv
+import io
+import json
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+from typing import NamedTuple
+
+from django.db import transaction
+
+from .inventory import MAX_STOCK, refresh_availability
+from .models import Medicine, Pharmacy, PharmacyMedicine
+from .search import get_backend
+
+FORMATS = ('csv', 'jsonl')
+DEFAULT_BATCH_SIZE = 2000
+MAX_REJECTIONS_KEPT = 100
+MAX_PRICE = Decimal('99999999.99')
+
+
+class StockRow(NamedTuple):
+    line: int
+    pharmacy_id: int
+    name: str
+    manufacturer: str
+    description: str
+    price: Decimal
+    stock: int
+
+
+class ImportReport:
+    def __init__(self, on_reject=None):
+        self.rows = 0
+        self.imported = 0
+        self.rejected = 0
+        self.batches = 0
+        self.rejections = []
+        self.error = None
+        self.on_reject = on_reject
+
+    def reject(self, line, error):
+        self.rejected += 1
+        if len(self.rejections) < MAX_REJECTIONS_KEPT:
+            self.rejections.append({'line': line, 'error': error})
+        if self.on_reject:
+            self.on_reject(line, error)
+
+    def as_dict(self):
+        return {
+            'rows': self.rows,
+            'imported': self.imported,
+            'rejected': self.rejected,
+            'rejections': self.rejections,
+            'error': self.error,
+        }
+
+
+def guess_format(filename):
+    return 'jsonl' if filename.lower().endswith(('.jsonl', '.ndjson', '.json')) else 'csv'
+
+
+def read_rows(stream, format):
+    """Yield ``(line, row, error)`` from a text stream, one row at a time."""
+    if format == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row, None
+        return
+
+    for line, text in enumerate(stream, 1):
+        if not text.strip():
+            continue
+        try:
+            row = json.loads(text)
+        except ValueError as e:
+            yield line, None, f'Invalid JSON: {e}'
+            continue
+        if not isinstance(row, dict):
+            yield line, None, 'Expected a JSON object'
+            continue
+        yield line, row, None
+
+
+def clean_text(row, field, required=True):
+    value = str(row.get(field) or '').strip()
+    max_length = Medicine._meta.get_field(field).max_length
+    if required and not value:
+        raise ValueError(f'{field} is required')
+    if max_length and len(value) > max_length:
+        raise ValueError(f'{field} is longer than {max_length} characters')
+    return value
+
+
+def clean_row(line, row, pharmacy_id, pharmacy_ids):
+    if pharmacy_id is None:
+        try:
+            pharmacy_id = int(str(row.get('pharmacy_id', '')).strip())
+        except ValueError:
+            raise ValueError('pharmacy_id is required')
+    if pharmacy_id not in pharmacy_ids:
+        raise ValueError(f'Unknown pharmacy {pharmacy_id}')
+
+    try:
+        price = Decimal(str(row.get('price', '')).strip())
+    except InvalidOperation:
+        raise ValueError('price is not a number')
+    if not price.is_finite() or price < 0 or price > MAX_PRICE or price != price.quantize(Decimal('0.01')):
+        raise ValueError('price must be between 0 and 99999999.99 with at most 2 decimal places')
+
+    try:
+        stock = int(str(row.get('stock', '')).strip())
+    except ValueError:
+        raise ValueError('stock is not a whole number')
+    if not 0 <= stock <= MAX_STOCK:
+        raise ValueError(f'stock must be between 0 and {MAX_STOCK}')
+
+    return StockRow(
+        line=line,
+        pharmacy_id=pharmacy_id,
+        name=clean_text(row, 'name'),
+        manufacturer=clean_text(row, 'manufacturer'),
+        description=str(row.get('description') or '').strip(),
+        price=price,
+        stock=stock,
+    )
+
+
+def validate_rows(rows, report, pharmacy_id=None):
+    pharmacy_ids = set(Pharmacy.objects.values_list('id', flat=True))
+    for line, row, error in rows:
+        report.rows += 1
+        if error is None:
+            try:
+                yield clean_row(line, row, pharmacy_id, pharmacy_ids)
+                continue
+            except ValueError as e:
+                error = str(e)
+        report.reject(line, error)
+
+
+def batched(rows, size):
+    rows = iter(rows)
+    while batch := list(islice(rows, size)):
+        yield batch
+
+
+def upsert_batch(batch):
+    # Later rows win when a file repeats a key; a single upsert statement may
+    # not touch the same row twice.
+    medicines = {(row.name, row.manufacturer): row for row in batch}
+    stock = {}
+    with transaction.atomic():
+        for described in (True, False):
+            Medicine.objects.bulk_create(
+                [
+                    Medicine(name=row.name, manufacturer=row.manufacturer, description=row.description, price=row.price)
+                    for row in medicines.values() if bool(row.description) == described
+                ],
+                update_conflicts=True,
+                unique_fields=['name', 'manufacturer'],
+                update_fields=['price', 'description'] if described else ['price'],
+            )
+        ids = {
+            (name, manufacturer): pk
+            for pk, name, manufacturer in Medicine.objects.filter(
+                name__in={row.name for row in batch}
+            ).values_list('id', 'name', 'manufacturer')
+            if (name, manufacturer) in medicines
+        }
+        for row in batch:
+            medicine_id = ids[row.name, row.manufacturer]
+            stock[row.pharmacy_id, medicine_id] = PharmacyMedicine(
+                pharmacy_id=row.pharmacy_id, medicine_id=medicine_id, stock=row.stock
+            )
+        PharmacyMedicine.objects.bulk_create(
+            stock.values(),
+            update_conflicts=True,
+            unique_fields=['pharmacy', 'medicine'],
+            update_fields=['stock', 'last_updated'],
+        )
+        get_backend().reindex(ids.values())
+        refresh_availability(ids.values())
+
+
+def import_stock(stream, format='csv', pharmacy_id=None, batch_size=DEFAULT_BATCH_SIZE,
+                 on_batch=None, on_reject=None):
+    """
+    Import rows from the text ``stream`` and return an ``ImportReport``.
+    ``on_batch(report)`` is called after every committed batch and
+    ``on_reject(line, error)`` for every rejected row. A file that cannot be
+    decoded stops the import with ``report.error`` set; batches committed
+    before that point stay.
+    """
+    if format not in FORMATS:
+        raise ValueError(f'Unknown format {format!r}')
+    report = ImportReport(on_reject)
+    rows = validate_rows(read_rows(stream, format), report, pharmacy_id)
+    try:
+        for batch in batched(rows, batch_size):
+            upsert_batch(batch)
+            report.imported += len(batch)
+            report.batches += 1
+            if on_batch:
+                on_batch(report)
+    except (UnicodeDecodeError, csv.Error) as e:
+        report.error = f'Unreadable file after line {report.rows}: {e}'
+    return report
+
+
+def text_stream(binary):
+    """Decode an uploaded or opened binary file lazily, tolerating a UTF-8 byte order mark."""
+    return io.TextIOWrapper(binary, encoding='utf-8-sig', newline='')
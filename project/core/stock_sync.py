@@ -0,0 +1,161 @@
+"""
+Incremental stock sync for pharmacies and partner systems.
+
+Pushes carry a batch of absolute ``(medicine_id, stock)`` values under an
+idempotency key. The batch is applied in one transaction together with a
+record of its response, so a retried push (same key, same body) is answered
+from that record instead of being applied again, and reusing a key for a
+different body is refused. Keys are remembered for ``STOCK_SYNC_KEY_DAYS``.
+
+Pulls return the stock rows changed after a cursor in ``(last_updated, id)``
+order, read off an index, so a client that keeps its last cursor downloads
+only what changed since. A deleted row leaves a tombstone under its old id
+(``PharmacyMedicineTombstone``), and pulls merge the tombstones into the
+same order as ``deleted`` changes, so clients drop stock that is gone.
+
+``last_updated`` is stamped before the row is written, so a transaction
+that commits late can carry an older stamp than rows already served; pulls
+leave out rows changed within the last ``STOCK_SYNC_SETTLE_SECONDS`` so
+that such a row never lands behind a cursor handed out earlier. That only
+holds if every writer commits within the window of its stamps. Pushes are
+small, but an import batch (``core.stock_import``) stamps up to a few
+thousand rows and commits after reindexing them; raise the setting if
+imports run with large batches or on a busy database. For the same reason
+pulls read the primary: a lagging replica could hide rows older than the
+window.
+"""
+import hashlib
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .inventory import MAX_STOCK, refresh_availability
+from .models import Medicine, PharmacyMedicine, PharmacyMedicineTombstone, StockSyncBatch
+
+MAX_KEY_LENGTH = StockSyncBatch._meta.get_field('idempotency_key').max_length
+
+
+class SyncError(Exception):
+    def __init__(self, message, status):
+        super().__init__(message)
+        self.status = status
+
+
+def request_hash(changes):
+    return hashlib.sha256(json.dumps(changes, sort_keys=True, separators=(',', ':')).encode()).hexdigest()
+
+
+def clean_whole_number(change, field, index):
+    value = change.get(field)
+    if not isinstance(value, int) or isinstance(value, bool) or not 0 <= value <= MAX_STOCK:
+        raise SyncError(f'changes[{index}].{field} must be a whole number between 0 and {MAX_STOCK}', 400)
+    return value
+
+
+def clean_changes(changes):
+    """Map medicine id to its new stock; a later change to the same medicine wins."""
+    max_changes = getattr(settings, 'STOCK_SYNC_MAX_CHANGES', 1000)
+    if not isinstance(changes, list) or not changes:
+        raise SyncError('changes must be a non-empty list', 400)
+    if len(changes) > max_changes:
+        raise SyncError(f'At most {max_changes} changes per batch', 400)
+    stock = {}
+    for index, change in enumerate(changes):
+        if not isinstance(change, dict):
+            raise SyncError(f'changes[{index}] must be an object', 400)
+        stock[clean_whole_number(change, 'medicine_id', index)] = clean_whole_number(change, 'stock', index)
+    return stock
+
+
+def replay(batch, digest):
+    if batch.request_hash != digest:
+        raise SyncError('Idempotency-Key was already used for a different batch', 422)
+    return batch.response, True
+
+
+def apply_changes(pharmacy, stock):
+    current = dict(
+        PharmacyMedicine.objects.filter(pharmacy=pharmacy, medicine_id__in=stock).values_list('medicine_id', 'stock')
+    )
+    # Unchanged values are skipped so they do not show up in everyone's next pull.
+    changed = {medicine_id: value for medicine_id, value in stock.items() if current.get(medicine_id) != value}
+    new = changed.keys() - current.keys()
+    unknown = new - set(Medicine.objects.filter(id__in=new).values_list('id', flat=True))
+    if unknown:
+        raise SyncError(f'Unknown medicines: {", ".join(map(str, sorted(unknown)))}', 400)
+
+    PharmacyMedicine.objects.bulk_create(
+        [PharmacyMedicine(pharmacy=pharmacy, medicine_id=medicine_id, stock=value) for medicine_id, value in changed.items()],
+        update_conflicts=True,
+        unique_fields=['pharmacy', 'medicine'],
+        update_fields=['stock', 'last_updated'],
+    )
+    refresh_availability(changed)
+    return {
+        'pharmacy_id': pharmacy.id,
+        'received': len(stock),
+        'changed': len(changed),
+        'synced_at': timezone.now().isoformat(),
+    }
+
+
+def push_changes(pharmacy, idempotency_key, changes):
+    """
+    Apply a pushed batch once per ``idempotency_key`` and return
+    ``(response, replayed)``. Raises ``SyncError`` for a missing key, an
+    invalid batch or a key reused for a different batch.
+    """
+    if not idempotency_key or len(idempotency_key) > MAX_KEY_LENGTH:
+        raise SyncError(f'An Idempotency-Key header of at most {MAX_KEY_LENGTH} characters is required', 400)
+    digest = request_hash(changes)
+    existing = StockSyncBatch.objects.filter(pharmacy=pharmacy, idempotency_key=idempotency_key).first()
+    if existing:
+        return replay(existing, digest)
+
+    stock = clean_changes(changes)
+    with transaction.atomic():
+        try:
+            with transaction.atomic():
+                batch = StockSyncBatch.objects.create(
+                    pharmacy=pharmacy, idempotency_key=idempotency_key, request_hash=digest, response={}
+                )
+        except IntegrityError:
+            # A concurrent retry with the same key got there first.
+            return replay(StockSyncBatch.objects.get(pharmacy=pharmacy, idempotency_key=idempotency_key), digest)
+        batch.response = apply_changes(pharmacy, stock)
+        batch.save(update_fields=['response'])
+        expired = timezone.now() - timedelta(days=getattr(settings, 'STOCK_SYNC_KEY_DAYS', 7))
+        StockSyncBatch.objects.filter(pharmacy=pharmacy, created_at__lt=expired).delete()
+    return batch.response, False
+
+
+def settled(queryset, pharmacy_id):
+    settled_at = timezone.now() - timedelta(seconds=getattr(settings, 'STOCK_SYNC_SETTLE_SECONDS', 2))
+    queryset = queryset.filter(last_updated__lte=settled_at)
+    if pharmacy_id is not None:
+        queryset = queryset.filter(pharmacy_id=pharmacy_id)
+    return queryset
+
+
+def settled_stock_changes(pharmacy_id=None):
+    """Stock rows old enough to be served by a pull, optionally for one pharmacy."""
+    return settled(PharmacyMedicine.objects.all(), pharmacy_id)
+
+
+def settled_stock_deletions(pharmacy_id=None):
+    """Tombstones of deleted stock rows old enough to be served by a pull, optionally for one pharmacy."""
+    return settled(PharmacyMedicineTombstone.objects.all(), pharmacy_id)
+
+
+def stock_change(row):
+    deleted = isinstance(row, PharmacyMedicineTombstone)
+    return {
+        'pharmacy_id': row.pharmacy_id,
+        'medicine_id': row.medicine_id,
+        'stock': 0 if deleted else row.stock,
+        'deleted': deleted,
+        'last_updated': row.last_updated.isoformat(),
+    }
@@ -0,0 +1,193 @@
+"""
+Content-addressed, deduplicating storage for health-record files.
+
+Every file is stored once under ``blobs/<aa>/<bb>/<sha256>``, where ``aa`` and
+``bb`` are the first two byte pairs of its digest. ``StoredBlob`` counts how
+many health records point at each blob and remembers when the count last
+dropped to zero. ``collect_garbage`` deletes blobs that have stayed
+unreferenced for ``HEALTH_RECORD_BLOB_GRACE``; it runs after each release
+commits and from the ``collect_blob_garbage`` command, which should run
+periodically to sweep blobs whose grace had not passed at release time.
+
+Writing a blob, claiming it and collecting it all hold the blob's row lock.
+Storing content marks an unreferenced blob as just released, so it survives
+until the record that uploaded it claims it, and a blob that garbage
+collection deleted is written again. A claim never creates a record that
+points at a missing file.
+"""
+import hashlib
+import os
+import tempfile
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.db.models import Case, F, Value, When
+from django.utils import timezone
+
+BLOB_PREFIX = 'blobs'
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def blob_name(digest):
+    return f'{BLOB_PREFIX}/{digest[:2]}/{digest[2:4]}/{digest}'
+
+
+def digest_from_name(name):
+    parts = (name or '').split('/')
+    if len(parts) == 4 and parts[0] == BLOB_PREFIX and len(parts[3]) == 64:
+        return parts[3]
+    return None
+
+
+def hash_file(path):
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+            hasher.update(block)
+    return hasher.hexdigest()
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Ignores the requested name and stores content under its SHA-256 digest.
+    Files that already exist are not written again. Names outside ``blobs/``
+    (files saved before this storage existed) can still be read.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        return name
+
+    def _save(self, name, content):
+        digest = getattr(content, 'sha256', None)
+        if hasattr(content, 'temporary_file_path'):
+            source = content.temporary_file_path()
+            digest = digest or hash_file(source)
+            self.reserve(digest, lambda path: file_move_safe(source, path))
+            return blob_name(digest)
+
+        # Copy to a temporary file next to the blobs, hashing on the way, then
+        # rename it into place so readers never see a half-written blob.
+        staging = os.path.join(self.location, BLOB_PREFIX)
+        os.makedirs(staging, exist_ok=True)
+        hasher = hashlib.sha256()
+        with tempfile.NamedTemporaryFile(dir=staging, delete=False) as staged:
+            for chunk in content.chunks():
+                hasher.update(chunk)
+                staged.write(chunk)
+        digest = hasher.hexdigest()
+        try:
+            self.reserve(digest, lambda path: os.replace(staged.name, path))
+        finally:
+            if os.path.exists(staged.name):
+                os.remove(staged.name)
+        return blob_name(digest)
+
+    def reserve(self, digest, write):
+        """
+        Make sure the blob for ``digest`` is on disk, calling ``write(path)``
+        to put it there if it is missing, and keep it from garbage collection
+        for the grace period unless records already point at it.
+        """
+        from .models import StoredBlob
+
+        name = blob_name(digest)
+        with transaction.atomic():
+            blob = locked_blob(digest)
+            if not self.exists(name):
+                os.makedirs(os.path.dirname(self.path(name)), exist_ok=True)
+                write(self.path(name))
+                self._apply_permissions(name)
+            if blob is None:
+                StoredBlob.objects.get_or_create(
+                    digest=digest, defaults={'size': self.size(name), 'released_at': timezone.now()}
+                )
+            elif blob.ref_count == 0:
+                StoredBlob.objects.filter(pk=digest).update(released_at=timezone.now())
+
+    def _apply_permissions(self, name):
+        if self.file_permissions_mode is not None:
+            os.chmod(self.path(name), self.file_permissions_mode)
+
+
+def locked_blob(digest):
+    """The ``StoredBlob`` row for ``digest``, locked until the transaction ends, or ``None``."""
+    from .models import StoredBlob
+
+    return StoredBlob.objects.select_for_update().filter(pk=digest).first()
+
+
+_storage = None
+
+
+def health_record_storage():
+    global _storage
+    if _storage is None:
+        _storage = ContentAddressedStorage()
+    return _storage
+
+
+def blob_grace():
+    return getattr(settings, 'HEALTH_RECORD_BLOB_GRACE', timedelta(minutes=10))
+
+
+def claim_blob(name):
+    from .models import StoredBlob
+
+    digest = digest_from_name(name)
+    if digest is None:
+        return
+    storage = health_record_storage()
+    with transaction.atomic():
+        blob = locked_blob(digest)
+        if not storage.exists(name):
+            raise FileNotFoundError(f'Blob {name} is not in storage')
+        if blob is None:
+            blob, created = StoredBlob.objects.get_or_create(
+                digest=digest, defaults={'size': storage.size(name), 'ref_count': 1}
+            )
+        else:
+            created = False
+        if not created:
+            StoredBlob.objects.filter(pk=digest).update(
+                ref_count=F('ref_count') + 1, claimed_at=timezone.now(), released_at=None
+            )
+
+
+def release_blob(name):
+    from .models import StoredBlob
+
+    digest = digest_from_name(name)
+    if digest is None:
+        return
+    StoredBlob.objects.filter(pk=digest, ref_count__gt=0).update(
+        ref_count=F('ref_count') - 1,
+        released_at=Case(When(ref_count=1, then=Value(timezone.now())), default=F('released_at')),
+    )
+    transaction.on_commit(lambda: collect_garbage(digests=[digest]))
+
+
+def collect_garbage(digests=None, grace=None):
+    """Delete blobs unreferenced for longer than the grace period; return ``(count, bytes)`` freed."""
+    from .models import StoredBlob
+
+    cutoff = timezone.now() - (blob_grace() if grace is None else grace)
+    orphans = StoredBlob.objects.filter(ref_count=0, released_at__lte=cutoff)
+    if digests is not None:
+        orphans = orphans.filter(pk__in=digests)
+
+    storage = health_record_storage()
+    count = freed = 0
+    for digest in list(orphans.values_list('pk', flat=True)):
+        with transaction.atomic():
+            # Re-checked under the row lock, so a concurrent claim or upload wins.
+            blob = locked_blob(digest)
+            if blob is None or blob.ref_count or blob.released_at is None or blob.released_at > cutoff:
+                continue
+            storage.delete(blob_name(digest))
+            blob.delete()
+        count += 1
+        freed += blob.size
+    return count, freed
@@ -0,0 +1,217 @@
+"""
+Rule-based symptom analysis.
+
+The knowledge base (``SYMPTOM_KNOWLEDGE_BASE``, ``core/data/symptoms.json``
+by default) lists symptoms with a severity weight and the phrases that name
+them, the conditions each symptom points to, and the words that intensify,
+soften or negate a mention. It is compiled once per process into a token
+trie, so a note is read in a single pass however many phrases there are,
+and phrases only match whole words: "feverish" counts as a fever because
+the knowledge base lists it, not because it contains "fever".
+
+Reading a note:
+
+* Clauses end at punctuation and at words such as "but"; negation and
+  intensity never reach across a clause.
+* A negation ("no", "denies", "free of", ...) covers the symptoms after it
+  in its clause, up to ``NEGATION_WINDOW`` tokens away.
+* An intensifier ("severe", "mild", ...) scales the weight of the nearest
+  symptom in its clause, preferring the one after it.
+
+The severity score sums the weights of the symptoms present, and
+conditions are ranked by the weight of their symptoms that were found.
+"""
+import heapq
+import json
+import re
+import threading
+from collections import defaultdict
+from pathlib import Path
+
+from django.conf import settings
+
+DEFAULT_KNOWLEDGE_BASE = Path(__file__).resolve().parent / 'data' / 'symptoms.json'
+TOKEN_RE = re.compile(r'\w+|[.,;:!?()\n]')
+PUNCTUATION = frozenset('.,;:!?()\n')
+NEGATION_WINDOW = 6
+INTENSIFIER_WINDOW = 3
+
+SYMPTOM, NEGATION, INTENSIFIER, CLAUSE_BREAK = 'symptom', 'negation', 'intensifier', 'clause_break'
+END = None
+
+RECOMMENDATIONS = {
+    'low': 'Monitor your symptoms and rest. Consult a doctor if symptoms worsen.',
+    'moderate': 'Please consult with a doctor for accurate diagnosis.',
+    'high': 'Please consult with a doctor for accurate diagnosis.',
+}
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(text.lower())
+
+
+class SymptomAnalyzer:
+    def __init__(self, knowledge):
+        self.trie = {}
+        self.symptoms, self.weights = [], []
+        for name, spec in knowledge['symptoms'].items():
+            self.add_phrases(spec['terms'], (SYMPTOM, len(self.symptoms)))
+            self.symptoms.append(name)
+            self.weights.append(float(spec['weight']))
+        for word, factor in knowledge.get('intensifiers', {}).items():
+            self.add_phrases([word], (INTENSIFIER, float(factor)))
+        self.add_phrases(knowledge.get('negations', []), (NEGATION, None))
+        self.add_phrases(knowledge.get('clause_breaks', []), (CLAUSE_BREAK, None))
+
+        # Inverted index, so scoring touches only the conditions of the symptoms found.
+        symptom_ids = {name: index for index, name in enumerate(self.symptoms)}
+        self.conditions, self.condition_sizes = [], []
+        self.postings = [[] for _ in self.symptoms]
+        for name, symptoms in knowledge['conditions'].items():
+            for symptom in symptoms:
+                if symptom not in symptom_ids:
+                    raise ValueError(f'Condition {name!r} refers to unknown symptom {symptom!r}')
+                self.postings[symptom_ids[symptom]].append(len(self.conditions))
+            self.conditions.append(name)
+            self.condition_sizes.append(len(symptoms))
+
+        thresholds = knowledge.get('severity_thresholds', {})
+        self.moderate_threshold = float(thresholds.get('moderate', 3))
+        self.high_threshold = float(thresholds.get('high', 6))
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path, encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    def add_phrases(self, phrases, payload):
+        for phrase in phrases:
+            tokens = tokenize(phrase)
+            if not tokens:
+                raise ValueError(f'Empty phrase {phrase!r} in the knowledge base')
+            node = self.trie
+            for token in tokens:
+                node = node.setdefault(token, {})
+            if END in node:
+                raise ValueError(f'{phrase!r} is listed twice in the knowledge base')
+            node[END] = payload
+
+    def scan(self, text):
+        """Yield ``(position, kind, value)`` for the longest phrase at each point of the note, left to right."""
+        tokens = tokenize(text)
+        position = 0
+        while position < len(tokens):
+            if tokens[position] in PUNCTUATION:
+                yield position, CLAUSE_BREAK, None
+                position += 1
+                continue
+            node, match, length = self.trie, None, 1
+            for end in range(position, len(tokens)):
+                node = node.get(tokens[end])
+                if node is None:
+                    break
+                if END in node:
+                    match, length = node[END], end - position + 1
+            if match:
+                yield (position, *match)
+            position += length
+
+    def clauses(self, text):
+        clause = []
+        for position, kind, value in self.scan(text):
+            if kind != CLAUSE_BREAK:
+                clause.append((position, kind, value))
+            elif clause:
+                yield clause
+                clause = []
+        if clause:
+            yield clause
+
+    def read_clause(self, clause):
+        """Yield ``(symptom, factor, negated)`` for each symptom mentioned in one clause."""
+        mentions, negated_from = [], None
+        for position, kind, value in clause:
+            if kind == NEGATION:
+                negated_from = position
+            elif kind == SYMPTOM:
+                negated = negated_from is not None and position - negated_from <= NEGATION_WINDOW
+                mentions.append([position, value, 1.0, negated])
+
+        for position, kind, value in clause:
+            if kind != INTENSIFIER:
+                continue
+            after = [m for m in mentions if 0 < m[0] - position <= INTENSIFIER_WINDOW]
+            before = [m for m in mentions if 0 < position - m[0] <= INTENSIFIER_WINDOW]
+            if after:
+                min(after, key=lambda m: m[0])[2] *= value
+            elif before:
+                max(before, key=lambda m: m[0])[2] *= value
+
+        for _, symptom, factor, negated in mentions:
+            yield symptom, factor, negated
+
+    def analyze(self, text, max_conditions=None):
+        if max_conditions is None:
+            max_conditions = getattr(settings, 'SYMPTOM_MAX_CONDITIONS', 5)
+        present, negated = {}, set()
+        for clause in self.clauses(text):
+            for symptom, factor, is_negated in self.read_clause(clause):
+                if is_negated:
+                    negated.add(symptom)
+                else:
+                    present[symptom] = max(present.get(symptom, 0), factor)
+        # A symptom both affirmed and denied ("no fever yesterday, fever today") counts as present.
+        negated -= present.keys()
+
+        score = sum(self.weights[symptom] * factor for symptom, factor in present.items())
+        if score >= self.high_threshold:
+            severity = 'high'
+        elif score >= self.moderate_threshold:
+            severity = 'moderate'
+        else:
+            severity = 'low'
+
+        matched = defaultdict(float)
+        for symptom in present:
+            for condition in self.postings[symptom]:
+                matched[condition] += self.weights[symptom]
+        ranked = heapq.nlargest(
+            max_conditions, matched,
+            key=lambda c: (matched[c], matched[c] / self.condition_sizes[c], -c),
+        )
+        return {
+            'possible_conditions': [self.conditions[condition] for condition in ranked],
+            'severity': severity,
+            'severity_score': round(score, 2),
+            'matched_symptoms': sorted(self.symptoms[symptom] for symptom in present),
+            'negated_symptoms': sorted(self.symptoms[symptom] for symptom in negated),
+            'recommendation': RECOMMENDATIONS[severity],
+        }
+
+
+_analyzer = None
+_analyzer_lock = threading.Lock()
+
+
+def get_analyzer():
+    """The analyzer for ``SYMPTOM_KNOWLEDGE_BASE``, compiled on first use and shared by the process."""
+    global _analyzer
+    path = str(getattr(settings, 'SYMPTOM_KNOWLEDGE_BASE', DEFAULT_KNOWLEDGE_BASE))
+    with _analyzer_lock:
+        if _analyzer is None or _analyzer[0] != path:
+            _analyzer = (path, SymptomAnalyzer.from_file(path))
+        return _analyzer[1]
+
+
+# Entry points for the triage process pool (core.triage). They live here, away
+# from the models, so a spawned worker only imports this module.
+_worker_analyzer = None
+
+
+def init_worker(path):
+    global _worker_analyzer
+    _worker_analyzer = SymptomAnalyzer.from_file(path)
+
+
+def analyze_in_worker(notes, max_conditions):
+    return [_worker_analyzer.analyze(note, max_conditions) for note in notes]
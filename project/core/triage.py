@@ -0,0 +1,149 @@
+"""
+Batch symptom triage.
+
+``triage_notes`` scores a list of notes with the symptom analyzer and
+returns the results in the same order. Batches of at least
+``SYMPTOM_TRIAGE_POOL_MIN_NOTES`` notes are split across a process pool of
+``SYMPTOM_TRIAGE_WORKERS`` workers, one chunk per worker so each note
+crosses the process boundary once; smaller batches, and hosts with a single
+worker, are scored in-process, where a note costs well under a millisecond
+and the round trip to a worker would cost more than it saves.
+
+Workers are started with ``spawn`` (forking a threaded server is unsafe),
+compile the knowledge base once when they start and are reused until the
+knowledge base path or worker count changes. A pool that breaks, e.g.
+because a worker was killed, is dropped and the batch is scored in-process.
+
+Appointments carry their triage: ``core.signals`` scores an appointment when
+it is booked or its symptoms change, and ``triage_active_appointments``
+backfills the ones booked before that. ``work_queue`` lists a doctor's
+pending and confirmed appointments, most severe first and longest waiting
+first within a severity. ``Appointment.queue_priority`` is the severity rank
+while an appointment is pending or confirmed and NULL otherwise, kept up to
+date on every save, and the queue index is partial on it, so finished
+history never slows a queue down.
+"""
+import math
+import multiprocessing
+import os
+import threading
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from itertools import repeat
+
+from django.conf import settings
+from django.db.models import Case, Value, When
+
+from .models import Appointment
+from .pagination import WORK_QUEUE_ORDERING
+from .scheduling import ACTIVE_STATUSES
+from .symptoms import DEFAULT_KNOWLEDGE_BASE, analyze_in_worker, get_analyzer, init_worker
+from .versions import APPOINTMENTS, bump_data_versions
+
+DEFAULT_BATCH_SIZE = 500
+SEVERITY_PRIORITY = {'low': 0, 'moderate': 1, 'high': 2}
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def triage_workers():
+    return getattr(settings, 'SYMPTOM_TRIAGE_WORKERS', None) or os.cpu_count() or 1
+
+
+def get_pool():
+    """The shared triage process pool, started on first use."""
+    global _pool
+    path = str(getattr(settings, 'SYMPTOM_KNOWLEDGE_BASE', DEFAULT_KNOWLEDGE_BASE))
+    key = (path, triage_workers())
+    with _pool_lock:
+        if _pool is None or _pool[0] != key:
+            if _pool is not None:
+                _pool[1].shutdown(wait=False, cancel_futures=True)
+            executor = ProcessPoolExecutor(
+                max_workers=key[1], mp_context=multiprocessing.get_context('spawn'),
+                initializer=init_worker, initargs=(path,),
+            )
+            _pool = (key, executor)
+        return _pool[1]
+
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool[1].shutdown(wait=True, cancel_futures=True)
+            _pool = None
+
+
+def triage_notes(notes, max_conditions=None):
+    """The analyzer's result for each note, in order."""
+    if max_conditions is None:
+        max_conditions = getattr(settings, 'SYMPTOM_MAX_CONDITIONS', 5)
+    workers = triage_workers()
+    if workers < 2 or len(notes) < getattr(settings, 'SYMPTOM_TRIAGE_POOL_MIN_NOTES', 64):
+        analyzer = get_analyzer()
+        return [analyzer.analyze(note, max_conditions) for note in notes]
+
+    size = math.ceil(len(notes) / workers)
+    chunks = [notes[start:start + size] for start in range(0, len(notes), size)]
+    try:
+        results = get_pool().map(analyze_in_worker, chunks, repeat(max_conditions))
+        return [result for chunk in results for result in chunk]
+    except BrokenProcessPool:
+        shutdown_pool()
+        analyzer = get_analyzer()
+        return [analyzer.analyze(note, max_conditions) for note in notes]
+
+
+def queue_priority(status, severity):
+    """The appointment's ``queue_priority``: its severity rank while it is pending or confirmed."""
+    return SEVERITY_PRIORITY.get(severity, 0) if status in ACTIVE_STATUSES else None
+
+
+def apply_triage(appointment, result):
+    appointment.triage_score = result['severity_score']
+    appointment.triage_severity = result['severity']
+
+
+def triage_appointment(appointment):
+    apply_triage(appointment, get_analyzer().analyze(appointment.symptoms))
+
+
+def triage_active_appointments(batch_size=DEFAULT_BATCH_SIZE, retriage=False):
+    """
+    Score every pending or confirmed appointment that has not been triaged
+    yet (all of them with ``retriage``), one batch at a time; return a
+    ``Counter`` of the severities assigned.
+    """
+    active = Appointment.objects.filter(status__in=ACTIVE_STATUSES)
+    if not retriage:
+        active = active.filter(triage_score__isnull=True)
+    severities = Counter()
+    last = 0
+    while batch := list(active.filter(id__gt=last).order_by('id').only('id', 'symptoms')[:batch_size]):
+        for appointment, result in zip(batch, triage_notes([a.symptoms for a in batch])):
+            apply_triage(appointment, result)
+            # Checked against the row's status at write time, so a status change
+            # made meanwhile is neither overwritten nor undone.
+            appointment.queue_priority = Case(
+                When(status__in=ACTIVE_STATUSES, then=Value(SEVERITY_PRIORITY[result['severity']])),
+                default=None,
+            )
+            severities[result['severity']] += 1
+        Appointment.objects.bulk_update(batch, ['triage_score', 'triage_severity', 'queue_priority'])
+        # bulk_update sends no signals, so the parties' appointment lists are bumped here.
+        parties = Appointment.objects.filter(id__in=[a.id for a in batch]).values_list(
+            'doctor__user_id', 'patient__user_id'
+        )
+        bump_data_versions(APPOINTMENTS, [user_id for pair in parties for user_id in pair])
+        last = batch[-1].id
+    return severities
+
+
+def work_queue(doctor):
+    """The doctor's pending and confirmed appointments in priority order."""
+    # Filtering on queue_priority rather than status lets SQLite match the
+    # partial index, whose predicate it cannot prove from a parameterized IN.
+    return Appointment.objects.filter(doctor=doctor, queue_priority__isnull=False).order_by(*WORK_QUEUE_ORDERING)
@@ -1,5 +1,5 @@
 from django.urls import path
-from . import views, api_views
+from . import views, api_views, async_api_views
 
 urlpatterns = [
     # Page URLs
@@ -16,12 +16,31 @@ urlpatterns = [
     path("api/health-records/", api_views.health_records_list, name="health_records_api"),
     path("api/appointments/<int:appointment_id>/status/", api_views.update_appointment_status, name="update_appointment_status"),
     path("api/symptoms/analyze/", api_views.analyze_symptoms, name="analyze_symptoms"),
+    path("api/symptoms/triage/", api_views.triage_symptoms, name="triage_symptoms"),
     path("api/medicines/search/", api_views.search_medicines, name="search_medicines"),
+    path("api/stock/import/", api_views.import_pharmacy_stock, name="import_pharmacy_stock"),
+    path("api/stock/sync/", api_views.push_stock_changes, name="push_stock_changes"),
+    path("api/stock/changes/", api_views.stock_changes, name="stock_changes"),
+    path("api/doctor/queue/", api_views.doctor_work_queue, name="doctor_work_queue"),
     path("api/doctor/schedule/", api_views.get_doctor_schedule, name="get_doctor_schedule"),
     path("api/doctor/schedule/update/", api_views.update_doctor_schedule, name="update_doctor_schedule"),
+    path("api/doctors/", api_views.doctor_directory, name="doctor_directory"),
+    path("api/doctors/specializations/", api_views.doctor_specializations, name="doctor_specializations"),
+    path("api/doctors/<int:doctor_id>/slots/", api_views.get_doctor_slots, name="get_doctor_slots"),
+    path("api/availability/metrics/", api_views.availability_cache_metrics, name="availability_cache_metrics"),
     path("api/patients/list/", api_views.patient_list, name="patient_list"),
     path("api/patients/records/", api_views.get_patient_records, name="get_patient_records"),
     path("api/prescriptions/create/", api_views.create_prescription, name="create_prescription"),
     path("api/health-records/create/", api_views.create_health_record, name="create_health_record"),
+    path("api/health-records/uploads/", api_views.create_health_record_upload, name="create_health_record_upload"),
+    path("api/health-records/uploads/<uuid:upload_id>/", api_views.health_record_upload, name="health_record_upload"),
+    path("api/health-records/uploads/<uuid:upload_id>/complete/", api_views.complete_health_record_upload, name="complete_health_record_upload"),
+    path("api/health-records/<int:record_id>/file/", api_views.download_health_record, name="download_health_record"),
     path("api/appointments/", api_views.get_appointments, name="get_appointments_api"),
+
+    # Async-native read APIs for ASGI deployments (same responses as above)
+    path("api/async/health-records/", async_api_views.health_records_list, name="health_records_async_api"),
+    path("api/async/medicines/search/", async_api_views.search_medicines, name="search_medicines_async"),
+    path("api/async/doctor/schedule/", async_api_views.get_doctor_schedule, name="get_doctor_schedule_async"),
+    path("api/async/appointments/", async_api_views.get_appointments, name="get_appointments_async_api"),
 ]
@@ -0,0 +1,117 @@
+"""
+Per-user data versions for conditional GETs on the polled read APIs.
+
+Each polled API reads one scope of the requesting user's data: a doctor's
+schedule, a user's appointments, a doctor's patients or a patient's health
+records. ``DataVersion`` counts the changes to each (user, scope), and
+``core.signals`` bumps the counters of every user whose responses a write
+changes, inside the write's own transaction, so a counter commits together
+with the data it describes.
+
+``versioned(scope)`` sends the counter as an ETag (and its time as
+Last-Modified) and answers a conditional GET whose ETag still matches with
+304 after reading only the counter row. The counter is read before the
+view's data, so a write that lands in between makes the response newer than
+its ETag, never older.
+
+Counter rows are created by the first bump; a user without one is at
+version 0. Reads therefore never write and can use a replica together with
+the data they describe.
+"""
+import functools
+from datetime import datetime
+from inspect import iscoroutinefunction
+from typing import NamedTuple, Optional
+
+from django.db import connection
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+from .models import DataVersion
+
+SCHEDULE = 'schedule'
+APPOINTMENTS = 'appointments'
+PATIENTS = 'patients'
+HEALTH_RECORDS = 'health_records'
+
+VERSION_TABLE = DataVersion._meta.db_table
+BUMP_BATCH_SIZE = 250
+
+
+class Version(NamedTuple):
+    number: int
+    changed_at: Optional[datetime]
+
+
+INITIAL_VERSION = Version(0, None)
+
+
+def data_version(user, scope):
+    row = DataVersion.objects.filter(user=user, scope=scope).values_list('version', 'changed_at').first()
+    return Version(*row) if row else INITIAL_VERSION
+
+
+async def adata_version(user, scope):
+    row = await DataVersion.objects.filter(user=user, scope=scope).values_list('version', 'changed_at').afirst()
+    return Version(*row) if row else INITIAL_VERSION
+
+
+def bump_data_versions(scope, user_ids):
+    """Count a change to ``scope`` for each of ``user_ids``."""
+    user_ids = sorted(set(user_ids) - {None})
+    now = timezone.now()
+    with connection.cursor() as cursor:
+        for start in range(0, len(user_ids), BUMP_BATCH_SIZE):
+            batch = user_ids[start:start + BUMP_BATCH_SIZE]
+            cursor.execute(
+                f'INSERT INTO {VERSION_TABLE} (user_id, scope, version, changed_at) '
+                f'VALUES {", ".join(["(%s, %s, 1, %s)"] * len(batch))} '
+                f'ON CONFLICT (user_id, scope) DO UPDATE SET version = {VERSION_TABLE}.version + 1, '
+                f'changed_at = excluded.changed_at',
+                [value for user_id in batch for value in (user_id, scope, now)],
+            )
+
+
+def validators(request, scope, version):
+    """The ``(etag, last_modified)`` of ``request.user``'s ``scope`` data at ``version``."""
+    etag = f'W/"{request.user.pk}.{scope}.{version.number}"'
+    last_modified = int(version.changed_at.timestamp()) if version.changed_at else None
+    return etag, last_modified
+
+
+def with_validators(response, etag, last_modified):
+    if response.status_code in (200, 304):
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        # Responses are per user, and clients must check back on every poll.
+        patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def versioned(scope):
+    """
+    Conditional GET support for a view whose response depends only on the
+    requesting user's ``scope`` data. Goes inside ``@api_view`` (or
+    ``async_api_view``), so ``request.user`` is authenticated.
+    """
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @functools.wraps(view)
+            async def wrapper(request, *args, **kwargs):
+                etag, last_modified = validators(request, scope, await adata_version(request.user, scope))
+                response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+                if response is None:
+                    response = await view(request, *args, **kwargs)
+                return with_validators(response, etag, last_modified)
+        else:
+            @functools.wraps(view)
+            def wrapper(request, *args, **kwargs):
+                etag, last_modified = validators(request, scope, data_version(request.user, scope))
+                response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+                if response is None:
+                    response = view(request, *args, **kwargs)
+                return with_validators(response, etag, last_modified)
+        return wrapper
+    return decorator
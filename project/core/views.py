@@ -1,13 +1,20 @@
+from django.conf import settings
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import login, authenticate
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from .models import User, Doctor, Patient, Appointment, HealthRecord
+from .serializers import AppointmentSerializer
 from django.views.decorators.http import require_http_methods
 from django.http import JsonResponse
 from django.utils.decorators import method_decorator
 from django.views import View
 from django.urls import reverse
+from django.utils.dateparse import parse_date, parse_time
+from .realtime import meeting_role, publish_appointment
+from .scheduling import SlotUnavailable, book_appointment
+from .triage import work_queue
+from .versions import APPOINTMENTS, data_version
 
 def home(request):
     return render(request, 'home.html')
@@ -47,6 +54,18 @@ def register_view(request):
 
     return render(request, 'register.html')
 
+def appointment_list_context(user, appointments):
+    """
+    Context for a cached appointment list fragment. The fragment is keyed on
+    the user's appointments data version, which every change to what the list
+    shows bumps, so ``appointments`` is only queried when the list changed.
+    """
+    return {
+        'appointments': appointments,
+        'appointments_version': data_version(user, APPOINTMENTS).number,
+        'fragment_timeout': getattr(settings, 'APPOINTMENT_FRAGMENT_TIMEOUT', 3600),
+    }
+
 @login_required
 def patient_dashboard(request):
     if not request.user.is_patient:
@@ -54,10 +73,8 @@ def patient_dashboard(request):
         return redirect('home')
     
     patient = request.user.patient
-    appointments = Appointment.objects.filter(patient=patient)
-    context = {
-        'appointments': appointments,
-    }
+    appointments = AppointmentSerializer.setup_eager_loading(Appointment.objects.filter(patient=patient))
+    context = appointment_list_context(request.user, appointments)
     return render(request, 'patient_dashboard.html', context)
 
 @login_required
@@ -67,25 +84,26 @@ def doctor_dashboard(request):
         return redirect('home')
     
     doctor = request.user.doctor
-    appointments = Appointment.objects.filter(doctor=doctor)
-    context = {
-        'appointments': appointments,
-    }
+    # The work queue rather than the whole history: active appointments, most urgent first.
+    appointments = AppointmentSerializer.setup_eager_loading(work_queue(doctor))[
+        :getattr(settings, 'DOCTOR_QUEUE_SIZE', 50)
+    ]
+    context = appointment_list_context(request.user, appointments)
     return render(request, 'doctor_dashboard.html', context)
 
 @method_decorator(login_required, name='dispatch')
 class AppointmentView(View):
     def get(self, request):
         if request.user.is_patient:
-            appointments = Appointment.objects.filter(patient=request.user.patient)
-            doctors = Doctor.objects.all()
-            return render(request, 'appointments.html', {
-                'appointments': appointments,
-                'doctors': doctors
-            })
+            appointments = AppointmentSerializer.setup_eager_loading(
+                Appointment.objects.filter(patient=request.user.patient)
+            )
+            return render(request, 'appointments.html', appointment_list_context(request.user, appointments))
         else:
-            appointments = Appointment.objects.filter(doctor=request.user.doctor)
-            return render(request, 'appointments.html', {'appointments': appointments})
+            appointments = AppointmentSerializer.setup_eager_loading(
+                Appointment.objects.filter(doctor=request.user.doctor)
+            )
+            return render(request, 'appointments.html', appointment_list_context(request.user, appointments))
 
     def post(self, request):
         if not request.user.is_patient:
@@ -97,26 +115,54 @@ class AppointmentView(View):
         symptoms = request.POST.get('symptoms', '')
 
         try:
-            doctor = Doctor.objects.get(id=doctor_id)
-            appointment = Appointment.objects.create(
-                doctor=doctor,
-                patient=request.user.patient,
-                date=date,
-                time=time,
+            day = parse_date(date or '')
+            slot = parse_time(time or '')
+            if day is None or slot is None:
+                return JsonResponse({'error': 'Invalid date or time'}, status=400)
+            doctor = Doctor.objects.select_related('user').get(id=doctor_id)
+            appointment = book_appointment(
+                doctor,
+                request.user.patient,
+                day,
+                slot,
                 symptoms=symptoms
             )
-            return JsonResponse({'message': 'Appointment booked successfully'})
+            publish_appointment(appointment, event='created')
+            return JsonResponse({
+                'message': 'Appointment booked successfully',
+                'appointment': AppointmentSerializer(appointment).data
+            })
+        except SlotUnavailable as e:
+            return JsonResponse({'error': str(e)}, status=409)
         except Exception as e:
             return JsonResponse({'error': str(e)}, status=400)
 
 @login_required
 def start_meeting(request, appointment_id):
-    if not request.user.is_doctor:
-        messages.error(request, 'Only doctors can start meetings')
+    appointment = get_object_or_404(
+        AppointmentSerializer.setup_eager_loading(Appointment.objects.all()), id=appointment_id
+    )
+    role = meeting_role(request.user, appointment.id)
+    if role is None:
+        messages.error(request, 'Only the doctor and patient of a confirmed appointment can join its meeting')
         return redirect('home')
     
-    appointment = get_object_or_404(Appointment, id=appointment_id, doctor=request.user.doctor)
-    return render(request, 'meeting.html', {'appointment': appointment})
+    if role == 'doctor' and not appointment.meeting_link:
+        # Gives the patient a "Join Meeting" link on their pages.
+        appointment.meeting_link = reverse('start_meeting', args=[appointment.id])
+        appointment.save(update_fields=['meeting_link'])
+        publish_appointment(appointment)
+    
+    context = {
+        'appointment': appointment,
+        'meeting_config': {
+            'appointmentId': appointment.id,
+            'role': role,
+            'iceServers': getattr(settings, 'WEBRTC_ICE_SERVERS', []),
+            'exitUrl': reverse('doctor_dashboard' if role == 'doctor' else 'patient_dashboard'),
+        },
+    }
+    return render(request, 'meeting.html', context)
 
 @login_required
 def manage_schedule(request):
@@ -10,8 +10,12 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import os
+from datetime import timedelta
 from pathlib import Path
 
+from .databases import databases_from_env
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -45,6 +49,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    "core.db_routing.replica_pin_middleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -77,12 +82,16 @@ WSGI_APPLICATION = "telemedicine.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
-DATABASES = {
-    "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
-    }
-}
+# The primary and any read replicas come from DATABASE_URL and
+# DATABASE_REPLICA_URLS (see telemedicine.databases); without them this is the
+# local db.sqlite3.
+DATABASES = databases_from_env(os.environ, f"sqlite://{BASE_DIR / 'db.sqlite3'}")
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != "default"]
+
+# Read-only API views read from replicas; everything else, and every request
+# from a client that wrote within REPLICA_PIN_SECONDS, uses the primary.
+DATABASE_ROUTERS = ["core.db_routing.PrimaryReplicaRouter"]
+REPLICA_PIN_SECONDS = 5
 
 
 # Password validation
@@ -128,6 +137,18 @@ STATICFILES_DIRS = [
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
 
+# Health-record files are served by core.api_views.download_health_record, not
+# from MEDIA_URL. Resumable uploads are assembled in HEALTH_RECORD_UPLOAD_DIR.
+HEALTH_RECORD_UPLOAD_DIR = MEDIA_ROOT / "uploads"
+HEALTH_RECORD_MAX_UPLOAD_SIZE = 2 * 1024 ** 3
+
+# Health-record files are stored once per SHA-256 under MEDIA_ROOT/blobs/;
+# blobs are removed once no record has pointed at them for the grace period.
+# Blobs released within the grace period are swept by the collect_blob_garbage
+# command, which should run periodically (e.g. hourly from cron).
+FILE_UPLOAD_HANDLERS = ["core.files.HashingUploadHandler"]
+HEALTH_RECORD_BLOB_GRACE = timedelta(minutes=10)
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
@@ -151,10 +172,77 @@ REST_FRAMEWORK = {
     ]
 }
 
+# Keyset pagination for list APIs (core.pagination): API_PAGE_SIZE rows per
+# page unless a client sends another ?page_size=, at most API_MAX_PAGE_SIZE.
+API_PAGE_SIZE = 50
+API_MAX_PAGE_SIZE = 200
+
+# Stock delta sync (core.stock_sync). Pulls skip rows changed in the last
+# STOCK_SYNC_SETTLE_SECONDS so a late-committing write is not skipped by a
+# cursor, which assumes every writer commits within that many seconds of
+# stamping last_updated. Stock import batches are the likeliest to take
+# longer; raise it if they do. Idempotency keys of pushed batches are kept
+# for STOCK_SYNC_KEY_DAYS.
+STOCK_SYNC_SETTLE_SECONDS = 2
+STOCK_SYNC_MAX_CHANGES = 1000
+STOCK_SYNC_KEY_DAYS = 7
+
+# Medicine search near a location (?lat=&lng=&radius_km=): pharmacies within
+# the radius, nearest first, at most PHARMACY_SEARCH_LIMIT per medicine.
+PHARMACY_SEARCH_RADIUS_KM = 25
+PHARMACY_SEARCH_MAX_RADIUS_KM = 100
+PHARMACY_SEARCH_LIMIT = 20
+
+# Symptom analyzer (core.symptoms): symptoms, synonyms, conditions, negation
+# and intensity words, compiled once per process. Point this at a larger
+# knowledge base file to extend it without code changes.
+SYMPTOM_KNOWLEDGE_BASE = BASE_DIR / "core" / "data" / "symptoms.json"
+SYMPTOM_MAX_CONDITIONS = 5
+
+# Batch triage (core.triage): batches of at least SYMPTOM_TRIAGE_POOL_MIN_NOTES
+# notes are scored in a process pool of SYMPTOM_TRIAGE_WORKERS (None for one per
+# CPU); smaller ones in-process.
+SYMPTOM_TRIAGE_WORKERS = None
+SYMPTOM_TRIAGE_POOL_MIN_NOTES = 64
+SYMPTOM_TRIAGE_MAX_NOTES = 200
+
+# Appointments shown in the doctor dashboard's work queue (core.triage.work_queue);
+# the full queue is paged through /api/doctor/queue/.
+DOCTOR_QUEUE_SIZE = 50
+
+# Rendered appointment lists on the dashboards and the appointments page are
+# cached per user and appointments data version (core.versions), so a changed
+# list gets a new key; old entries expire after this many seconds.
+APPOINTMENT_FRAGMENT_TIMEOUT = 3600
+
+# Doctor availability calendar (core.availability). Leave the alias unset for a
+# per-process LRU, or name a CACHES alias to share entries between workers.
+# Other workers do not see a process's invalidations, so LRU entries expire
+# after AVAILABILITY_CACHE_LOCAL_TTL seconds.
+APPOINTMENT_SLOT_MINUTES = 30
+AVAILABILITY_CACHE_WEEKS = 4
+AVAILABILITY_CACHE_ALIAS = None
+AVAILABILITY_CACHE_LOCAL_TTL = 30
+
+# Specialization facets of the doctor directory (core.directory) are cached
+# per process; a change made by another worker shows up within this time.
+DOCTOR_FACETS_CACHE_SECONDS = 300
+
 # Channels settings
 ASGI_APPLICATION = "telemedicine.asgi.application"
+# Comma-separated shard URLs for core.channel_layers.ShardedChannelLayer:
+# memory://<name> (single process), sqlite:///<path> (several workers on one
+# host) or redis://host:port/db. Every worker must list the same shards.
 CHANNEL_LAYERS = {
     "default": {
-        "BACKEND": "channels.layers.InMemoryChannelLayer"
+        "BACKEND": "core.channel_layers.ShardedChannelLayer",
+        "CONFIG": {
+            "shards": os.environ.get("CHANNEL_LAYER_SHARDS", "memory://default"),
+        },
     }
 }
+
+# ICE servers handed to the browser for video consultations. Empty means peers
+# only use their own (host) candidates; add a self-hosted STUN/TURN server for
+# calls that cross NATs.
+WEBRTC_ICE_SERVERS = []
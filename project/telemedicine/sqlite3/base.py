@@ -0,0 +1,49 @@
+"""
+SQLite backend tuned for concurrent use by a single-node deployment.
+
+Every connection switches the file to WAL journaling, so readers no longer
+block the writer, waits up to ``busy_timeout`` for a lock instead of failing,
+and relaxes ``synchronous`` to NORMAL, which is durable across application
+crashes in WAL mode. Transactions start with ``BEGIN IMMEDIATE``: a deferred
+transaction that reads first and writes later cannot wait for the write lock
+without risking deadlock, so SQLite fails it at once with "database is
+locked", whereas an immediate transaction takes the lock up front and queues.
+
+``OPTIONS`` may carry ``pragmas`` (overriding ``DEFAULT_PRAGMAS``) and
+``transaction_mode`` (``DEFERRED``, ``IMMEDIATE`` or ``EXCLUSIVE``).
+"""
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.sqlite3 import base
+
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'cache_size': -20000,
+    'mmap_size': 128 * 1024 * 1024,
+    'temp_store': 'MEMORY',
+}
+# These change the file, which a read-only connection cannot do.
+WRITE_PRAGMAS = ('journal_mode',)
+TRANSACTION_MODES = ('DEFERRED', 'IMMEDIATE', 'EXCLUSIVE')
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        self.pragmas = {**DEFAULT_PRAGMAS, **params.pop('pragmas', {})}
+        self.transaction_mode = params.pop('transaction_mode', 'IMMEDIATE').upper()
+        if self.transaction_mode not in TRANSACTION_MODES:
+            raise ImproperlyConfigured(f'Unknown SQLite transaction_mode {self.transaction_mode!r}')
+        return params
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        read_only = 'mode=ro' in str(self.settings_dict['NAME'])
+        for pragma, value in self.pragmas.items():
+            if not (read_only and pragma in WRITE_PRAGMAS):
+                conn.execute(f'PRAGMA {pragma} = {value}')
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute(f'BEGIN {self.transaction_mode}')
@@ -17,8 +17,6 @@ Including another URLconf
 
 from django.contrib import admin
 from django.urls import path, include
-from django.conf import settings
-from django.conf.urls.static import static
 from django.contrib.auth import views as auth_views
 
 urlpatterns = [
@@ -26,4 +24,4 @@ urlpatterns = [
     path("", include("core.urls")),
     path("accounts/login/", auth_views.LoginView.as_view(template_name='registration/login.html'), name='login'),
     path("accounts/logout/", auth_views.LogoutView.as_view(), name='logout'),
-] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+]